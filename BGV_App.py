@@ -11,26 +11,168 @@
 # --------------------------------------------------------------
 
 
+# Beginn des Durchlaufs (für die Messung bis zur ersten Anzeige und der Dauer jedes Reruns)
+import time
+DURCHLAUF_START = time.perf_counter()
+
 import streamlit as st
-import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
-import requests
-import io
-from io import BytesIO
-from scipy import stats
-from PIL import Image # für das Logo
-
-# Funktion zur Berechnung der Masse in Tonnen aus m³ und Dichte
-def berechne_masse_in_tonnen(volumen_m3, dichte_kg_m3):
-    return (volumen_m3 * dichte_kg_m3) / 1000
-
-# Funktion zur Berechnung der dritten Wurzel von m³
-def berechne_dritte_wurzel(v):
-    return round(v ** (1/3), 2)
+import os
+import uuid
+from functools import partial
+
+# Nur leichte Module beim Start; scipy.stats, matplotlib und pandas (über bgv_core, bgv_fit, bgv_perzentile,
+# bgv_auswahl, bgv_bootstrap, bgv_skizze, bgv_throw) werden erst in den Schritten importiert, die sie brauchen
+from bgv_beispiele import finde_beispiele, lade_beispiel
+from bgv_cache import FitCache
+from bgv_formate import (EXPORT_FORMATE, UPLOAD_ENDUNGEN, basisname, erkenne_format, export_dateiname,
+                         exportiere_werte, lade_blockliste, sortiert, verfuegbare_exportformate)
+from bgv_messung import Messprotokoll, richte_trace_ein
+from bgv_sitzung import ArtefaktSpeicher, als_png, schaetze_groesse, textvorschau
+from bgv_zusammenfassung import Zusammenfassung, als_zusammenfassung
+
+# Logo der App (neben der App, unabhängig vom Arbeitsverzeichnis)
+LOGO_PFAD = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pi-geotechnik-1-RGB-192-30-65.png")
+
+# Verzeichnis für den dauerhaften Fit-Cache (überlebt Neustarts der App)
+FIT_CACHE_VERZEICHNIS = os.environ.get(
+    "BGV_FIT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".bgv_cache", "fits"))
+
+# Zeitlimit pro Anpassung in Sekunden
+FIT_TIMEOUT_S = float(os.environ.get("BGV_FIT_TIMEOUT", "120"))
+
+# Höchstzahl der genexpon-Neuanpassungen im Bootstrap und Zeitbudget dafür in Sekunden
+BOOTSTRAP_NEUANPASSUNGEN = int(os.environ.get("BGV_BOOTSTRAP_NEUANPASSUNGEN", "1000"))
+BOOTSTRAP_ZEITBUDGET_S = float(os.environ.get("BGV_BOOTSTRAP_ZEITBUDGET", "20"))
+
+# Trace-Datei der Laufzeitmessung (eine JSON-Zeile pro Stufe, leer = keine Datei)
+TRACE_DATEI = os.environ.get(
+    "BGV_TRACE_DATEI", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".bgv_cache", "trace.jsonl"))
+
+# Speicherspitzen je Stufe standardmäßig messen (tracemalloc, verlangsamt die App)
+MESSUNG_SPEICHER = os.environ.get("BGV_MESSUNG_SPEICHER", "0") == "1"
+
+# Speicherbudget je Sitzung in MB (Achsen des Datensatzes und abgeleitete Artefakte wie Diagramme und Tabellen)
+SITZUNG_BUDGET_MB = float(os.environ.get("BGV_SITZUNG_BUDGET_MB", "256"))
+
+# Namen der Parameter im session_state je Verteilung
+SESSION_PARAMETER = {
+    'genexpon': ('a1', 'b1', 'c1', 'loc1', 'scale1'),
+    #'lognorm': ('shape2', 'loc2', 'scale2'),
+    'expon': ('loc3', 'scale3'),
+    'powerlaw': ('a4', 'loc4', 'scale4'),
+}
+
+# Logo als PNG-Bytes, einmal pro Prozess gelesen und von allen Sitzungen geteilt
+@st.cache_resource
+def hole_logo():
+    with open(LOGO_PFAD, "rb") as f:
+        return f.read()
+
+# Mitgelieferte Beispiel-Dateien, einmal pro Prozess gesucht
+@st.cache_resource
+def hole_beispiele():
+    return finde_beispiele()
+
+# Beispiel-Volumina, einmal pro Prozess geladen und von allen Sitzungen geteilt
+@st.cache_resource
+def hole_beispiel_werte(schluessel):
+    return lade_beispiel(hole_beispiele()[schluessel])
+
+# Gekürzte Textvorschau einer Beispiel-Datei für die Anzeige, einmal pro Prozess gelesen
+@st.cache_resource
+def hole_beispiel_text(schluessel):
+    with open(hole_beispiele()[schluessel].pfad, "rb") as f:
+        return textvorschau(f.read())
+
+# Gemeinsamer Fit-Cache für alle Sitzungen und Reruns
+@st.cache_resource
+def hole_fit_cache():
+    return FitCache(max_eintraege=64, verzeichnis=FIT_CACHE_VERZEICHNIS)
+
+# Logger für die Trace-Datei, einmal pro Prozess eingerichtet
+@st.cache_resource
+def hole_trace_logger():
+    return richte_trace_ein(TRACE_DATEI) if TRACE_DATEI else None
+
+# Bootstrap-Konfidenzintervalle, einmal pro Datensatz und Parametersatz berechnet und von allen Sitzungen geteilt
+# (_zusammenfassung und _parameter werden nicht gehasht; daten_hash und parameter_tupel bilden den Schlüssel)
+@st.cache_resource(max_entries=16)
+def hole_bootstrap(daten_hash, parameter_tupel, replikate, _zusammenfassung):
+    from bgv_bootstrap import berechne_bootstrap
+    from bgv_core import BAND_PERZENTILE
+    from bgv_perzentile import TABELLEN_PERZENTILE
+
+    perzentile = np.union1d(TABELLEN_PERZENTILE, BAND_PERZENTILE)
+    return berechne_bootstrap(_zusammenfassung, dict(parameter_tupel), perzentile, replikate=replikate,
+                              max_neuanpassungen=BOOTSTRAP_NEUANPASSUNGEN, zeitbudget=BOOTSTRAP_ZEITBUDGET_S)
+
+# Gemeinsamer Speicher der Vergleichsergebnisse: jeder Datensatz wird für alle Sitzungen einmal angepasst
+@st.cache_resource
+def hole_vergleichs_speicher():
+    from bgv_vergleich import VergleichsSpeicher
+    return VergleichsSpeicher()
+
+# Achsen [m] einer Beispiel-Datei, einmal pro Prozess berechnet und von allen Sitzungen geteilt
+@st.cache_resource
+def hole_beispiel_achsen(schluessel):
+    from bgv_core import berechne_dritte_wurzel
+    return berechne_dritte_wurzel(hole_beispiel_werte(schluessel))
+
+# Vergleichsdiagramm als PNG, einmal pro Auswahl gezeichnet und von allen Sitzungen geteilt
+# (kennung aus Namen und Daten-Hashes; _gruppen_ergebnisse wird nicht gehasht)
+@st.cache_resource(max_entries=32)
+def hole_vergleich_png(kennung, _gruppen_ergebnisse, verteilungen):
+    from bgv_vergleich import zeichne_vergleich
+    return als_png(zeichne_vergleich(_gruppen_ergebnisse, list(verteilungen)))
+
+# Funktion zum Speichern der (sortierten) Achsen und ihrer Zusammenfassung im session_state
+# kennung identifiziert den Datensatz, damit er bei Reruns nicht neu eingelesen wird; name dient dem Export
+def setze_m_achsen(m_achsen, kennung=None, name=None):
+    st.session_state.pop('inkrementell', None)
+    st.session_state.m_achsen = m_achsen
+    with messung.stufe("zusammenfassung", bloecke=len(m_achsen)):
+        st.session_state.zusammenfassung = Zusammenfassung(m_achsen, ist_sortiert=True)
+    st.session_state.datensatz_kennung = kennung
+    st.session_state.datensatz_name = name
+
+# Funktion zur Prüfung, ob der Datensatz mit dieser Kennung geladen ist (auch mit ergänzten Blöcken)
+def ist_geladen(kennung):
+    return (st.session_state.get('datensatz_kennung') or ())[:len(kennung)] == kennung and 'm_achsen' in st.session_state
+
+# Funktion zum Einlesen einer Blockliste (Text, gzip/zstd, .npy, Parquet, Arrow) mit Meldung der abgelehnten Zeilen
+def lese_werte_mit_meldung(inhalt, min_wert=None, dateiname=None):
+    with messung.stufe("parsen") as info:
+        ergebnis = lade_blockliste(inhalt, dateiname, min_wert=min_wert)
+        info.update(bloecke=len(ergebnis.werte), abgelehnt=ergebnis.anzahl_abgelehnt, format=ergebnis.format)
+    if ergebnis.anzahl_abgelehnt:
+        zeilen = ", ".join(f"{nummer} ('{text}')" for nummer, text in ergebnis.abgelehnt[:10])
+        if ergebnis.anzahl_abgelehnt > 10:
+            zeilen += ", …"
+        st.warning(f"{ergebnis.anzahl_abgelehnt} Zeile(n) konnten nicht als Blockgröße gelesen werden "
+                   f"und wurden übersprungen: {zeilen}")
+    return ergebnis
+
+# Funktion zur Anzeige einer Textvorschau (die ersten Zeilen, nicht die ganze Datei)
+def zeige_textvorschau(vorschau):
+    text, gekuerzt = vorschau
+    st.text_area("Inhalt der Datei:", text, height=200)
+    if gekuerzt:
+        st.caption(f"Vorschau: nur die ersten {text.count(chr(10)) + 1} Zeilen der Datei")
+
+# Funktion zur Anzeige einer hochgeladenen Datei: Text als gekürzte Vorschau, komprimierte und binäre Formate nur mit Format
+def zeige_upload(uploaded_file):
+    format = erkenne_format(uploaded_file.getvalue()[:8], uploaded_file.name)
+    if format == 'text':
+        with messung.stufe("upload_dekodieren", bytes=uploaded_file.size):
+            zeige_textvorschau(textvorschau(uploaded_file.getvalue()))
+    else:
+        st.caption(f"Format: {format}, {uploaded_file.size / 2**20:.1f} MB (wird ohne Textvorschau geladen)")
 
 # Funktion zur Visualisierung von Histogrammen
 def visualisiere_histogramm_m3_und_m(m_werte, m3_werte):
+    import matplotlib.pyplot as plt
+
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 6))
     ax1.hist(m3_werte, bins=20, color='lightgreen', edgecolor='black')
     ax1.set_title("Histogramm der Volumina (m³)")
@@ -44,150 +186,83 @@ def visualisiere_histogramm_m3_und_m(m_werte, m3_werte):
     
     plt.tight_layout()
     st.pyplot(fig)
+    plt.close(fig)
 
-# Funktion zur Berechnung der Perzentile
-def berechne_perzentile(Achsen, perzentile):
-    return np.percentile(Achsen, perzentile)
-    
-# Funktion zur Berechnung der Perzentile und Visualisierung
-def berechne_perzentile_und_visualisierung(m_achsen):
-    steps = np.linspace(0.01, 1.00, num=100)
-
-    Perc_steps = ['0','5','10','15','20','25','30','35','40','45','50','55','60','65','70','75','80','85','90','95','96','97','98','99','100']
-
-    # Berechnung der Perzentile
-    percentiles_m_achsen = np.quantile(m_achsen, steps)
-    Perc_m_achsen = percentiles_m_achsen[0], percentiles_m_achsen[4], percentiles_m_achsen[9], \
-                        percentiles_m_achsen[14], percentiles_m_achsen[19], percentiles_m_achsen[24], \
-                        percentiles_m_achsen[29], percentiles_m_achsen[34], percentiles_m_achsen[39], \
-                        percentiles_m_achsen[44], percentiles_m_achsen[49], percentiles_m_achsen[54], \
-                        percentiles_m_achsen[59], percentiles_m_achsen[64], percentiles_m_achsen[69], \
-                        percentiles_m_achsen[74], percentiles_m_achsen[79], percentiles_m_achsen[84], \
-                        percentiles_m_achsen[89], percentiles_m_achsen[94], percentiles_m_achsen[95], \
-                        percentiles_m_achsen[96], percentiles_m_achsen[97], percentiles_m_achsen[98], \
-                        percentiles_m_achsen[99]
-
-
-    # Visualisierung der Ergebnisse
-    fig, (ax1, ax2, ax3) = plt.subplots(nrows=1, ncols=3, figsize=(18, 4))
-
-    # Histogramm der Wahrscheinlichkeitsdichte
-    ax1.hist(m_achsen, density=True, bins='auto', histtype='stepfilled', color='tab:blue', alpha=0.3, label='upload pdf')
-    
-    # CDF auf normaler Skala
-    ax2.plot(percentiles_m_achsen, steps, lw=2.0, color='tab:blue', alpha=0.7, label='upload cdf')
-    
-    # CDF auf Log-Skala
-    ax3.plot(percentiles_m_achsen, steps, lw=2.0, color='tab:blue', alpha=0.7, label='upload cdf')
-
-    # Achsenbeschriftungen
-    ax1.set_xlim(left=None, right=None)
-    ax1.set_xlabel('Blockachse a [m]', fontsize=14)
-    ax1.set_ylabel('Wahrscheinlichkeitsdichte f(a)', fontsize=14)
-
-    ax2.set_xlim(left=None, right=None)
-    ax2.set_xlabel('Blockachse a [m]', fontsize=14)
-    ax2.set_ylabel('Kumulative Wahrscheinlichkeit F(a)', fontsize=14)
-
-    ax3.set_xscale('log')
-    ax3.set_xlabel('Blockachse a [m] (log)', fontsize=14)
-    ax3.set_ylabel('Kumulative Wahrscheinlichkeit F(a)', fontsize=14)
-
-    # Legenden
-    ax1.legend(loc='best', frameon=False)
-    ax2.legend(loc='best', frameon=False)
-    ax3.legend(loc='best', frameon=False)
-
-    # Diagramm übergeben
-    return(fig)
-    
 # Funktion zur Anpassung der Verteilungen und Visualisierung
-def passe_verteilungen_an_und_visualisiere(m_achsen, ausgewählte_verteilungen):
-    fig, (ax4, ax5) = plt.subplots(nrows=1, ncols=2, figsize=(12, 4))
-
-    # Histogramm der m_achsen
-    ax4.hist(m_achsen, color='tab:blue', density=True, bins='auto', histtype='stepfilled', alpha=0.3, 
-             label='upload pdf')
-        
-    # CDF für m_achsen (kumulative Verteilung)
-    steps = np.linspace(0.01, 1.00, num=100)
-    percentiles_m_achsen = np.quantile(m_achsen, steps)
-    ax5.plot(percentiles_m_achsen, steps, lw=8.0, color='tab:blue', alpha=0.3, label='upload cdf')
-    
-    # Kumulative Verteilungen und CDF Berechnungen
-        
-    if 'expon' in ausgewählte_verteilungen:
-        loc3, scale3 = stats.expon.fit(m_achsen)
-        X3 = np.linspace(stats.expon.ppf(0.001, loc=loc3, scale=scale3), 
-                         stats.expon.ppf(0.999, loc=loc3, scale=scale3), len(m_achsen))
-        ax4.plot(X3, stats.expon.pdf(X3, loc=loc3, scale=scale3), '#333333', lw=1.0, alpha=0.7, label='expon pdf')
-        ax5.plot(X3, stats.expon.cdf(X3, loc=loc3, scale=scale3), '#333333', lw=1.0, alpha=0.7, label='expon cdf')
-        
-        # Speichern der Parameter in session_state
-        st.session_state.loc3 = loc3
-        st.session_state.scale3 = scale3
-
-    if 'genexpon' in ausgewählte_verteilungen:
-        a1, b1, c1, loc1, scale1 = stats.genexpon.fit(m_achsen)
-        X1 = np.linspace(stats.genexpon.ppf(0.001, a1, b1, c1, loc=loc1, scale=scale1), 
-                         stats.genexpon.ppf(0.999, a1, b1, c1, loc=loc1, scale=scale1), len(m_achsen))
-        ax4.plot(X1, stats.genexpon.pdf(X1, a1, b1, c1, loc=loc1, scale=scale1), '#800020', lw=1.0, alpha=0.7, label='genexpon pdf')
-        ax5.plot(X1, stats.genexpon.cdf(X1, a1, b1, c1, loc=loc1, scale=scale1), '#800020', lw=1.0, alpha=0.7, label='genexpon cdf')
-
-        # Speichern der Parameter in session_state
-        st.session_state.a1 = a1
-        st.session_state.b1 = b1
-        st.session_state.c1 = c1
-        st.session_state.loc1 = loc1
-        st.session_state.scale1 = scale1
-                
-    #if 'lognorm' in ausgewählte_verteilungen:
-    #    shape2, loc2, scale2 = stats.lognorm.fit(m_achsen, floc=0)
-    #    X2 = np.linspace(stats.lognorm.ppf(0.001, shape2, loc=loc2, scale=scale2), 
-    #                     stats.lognorm.ppf(0.999, shape2, loc=loc2, scale=scale2), len(m_achsen))
-    #    ax4.plot(X2, stats.lognorm.pdf(X2, shape2, loc=loc2, scale=scale2), '#00008B', lw=1.0, alpha=0.7, label='lognorm pdf')
-    #    ax5.plot(X2, stats.lognorm.cdf(X2, shape2, loc=loc2, scale=scale2), '#00008B', lw=1.0, alpha=0.7, label='lognorm cdf')
-
-        # Speichern der Parameter in session_state
-    #    st.session_state.shape2 = shape2
-    #    st.session_state.loc2 = loc2
-    #    st.session_state.scale2 = scale2
-        
-    if 'powerlaw' in ausgewählte_verteilungen:
-        a4, loc4, scale4 = stats.powerlaw.fit(m_achsen)
-        X4 = np.linspace(stats.powerlaw.ppf(0.001, a4, loc=loc4, scale=scale4), 
-                         stats.powerlaw.ppf(0.999, a4, loc=loc4, scale=scale4), len(m_achsen))
-        ax4.plot(X4, stats.powerlaw.pdf(X4, a4, loc=loc4, scale=scale4), '#006400', lw=1.0, alpha=0.7, label='powerlaw pdf')
-        ax5.plot(X4, stats.powerlaw.cdf(X4, a4, loc=loc4, scale=scale4), '#006400', lw=1.0, alpha=0.7, label='powerlaw cdf')
-
-        # Speichern der Parameter in session_state
-        st.session_state.a4 = a4
-        st.session_state.loc4 = loc4
-        st.session_state.scale4 = scale4
-    
-    # Berechne das Histogramm (counts und bins)
-    counts, bins = np.histogram(m_achsen, bins='auto', density=True)
-        # Finde den maximalen Wert des Histogramms
-    max_y_value = max(counts)
-
-    # Achsen für das Diagramm
-    ax4.legend(loc='best', frameon=False)
-    ax4.set_ylim(0, max_y_value * 1.1)
-    ax4.set_xlabel('Blockachse a [m]', fontsize=12)
-    ax4.set_ylabel('Wahrscheinlichkeitsdichte f(a)', fontsize=12)
-    
-    ax5.legend(loc='best', frameon=False)
-    ax5.set_xscale('log')
-    ax5.set_xlabel('Blockachse a [m] (log)', fontsize=12)
-    ax5.set_ylabel('Kumulative Wahrscheinlichkeit F(a)', fontsize=12)
-    
-    # Parameter und Diagramm übergeben
-    return fig
+# Die Anpassungen laufen parallel; Zwischenstände werden im platzhalter angezeigt
+# bootstrap_replikate > 0 berechnet zusätzlich Konfidenzintervalle (session_state.bootstrap)
+# Liefert das Diagramm als PNG-Bytes; bei unveränderten Parametern aus den Artefakten der Sitzung
+def passe_verteilungen_an_und_visualisiere(m_achsen, ausgewählte_verteilungen, platzhalter=None, bootstrap_replikate=0):
+    import matplotlib.pyplot as plt
+    from bgv_core import zeichne_angepasste_verteilungen
+    from bgv_fit import fitte_verteilungen_parallel
+
+    zusammenfassung = als_zusammenfassung(m_achsen)
+
+    # Warmstart mit den vorherigen Parametern, wenn sie zur selben Quelle gehören (z.B. nur die Dichte geändert)
+    quelle = (st.session_state.get('datensatz_kennung') or ())[:2]
+    startwerte = {}
+    if quelle and st.session_state.get('parameter_quelle') == quelle:
+        startwerte = {name: tuple(st.session_state[param] for param in namen)
+                      for name, namen in SESSION_PARAMETER.items() if all(param in st.session_state for param in namen)}
+    st.session_state.parameter_quelle = quelle
+
+    # Nach dem Ergänzen von Blöcken: expon geschlossen, die übrigen mit den Parametern vor der Ergänzung
+    inkrementell = st.session_state.get('inkrementell')
+    parameter = {}
+    with messung.stufe("anpassung", verteilungen=len(ausgewählte_verteilungen)):
+        if inkrementell is not None and inkrementell.zusammenfassung().daten_hash == zusammenfassung.daten_hash:
+            ergebnisse = inkrementell.passe_an(ausgewählte_verteilungen, timeout=FIT_TIMEOUT_S,
+                                               fit_cache=hole_fit_cache())
+        else:
+            ergebnisse = fitte_verteilungen_parallel(zusammenfassung.sortiert, ausgewählte_verteilungen,
+                                                     timeout=FIT_TIMEOUT_S, fit_cache=hole_fit_cache(),
+                                                     daten_hash=zusammenfassung.daten_hash, startwerte=startwerte)
+        for anzahl, ergebnis in enumerate(ergebnisse, start=1):
+            # Dauer der Anpassung im Worker-Prozess (Speicher dort nicht gemessen)
+            messung.eintragen(f"fit_{ergebnis.name}", ergebnis.dauer, status=ergebnis.status)
+            namen_session = SESSION_PARAMETER.get(ergebnis.name, ())
+            if ergebnis.parameter is not None:
+                parameter[ergebnis.name] = ergebnis.parameter
+                # Speichern der Parameter in session_state
+                for schluessel, wert in zip(namen_session, ergebnis.parameter):
+                    st.session_state[schluessel] = wert
+            else:
+                # Veraltete Parameter eines früheren Datensatzes entfernen
+                for schluessel in namen_session:
+                    if schluessel in st.session_state:
+                        del st.session_state[schluessel]
+                st.warning(f"Anpassung '{ergebnis.name}' fehlgeschlagen ({ergebnis.status}): {ergebnis.meldung}")
+
+            # Zwischenstand zeigen, solange noch Anpassungen laufen
+            if platzhalter is not None and anzahl < len(ausgewählte_verteilungen):
+                with messung.stufe("diagramm_zwischenstand"):
+                    fig = zeichne_angepasste_verteilungen(zusammenfassung, parameter)
+                with messung.stufe("pyplot_zwischenstand"):
+                    platzhalter.pyplot(fig)
+                plt.close(fig)
+
+    # Konfidenzintervalle der Perzentile für Tabelle und CDF-Bänder
+    st.session_state.bootstrap = None
+    if bootstrap_replikate and parameter:
+        with st.spinner(f"Bootstrap mit {bootstrap_replikate} Replikaten ..."), \
+                messung.stufe("bootstrap", replikate=bootstrap_replikate):
+            st.session_state.bootstrap = hole_bootstrap(zusammenfassung.daten_hash, tuple(parameter.items()),
+                                                        bootstrap_replikate, zusammenfassung)
+
+    if platzhalter is not None:
+        platzhalter.empty()
+
+    # Diagramm übergeben (nur bei neuen Parametern oder Konfidenzintervallen neu gezeichnet)
+    kennung = (zusammenfassung.daten_hash, tuple(parameter.items()),
+               bootstrap_replikate if st.session_state.bootstrap is not None else 0)
+    png = artefakte.hole("fig2", kennung)
+    if png is None:
+        with messung.stufe("diagramm_verteilungen"):
+            png = artefakte.setze("fig2", als_png(zeichne_angepasste_verteilungen(zusammenfassung, parameter,
+                                                                                  st.session_state.bootstrap)), kennung)
+    return png
     
-# Function to calculate percentiles for a distribution
-def calculate_percentiles(distribution, percentiles, *params):
-    return [distribution.ppf(p / 100, *params) for p in percentiles]
-
 # Streamlit App
 
 # Set page configuration
@@ -198,9 +273,22 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Zeige das Logo zu Beginn der App
-logo = Image.open("pi-geotechnik-1-RGB-192-30-65.png")  # Lade das Bild
-st.image(logo, caption="https://pi-geo.at/", width=300)  # Zeige das Logo an
+# Laufzeitmessung dieses Durchlaufs (Anzeige in der Seitenleiste, Trace-Datei für die Auswertung)
+if 'sitzung_id' not in st.session_state:
+    st.session_state.sitzung_id = uuid.uuid4().hex[:12]
+st.session_state.durchlauf = st.session_state.get('durchlauf', 0) + 1
+zeige_messwerte = st.sidebar.checkbox("Messwerte anzeigen (Dauer und Speicher je Schritt)")
+speicher_messen = st.sidebar.checkbox("Speicher messen (tracemalloc, langsamer)", value=MESSUNG_SPEICHER)
+messung = Messprotokoll(speicher=speicher_messen, logger=hole_trace_logger(),
+                        kontext={"sitzung": st.session_state.sitzung_id, "durchlauf": st.session_state.durchlauf})
+
+# Abgeleitete Artefakte der Sitzung (Diagramme als PNG, Tabellen, Ranglisten) mit Speicherbudget
+if 'artefakte' not in st.session_state:
+    st.session_state.artefakte = ArtefaktSpeicher(int(SITZUNG_BUDGET_MB * 2**20))
+artefakte = st.session_state.artefakte
+
+# Zeige das Logo zu Beginn der App (aus dem gemeinsamen Cache, nicht bei jedem Rerun neu geladen)
+st.image(hole_logo(), caption="https://pi-geo.at/", width=300)  # Zeige das Logo an
 
 st.title("Blockgrößenverteilung")
 st.markdown("""
@@ -208,251 +296,99 @@ st.markdown("""
     
     Version 1, Mar 2025
     
-    This application visualizes block size distributions, fits distribution functions to them and (coming soon) returns blocklists of the fitted distribution for rockfall simulation (with THROW).
+    This application visualizes block size distributions, fits distribution functions to them and returns blocklists of the fitted distribution for rockfall simulation (with THROW).
 """)
 
-# URL der Beispiel-Datei auf GitHub
-example_file_1_url = "https://github.com/pi-geotechnik/Blockverteilung/raw/main/blocklist_dachsteinkalk_m3.txt"
-example_file_3_url = "https://github.com/pi-geotechnik/Blockverteilung/raw/main/blocklist_mils_rauwacke_m3.txt" 
-example_file_4_url = "https://github.com/pi-geotechnik/Blockverteilung/raw/main/blocklist_rossatz_orthogneis_m3.txt" 
-example_file_5_url = "https://github.com/pi-geotechnik/Blockverteilung/raw/main/blocklist_vals_schiefer_m3.txt" 
+# Zeit bis zur ersten Anzeige (Kopf der Seite) in diesem Durchlauf
+messung.eintragen("erste_anzeige", time.perf_counter() - DURCHLAUF_START)
+
+# Mitgelieferte Beispiel-Dateien (liegen neben der App, kein Download nötig)
+beispiele = hole_beispiele()
 
 # Auswahl der Einheit
-einheit = st.selectbox("Wählen Sie die Einheit der Eingabedaten:", ["Volumen in m³", "Masse in t (Dichte erforderlich)"])
+einheit = st.selectbox("Wählen Sie die Einheit der Eingabedaten:", ["Volumen in m³", "Masse in t (Dichte erforderlich)",
+                                                                   "Tabelle mit Lithologien (CSV/Excel)"])
 
 # Überprüfen, ob sich die Einheit geändert hat
 if 'einheit' in st.session_state and st.session_state.einheit != einheit:
     # Löschen von m_achsen, falls es bereits existiert
-    if 'm_achsen' in st.session_state:
-        del st.session_state['m_achsen']
-    # Löschen von vorhandenen Figuren, falls sie im session_state existieren
-    if 'fig1' in st.session_state:
-        del st.session_state['fig1']
-    if 'fig2' in st.session_state:
-        del st.session_state['fig2']
+    for schluessel in ['m_achsen', 'zusammenfassung', 'datensatz_kennung', 'inkrementell']:
+        if schluessel in st.session_state:
+            del st.session_state[schluessel]
+    # Löschen von vorhandenen Figuren, falls sie in den Artefakten existieren
+    artefakte.entferne('fig1')
+    artefakte.entferne('fig2')
     # Optional: Anzeige einer Nachricht, dass m_achsen gelöscht wurde
-    st.warning("Bitte laden Sie eine Blockdatei hoch. Achtung: Bitte stellen Sie sicher, dass alle Zahlen in der hochgeladenen Textdatei den Punkt ('.') statt des Kommas (',') als Dezimaltrennzeichen verwenden!")
+    st.warning("Bitte laden Sie eine Blockdatei hoch. Punkt ('.') und Komma (',') werden als Dezimaltrennzeichen akzeptiert, nicht lesbare Zeilen werden mit Zeilennummer gemeldet.")
     
 # Speichern der Auswahl im session_state
 st.session_state.einheit = einheit  # Speichert die ausgewählte Einheit
 
 
 if einheit == "Volumen in m³":
-    # Button für die Auswahl der Beispiel-Datei 1 Kalk
-    if st.button("Beispiel-Datei 'Kalk' laden"):
-        # Beispiel-Datei aus GitHub laden
-        response = requests.get(example_file_1_url)
-        
-        if response.status_code == 200:
-            # Erstelle ein 'BytesIO'-Objekt aus der heruntergeladenen Datei, um sie wie eine hochgeladene Datei zu behandeln
-            example_file_content = response.content
-            uploaded_file = io.BytesIO(example_file_content)  # Dies ist die "hochgeladene" Beispiel-Datei
-            
-            # Speichern der Datei im session_state
-            st.session_state.uploaded_file = uploaded_file
-            #st.write(st.session_state.uploaded_file)
-            
-            # Zeige die erfolgreiche Meldung an
-            st.success("Die Beispiel-Datei 'Kalk' wurde erfolgreich geladen.")
-            
-            # Verarbeite die Datei, als ob sie über den file_uploader hochgeladen wurde
-            file_content = uploaded_file.read().decode("utf-8")  # Beispiel: als Textdatei lesen
-            st.text_area("Inhalt der Datei:", file_content, height=200)  # Zeige den Inhalt der Datei als Text an
-            
+    # Buttons für die Auswahl der Beispiel-Dateien
+    for beispiel in beispiele.values():
+        if st.button(f"Beispiel-Datei '{beispiel.anzeigename}' laden"):
             try:
-                # Text in Zahlen (m³) umwandeln
-                werte_liste = [float(val.strip()) for val in file_content.splitlines() if val.strip().replace(".", "", 1).isdigit()]
+                # Sortierte Volumina aus dem gemeinsamen Cache (einmal eingelesen, danach mmap)
+                with messung.stufe("beispiel_laden", beispiel=beispiel.schluessel):
+                    werte = hole_beispiel_werte(beispiel.schluessel)
                 
-                # Filtere nur Werte mit genau drei Dezimalstellen und entferne 0.00-Werte
-                werte = [wert for wert in werte_liste if wert >= 0.000]
+                # Zeige die erfolgreiche Meldung an
+                st.success(f"Die Beispiel-Datei '{beispiel.anzeigename}' wurde erfolgreich geladen.")
                 
-                # Sortieren der Werte in aufsteigender Reihenfolge
-                werte.sort()
+                zeige_textvorschau(hole_beispiel_text(beispiel.schluessel))  # Zeige den Anfang der Datei als Text an
                 
                 # Anzahl der Werte ausgeben
                 st.write(f"Anzahl der Blöcke: {len(werte)}")
                 
-                # Berechnung der dritten Wurzel (Achsen in Metern)
-                m_achsen = [berechne_dritte_wurzel(val) for val in werte]
+                # Berechnung der dritten Wurzel (Achsen in Metern), vektorisiert über das ganze Array
+                with messung.stufe("dritte_wurzel", bloecke=len(werte)):
+                    from bgv_core import berechne_dritte_wurzel
+                    m_achsen = berechne_dritte_wurzel(werte)
                 
-                # Speichern von m_achsen in session_state für spätere Verwendung
-                st.session_state.m_achsen = m_achsen
+                # Speichern von m_achsen und ihrer Zusammenfassung in session_state für spätere Verwendung
+                setze_m_achsen(m_achsen, ("beispiel", beispiel.schluessel), f"blocklist_{beispiel.schluessel}_m3")
                 
             except Exception as e:
                 st.error(f"Fehler bei der Verarbeitung der Daten: {e}")
-        
-        else:
-            st.error("Fehler beim Laden der Datei.")
-   
-    # Button für die Auswahl der Beispiel-Datei 3 Rauwacke
-    if st.button("Beispiel-Datei 'Rauwacke' laden"):
-        # Beispiel-Datei aus GitHub laden
-        response = requests.get(example_file_3_url)
-        
-        if response.status_code == 200:
-            # Erstelle ein 'BytesIO'-Objekt aus der heruntergeladenen Datei, um sie wie eine hochgeladene Datei zu behandeln
-            example_file_content = response.content
-            uploaded_file = io.BytesIO(example_file_content)  # Dies ist die "hochgeladene" Beispiel-Datei
-            
-            # Speichern der Datei im session_state
-            st.session_state.uploaded_file = uploaded_file
-            #st.write(st.session_state.uploaded_file)
-            
-            # Zeige die erfolgreiche Meldung an
-            st.success("Die Beispiel-Datei 'Rauwacke' wurde erfolgreich geladen.")
-            
-            # Verarbeite die Datei, als ob sie über den file_uploader hochgeladen wurde
-            file_content = uploaded_file.read().decode("utf-8")  # Beispiel: als Textdatei lesen
-            st.text_area("Inhalt der Datei:", file_content, height=200)  # Zeige den Inhalt der Datei als Text an
-            
-            try:
-                # Text in Zahlen (m³) umwandeln
-                werte_liste = [float(val.strip()) for val in file_content.splitlines() if val.strip().replace(".", "", 1).isdigit()]
-                
-                # Filtere nur Werte mit genau drei Dezimalstellen und entferne 0.00-Werte
-                werte = [wert for wert in werte_liste if wert >= 0.000]
-                
-                # Sortieren der Werte in aufsteigender Reihenfolge
-                werte.sort()
-                
-                # Anzahl der Werte ausgeben
-                st.write(f"Anzahl der Blöcke: {len(werte)}")
-                
-                # Berechnung der dritten Wurzel (Achsen in Metern)
-                m_achsen = [berechne_dritte_wurzel(val) for val in werte]
-                
-                # Speichern von m_achsen in session_state für spätere Verwendung
-                st.session_state.m_achsen = m_achsen
-                
-            except Exception as e:
-                st.error(f"Fehler bei der Verarbeitung der Daten: {e}")
-        
-        else:
-            st.error("Fehler beim Laden der Datei.")
-    
-    # Button für die Auswahl der Beispiel-Datei 4 Orthogneis
-    if st.button("Beispiel-Datei 'Orthogneis' laden"):
-        # Beispiel-Datei aus GitHub laden
-        response = requests.get(example_file_4_url)
-        
-        if response.status_code == 200:
-            # Erstelle ein 'BytesIO'-Objekt aus der heruntergeladenen Datei, um sie wie eine hochgeladene Datei zu behandeln
-            example_file_content = response.content
-            uploaded_file = io.BytesIO(example_file_content)  # Dies ist die "hochgeladene" Beispiel-Datei
-            
-            # Speichern der Datei im session_state
-            st.session_state.uploaded_file = uploaded_file
-            #st.write(st.session_state.uploaded_file)
-            
-            # Zeige die erfolgreiche Meldung an
-            st.success("Die Beispiel-Datei 'Orthogneis' wurde erfolgreich geladen.")
-            
-            # Verarbeite die Datei, als ob sie über den file_uploader hochgeladen wurde
-            file_content = uploaded_file.read().decode("utf-8")  # Beispiel: als Textdatei lesen
-            st.text_area("Inhalt der Datei:", file_content, height=200)  # Zeige den Inhalt der Datei als Text an
-            
-            try:
-                # Text in Zahlen (m³) umwandeln
-                werte_liste = [float(val.strip()) for val in file_content.splitlines() if val.strip().replace(".", "", 1).isdigit()]
-                
-                # Filtere nur Werte mit genau drei Dezimalstellen und entferne 0.00-Werte
-                werte = [wert for wert in werte_liste if wert >= 0.000]
-                
-                # Sortieren der Werte in aufsteigender Reihenfolge
-                werte.sort()
-                
-                # Anzahl der Werte ausgeben
-                st.write(f"Anzahl der Blöcke: {len(werte)}")
-                
-                # Berechnung der dritten Wurzel (Achsen in Metern)
-                m_achsen = [berechne_dritte_wurzel(val) for val in werte]
-                
-                # Speichern von m_achsen in session_state für spätere Verwendung
-                st.session_state.m_achsen = m_achsen
-                
-            except Exception as e:
-                st.error(f"Fehler bei der Verarbeitung der Daten: {e}")
-        
-        else:
-            st.error("Fehler beim Laden der Datei.")
-            
-    # Button für die Auswahl der Beispiel-Datei 5 Schiefer
-    if st.button("Beispiel-Datei 'Schiefer' laden"):
-        # Beispiel-Datei aus GitHub laden
-        response = requests.get(example_file_5_url)
-        
-        if response.status_code == 200:
-            # Erstelle ein 'BytesIO'-Objekt aus der heruntergeladenen Datei, um sie wie eine hochgeladene Datei zu behandeln
-            example_file_content = response.content
-            uploaded_file = io.BytesIO(example_file_content)  # Dies ist die "hochgeladene" Beispiel-Datei
-            
-            # Speichern der Datei im session_state
-            st.session_state.uploaded_file = uploaded_file
-            #st.write(st.session_state.uploaded_file)
-            
-            # Zeige die erfolgreiche Meldung an
-            st.success("Die Beispiel-Datei 'Schiefer' wurde erfolgreich geladen.")
-            
-            # Verarbeite die Datei, als ob sie über den file_uploader hochgeladen wurde
-            file_content = uploaded_file.read().decode("utf-8")  # Beispiel: als Textdatei lesen
-            st.text_area("Inhalt der Datei:", file_content, height=200)  # Zeige den Inhalt der Datei als Text an
-            
-            try:
-                # Text in Zahlen (m³) umwandeln
-                werte_liste = [float(val.strip()) for val in file_content.splitlines() if val.strip().replace(".", "", 1).isdigit()]
-                
-                # Filtere nur Werte mit genau drei Dezimalstellen und entferne 0.00-Werte
-                werte = [wert for wert in werte_liste if wert >= 0.000]
-                
-                # Sortieren der Werte in aufsteigender Reihenfolge
-                werte.sort()
-                
-                # Anzahl der Werte ausgeben
-                st.write(f"Anzahl der Blöcke: {len(werte)}")
-                
-                # Berechnung der dritten Wurzel (Achsen in Metern)
-                m_achsen = [berechne_dritte_wurzel(val) for val in werte]
-                
-                # Speichern von m_achsen in session_state für spätere Verwendung
-                st.session_state.m_achsen = m_achsen
-                
-            except Exception as e:
-                st.error(f"Fehler bei der Verarbeitung der Daten: {e}")
-        
-        else:
-            st.error("Fehler beim Laden der Datei.")
 
     
     # Falls der Benutzer eine Datei hochladen möchte
-    uploaded_file = st.file_uploader("Eigene Datei mit m³-Werten hochladen:", type=["txt"])
+    uploaded_file = st.file_uploader("Eigene Datei mit m³-Werten (oder exportierten Achsen) hochladen:",
+                                     type=UPLOAD_ENDUNGEN)
     
     if uploaded_file is not None:
-        # Speichern der hochgeladenen Datei im session_state
-        st.session_state.uploaded_file = uploaded_file
-        #st.write(st.session_state.uploaded_file)
+        # Die hochgeladene Datei wird nicht im session_state gehalten, nur die eingelesenen Achsen
         st.write("Dieses file muss gelöscht werden, bevor Sie die Beispiel-Datei 'Dachsteinkalk' laden.")
 
-        file_content = uploaded_file.read().decode("utf-8")
-        st.text_area("Inhalt der Datei:", file_content, height=200)
+        zeige_upload(uploaded_file)
         
         try:
-            # Text in Zahlen (m³) umwandeln
-            werte_liste = [float(val.strip()) for val in file_content.splitlines() if val.strip().replace(".", "", 1).isdigit()]
-            
-            # Filtere nur Werte mit genau drei Dezimalstellen und entferne 0.00-Werte
-            werte = [wert for wert in werte_liste if wert >= 0.000]
-            
-            # Sortieren der Werte in aufsteigender Reihenfolge
-            werte.sort()
+            # Nur eine neue Datei wird eingelesen, sortiert und zusammengefasst, nicht jeder Rerun
+            kennung = ("m3", uploaded_file.file_id)
+            if not ist_geladen(kennung):
+                # Datei in Zahlen (m³) umwandeln, negative Werte werden als ungültig gemeldet
+                # (binäre Formate ohne Textparser und ohne Kopie aus dem Upload-Puffer)
+                eingelesen = lese_werte_mit_meldung(uploaded_file.getvalue(), min_wert=0.0, dateiname=uploaded_file.name)
+                
+                if eingelesen.achsen:
+                    # Exportierte Achsen [m] sind bereits sortiert und werden direkt übernommen
+                    m_achsen = sortiert(eingelesen.werte)
+                else:
+                    # Sortieren der Werte in aufsteigender Reihenfolge (bereits sortierte Dateien ohne Kopie)
+                    werte = sortiert(eingelesen.werte)
+                    
+                    # Berechnung der dritten Wurzel (Achsen in Metern), vektorisiert über das ganze Array
+                    with messung.stufe("dritte_wurzel", bloecke=len(werte)):
+                        from bgv_core import berechne_dritte_wurzel
+                        m_achsen = berechne_dritte_wurzel(werte)
+                
+                # Speichern von m_achsen und ihrer Zusammenfassung in session_state für spätere Verwendung
+                setze_m_achsen(m_achsen, kennung, uploaded_file.name)
             
             # Anzahl der Werte ausgeben
-            st.write(f"Anzahl der Blöcke: {len(werte)}")
-            
-            # Berechnung der dritten Wurzel (Achsen in Metern)
-            m_achsen = [berechne_dritte_wurzel(val) for val in werte]
-            
-            # Speichern von m_achsen in session_state für spätere Verwendung
-            st.session_state.m_achsen = m_achsen
+            st.write(f"Anzahl der Blöcke: {len(st.session_state.m_achsen)}")
             
         except Exception as e:
             st.error(f"Fehler bei der Verarbeitung der Daten: {e}")
@@ -460,121 +396,316 @@ if einheit == "Volumen in m³":
 
 # Datei-Upload für Masse in t (Dichte erforderlich)
 if einheit == "Masse in t (Dichte erforderlich)":
-    uploaded_file = st.file_uploader("Eigene Datei mit t-Werten hochladen:", type=["txt"])
+    uploaded_file = st.file_uploader("Eigene Datei mit t-Werten hochladen:", type=UPLOAD_ENDUNGEN)
     if uploaded_file is not None:
-        text = uploaded_file.read().decode("utf-8")
-        st.text_area("Inhalt der Datei:", text, height=200)
+        zeige_upload(uploaded_file)
 
         try:
-            # Text in Zahlen (Tonnen) umwandeln
-            tonnen = [float(val.strip()) for val in text.splitlines() if val.strip().replace(".", "", 1).isdigit()]
-            
-            # Sortieren der Werte in aufsteigender Reihenfolge
-            tonnen.sort()
-            
-            # Anzahl der Werte ausgeben
-            st.write(f"Anzahl der Blöcke: {len(tonnen)}")
-            
             # Eingabe der Dichte in kg/m³
             dichte_kg_m3 = st.number_input("Geben Sie die Dichte in kg/m³ ein:", min_value=0, value=2650, step=10)
             
-            # Umrechnung von Tonnen in m³
-            werte_m3 = [val * 1000 / dichte_kg_m3 for val in tonnen]
-
-            # Berechnung der dritten Wurzel (Achsen in Metern)
-            m_achsen = [berechne_dritte_wurzel(val) for val in werte_m3]
-            # st.write("Achsen in Metern:")
-            # st.write(m_achsen)
-
-            # Visualisierung der Histogramme
-            # visualisiere_histogramm_m3_und_m(m_achsen, werte_m3)
+            # Nur bei neuer Datei oder geänderter Dichte neu einlesen und zusammenfassen
+            kennung = ("t", uploaded_file.file_id, dichte_kg_m3)
+            if not ist_geladen(kennung):
+                # Datei in Zahlen (Tonnen) umwandeln
+                eingelesen = lese_werte_mit_meldung(uploaded_file.getvalue(), min_wert=0.0, dateiname=uploaded_file.name)
+                
+                if eingelesen.achsen:
+                    # Exportierte Achsen [m]: die Dichte ist bereits berücksichtigt
+                    st.info("Die Datei enthält exportierte Achsen in m, die Dichte wird nicht verwendet.")
+                    m_achsen = sortiert(eingelesen.werte)
+                else:
+                    # Sortieren der Werte in aufsteigender Reihenfolge
+                    tonnen = sortiert(eingelesen.werte)
+                    
+                    # Umrechnung von Tonnen in m³
+                    werte_m3 = tonnen * 1000 / dichte_kg_m3
+
+                    # Berechnung der dritten Wurzel (Achsen in Metern)
+                    with messung.stufe("dritte_wurzel", bloecke=len(werte_m3)):
+                        from bgv_core import berechne_dritte_wurzel
+                        m_achsen = berechne_dritte_wurzel(werte_m3)
+                # st.write("Achsen in Metern:")
+                # st.write(m_achsen)
+
+                # Visualisierung der Histogramme
+                # visualisiere_histogramm_m3_und_m(m_achsen, werte_m3)
+                
+                # Speichere m_achsen und ihre Zusammenfassung in session_state für spätere Verwendung
+                setze_m_achsen(m_achsen, kennung, uploaded_file.name)
             
-            # Speichere m_achsen in session_state für spätere Verwendung
-            st.session_state.m_achsen = m_achsen
+            # Anzahl der Werte ausgeben
+            st.write(f"Anzahl der Blöcke: {len(st.session_state.m_achsen)}")
 
         except Exception as e:
             st.error(f"Fehler bei der Verarbeitung der Daten: {e}")  
 
 
+# Ergänzung weiterer Blöcke zum geladenen Datensatz (z.B. neue Feldaufnahmen einer Kampagne)
+# Die neuen Achsen werden in die sortierten Achsen eingefügt, der Bestand wird nicht neu eingelesen oder sortiert
+if einheit != "Tabelle mit Lithologien (CSV/Excel)" and 'm_achsen' in st.session_state:
+    with st.expander("Blöcke ergänzen (neue Aufnahmen zum geladenen Datensatz)"):
+        ergaenzung = st.file_uploader("Weitere Blöcke in derselben Einheit (oder exportierte Achsen) hochladen:",
+                                      type=UPLOAD_ENDUNGEN, key="ergaenzung")
+        kennung = st.session_state.get('datensatz_kennung') or ()
+        if ergaenzung is not None and ("ergaenzung", ergaenzung.file_id) in kennung:
+            st.caption(f"'{ergaenzung.name}' ist bereits im Datensatz enthalten.")
+        elif ergaenzung is not None and st.button("Blöcke hinzufügen"):
+            try:
+                eingelesen = lese_werte_mit_meldung(ergaenzung.getvalue(), min_wert=0.0, dateiname=ergaenzung.name)
+                neue_achsen = eingelesen.werte
+                if not eingelesen.achsen:
+                    if kennung[:1] == ("t",):
+                        # Umrechnung von Tonnen in m³ mit der Dichte des Datensatzes
+                        neue_achsen = neue_achsen * 1000 / kennung[2]
+                    from bgv_core import berechne_dritte_wurzel
+                    neue_achsen = berechne_dritte_wurzel(neue_achsen)
+
+                from bgv_inkrementell import InkrementellerDatensatz
+                inkrementell = st.session_state.get('inkrementell')
+                if inkrementell is None:
+                    # Die Parameter des Bestands dienen als Startwerte der nächsten Anpassung
+                    vorherige = {}
+                    if st.session_state.get('parameter_quelle') == kennung[:2]:
+                        vorherige = {name: tuple(st.session_state[param] for param in namen)
+                                     for name, namen in SESSION_PARAMETER.items()
+                                     if all(param in st.session_state for param in namen)}
+                    inkrementell = InkrementellerDatensatz(st.session_state.m_achsen, ist_sortiert=True,
+                                                           parameter=vorherige)
+                with messung.stufe("ergaenzen", bloecke=len(neue_achsen), bestand=inkrementell.anzahl):
+                    inkrementell.ergaenze(neue_achsen)
+                    zusammenfassung = inkrementell.zusammenfassung()
+
+                st.session_state.inkrementell = inkrementell
+                st.session_state.m_achsen = inkrementell.sortiert
+                st.session_state.zusammenfassung = zusammenfassung
+                st.session_state.datensatz_kennung = kennung + (("ergaenzung", ergaenzung.file_id),)
+                st.success(f"{len(neue_achsen)} Blöcke ergänzt, der Datensatz enthält jetzt {inkrementell.anzahl} Blöcke.")
+            except Exception as e:
+                st.error(f"Fehler beim Ergänzen der Blöcke: {e}")
+
+
+# Tabelle mit mehreren Lithologien bzw. Ablösebereichen (Volumen oder Masse mit Dichte je Zeile)
+if einheit == "Tabelle mit Lithologien (CSV/Excel)":
+    tabellen_datei = st.file_uploader("Tabelle mit einer Zeile pro Block hochladen (Spalten z.B. Lithologie; Volumen [m³] "
+                                      "oder Masse [t]; Dichte [kg/m³]):", type=["csv", "txt", "xlsx", "xls"])
+    if tabellen_datei is not None:
+        from bgv_tabelle import (berechne_tabellen_achsen, erkenne_spalten, gruppen_perzentile_als_dataframe,
+                                 gruppen_uebersicht, teile_nach_gruppen, verarbeite_gruppen)
+        try:
+            # Die Tabelle wird nur einmal pro Datei mit pandas eingelesen (solange sie im Speicherbudget bleibt)
+            tabelle = artefakte.hole("tabelle", tabellen_datei.file_id)
+            if tabelle is None:
+                from bgv_tabelle import lese_tabelle
+                with messung.stufe("tabelle_lesen", bytes=tabellen_datei.size) as info:
+                    tabelle = artefakte.setze("tabelle", lese_tabelle(tabellen_datei.getvalue(), tabellen_datei.name),
+                                              tabellen_datei.file_id)
+                    info.update(zeilen=len(tabelle))
+            st.dataframe(tabelle.head(100), height=200)
+            st.write(f"Anzahl der Zeilen: {len(tabelle)}")
+
+            # Zuordnung der Spalten (automatisch erkannt, änderbar)
+            erkannt = erkenne_spalten(tabelle)
+            optionen = ["(keine)"] + [str(s) for s in tabelle.columns]
+            spalten = {}
+            for spalte_ui, (rolle, beschriftung) in zip(st.columns(4), [("gruppe", "Lithologie/Bereich"),
+                                                                     ("volumen", "Volumen [m³]"),
+                                                                     ("masse", "Masse [t]"),
+                                                                     ("dichte", "Dichte [kg/m³]")]):
+                vorgabe = optionen.index(str(erkannt[rolle])) if erkannt[rolle] is not None else 0
+                wahl = spalte_ui.selectbox(beschriftung, optionen, index=vorgabe, key=f"tabelle_spalte_{rolle}")
+                spalten[rolle] = tabelle.columns[optionen.index(wahl) - 1] if wahl != "(keine)" else None
+            standard_dichte = st.number_input("Dichte in kg/m³ für Zeilen ohne Dichte:", min_value=0, value=2650, step=10)
+
+            # Umrechnung, Anpassung und Perzentile aller Gruppen nur bei neuer Datei oder geänderter Zuordnung
+            tabellen_kennung = (tabellen_datei.file_id, tuple(sorted((k, str(v)) for k, v in spalten.items())),
+                                standard_dichte)
+            tabellen_ergebnis = artefakte.hole("tabellen_ergebnis", tabellen_kennung)
+            if tabellen_ergebnis is None:
+                with messung.stufe("tabelle_achsen", zeilen=len(tabelle)) as info:
+                    achsen = berechne_tabellen_achsen(tabelle, spalten, standard_dichte)
+                    gruppen_achsen = teile_nach_gruppen(achsen.gruppen, achsen.m_achsen)
+                    info.update(gruppen=len(gruppen_achsen), abgelehnt=achsen.anzahl_abgelehnt)
+                fortschritt = st.progress(0.0, text="Anpassung der Gruppen …")
+                gruppen_ergebnisse = []
+                with messung.stufe("tabelle_gruppen", gruppen=len(gruppen_achsen)):
+                    for g in verarbeite_gruppen(gruppen_achsen, timeout=FIT_TIMEOUT_S,
+                                                cache_verzeichnis=FIT_CACHE_VERZEICHNIS, fit_cache=hole_fit_cache()):
+                        gruppen_ergebnisse.append(g)
+                        fortschritt.progress(len(gruppen_ergebnisse) / len(gruppen_achsen),
+                                             text=f"Gruppe '{g.gruppe}' fertig ({len(gruppen_ergebnisse)}/{len(gruppen_achsen)})")
+                fortschritt.empty()
+                gruppen_ergebnisse.sort(key=lambda g: g.gruppe)
+                tabellen_ergebnis = artefakte.setze("tabellen_ergebnis", (achsen, gruppen_achsen, gruppen_ergebnisse),
+                                                    tabellen_kennung)
+            achsen, gruppen_achsen, gruppen_ergebnisse = tabellen_ergebnis
+
+            if achsen.anzahl_abgelehnt:
+                zeilen = ", ".join(f"{nummer} ('{text}')" for nummer, text in achsen.abgelehnt[:10])
+                if achsen.anzahl_abgelehnt > 10:
+                    zeilen += ", …"
+                st.warning(f"{achsen.anzahl_abgelehnt} Zeile(n) ohne gültiges Volumen (bzw. Masse und Dichte) "
+                           f"wurden übersprungen: {zeilen}")
+            for g in gruppen_ergebnisse:
+                if g.ergebnis is None:
+                    st.info(f"Gruppe '{g.gruppe}' wurde nicht angepasst: {g.meldung}")
+
+            # Übersicht und Perzentile je Gruppe
+            st.dataframe(gruppen_uebersicht(achsen), hide_index=True)
+            angepasst = [g for g in gruppen_ergebnisse if g.ergebnis is not None]
+            if angepasst:
+                tabellen_einheit = st.radio("Einheit der Perzentile:", ['m³', 'm'], horizontal=True, key="tabelle_einheit")
+                gruppen_tabelle = gruppen_perzentile_als_dataframe(angepasst, tabellen_einheit)
+                auswahl = st.selectbox("Gruppe:", [g.gruppe for g in angepasst])
+                st.dataframe(gruppen_tabelle[gruppen_tabelle["Gruppe"] == auswahl], hide_index=True)
+                st.download_button("Perzentile aller Gruppen als CSV herunterladen",
+                                   gruppen_tabelle.to_csv(index=False, sep=";", decimal=",").encode("utf-8-sig"),
+                                   file_name="perzentile_gruppen.csv", mime="text/csv")
+
+                # Eine Gruppe in die Darstellung und Anpassung unten übernehmen (Zusammenfassung liegt schon vor)
+                kennung = ("tabelle", tabellen_kennung, auswahl)
+                if st.session_state.get('datensatz_kennung') != kennung:
+                    st.session_state.m_achsen = gruppen_achsen[auswahl]
+                    st.session_state.zusammenfassung = next(g.ergebnis.zusammenfassung for g in angepasst
+                                                            if g.gruppe == auswahl)
+                    st.session_state.datensatz_kennung = kennung
+                    st.session_state.datensatz_name = f"{basisname(tabellen_datei.name)}_{auswahl}"
+                st.write(f"Anzahl der Blöcke in '{auswahl}': {len(st.session_state.m_achsen)}")
+            else:
+                st.warning("Keine Gruppe enthält genug gültige Blöcke für eine Anpassung.")
+
+        except Exception as e:
+            st.error(f"Fehler bei der Verarbeitung der Tabelle: {e}")
+
+
+# Export der sortierten Achsen; spätere Sitzungen und Stapelläufe laden sie ohne Textparser und dritte Wurzel
+if 'm_achsen' in st.session_state:
+    with st.expander("Achsen exportieren"):
+        export_format = st.selectbox("Format:", verfuegbare_exportformate(), key="export_format")
+        # Die Datei wird erst beim Klick erzeugt, nicht bei jedem Rerun
+        st.download_button("Sortierte Achsen [m] herunterladen",
+                           partial(exportiere_werte, st.session_state.m_achsen, export_format),
+                           file_name=export_dateiname(st.session_state.get('datensatz_name'), export_format),
+                           mime=EXPORT_FORMATE[export_format][1])
+
+
 # Darstellung
 st.subheader("Visualisierung der Wahrscheinlichkeitsverteilung")
 
+# Achsen und Zusammenfassung des aktuellen Datensatzes zählen fest zum Speicherbudget der Sitzung
+artefakte.setze_grundlast(schaetze_groesse((st.session_state.get('m_achsen'), st.session_state.get('zusammenfassung'))))
+
 # Berechnung und Visualisierung
-if 'einheit' in st.session_state:
-    if st.session_state.einheit == "Volumen in m³" and 'm_achsen' in st.session_state:
-        # Aufruf der Funktion zur Berechnung und Visualisierung mit m_achsen
-        fig1 = berechne_perzentile_und_visualisierung(st.session_state.m_achsen)
-        st.session_state.fig1 = fig1  # Speichern von fig1 im session_state
-    elif st.session_state.einheit == "Masse in t (Dichte erforderlich)" and 'm_achsen' in st.session_state:
-        # Aufruf der Funktion zur Berechnung und Visualisierung mit m_achsen
-        fig1 = berechne_perzentile_und_visualisierung(st.session_state.m_achsen)
-        st.session_state.fig1 = fig1  # Speichern von fig1 im session_state
+# (für alle Einheiten gleich: m_achsen und Zusammenfassung liegen im session_state)
+fig1 = None
+if 'einheit' in st.session_state and 'm_achsen' in st.session_state:
+    # Das Diagramm wird einmal pro Datensatz gezeichnet und als PNG gespeichert, die Figur danach geschlossen
+    fig1 = artefakte.hole("fig1", st.session_state.zusammenfassung.daten_hash)
+    if fig1 is None:
+        with messung.stufe("diagramm_perzentile"):
+            from bgv_core import berechne_perzentile_und_visualisierung
+            fig1 = artefakte.setze("fig1", als_png(berechne_perzentile_und_visualisierung(st.session_state.zusammenfassung)),
+                                   st.session_state.zusammenfassung.daten_hash)
 
 # Anzeige der gespeicherten Grafiken
-if 'fig1' in st.session_state:
-    st.pyplot(st.session_state.fig1)  # Zeigt fig1 an, wenn es im session_state gespeichert ist
+if fig1 is not None:
+    with messung.stufe("pyplot_perzentile"):
+        st.image(fig1, width="stretch")  # Zeigt fig1 an (PNG aus den Artefakten der Sitzung)
 
 
 # Anpassung einer Wahrscheinlichkeitsfunktion
 st.subheader("Anpassung von Wahrscheinlichkeitsfunktionen")
 
+# Bootstrap-Konfidenzintervalle (Tabelle und Bänder in der CDF), nur mit geladener Blockliste
+bootstrap_replikate = 0
+if 'm_achsen' in st.session_state:
+    from bgv_bootstrap import BOOTSTRAP_REPLIKATE
+    mit_bootstrap = st.checkbox("Konfidenzintervalle per Bootstrap berechnen", value=False)
+    bootstrap_replikate = st.number_input("Anzahl der Bootstrap-Replikate:", min_value=100, max_value=10_000,
+                                          value=BOOTSTRAP_REPLIKATE, step=100) if mit_bootstrap else 0
+
 # Alle Verteilungen werden automatisch berechnet und visualisiert
-if 'einheit' in st.session_state:
-    if st.session_state.einheit == "Volumen in m³" and 'm_achsen' in st.session_state:
-        fig2 = passe_verteilungen_an_und_visualisiere(st.session_state.m_achsen, ['genexpon', 'expon', 'powerlaw'])
-        st.session_state.fig2 = fig2
-    elif st.session_state.einheit == "Masse in t (Dichte erforderlich)" and 'm_achsen' in st.session_state:
-        # Aufruf der Funktion zur Berechnung und Visualisierung mit m_achsen
-        fig2 = passe_verteilungen_an_und_visualisiere(st.session_state.m_achsen, ['genexpon', 'expon', 'powerlaw'])
-        st.session_state.fig2 = fig2  # Speichern von fig2 im session_state
+fig2 = None
+if 'einheit' in st.session_state and 'm_achsen' in st.session_state:
+    # Aufruf der Funktion zur Berechnung und Visualisierung mit m_achsen (PNG aus den Artefakten der Sitzung)
+    fig2 = passe_verteilungen_an_und_visualisiere(st.session_state.zusammenfassung, ['genexpon', 'expon', 'powerlaw'], st.empty(),
+                                                  int(bootstrap_replikate))
 
 # Visualisierung der berechneten Verteilungen
-if 'fig2' in st.session_state:
-    st.pyplot(st.session_state.fig2)
+if fig2 is not None:
+    with messung.stufe("pyplot_verteilungen"):
+        st.image(fig2, width="stretch")
+
+# Trefferstatistik des Fit-Caches in der Seitenleiste
+cache_statistik = hole_fit_cache().statistik()
+st.sidebar.caption(
+    f"Fit-Cache: {cache_statistik['treffer']} Treffer "
+    f"(davon {cache_statistik['disk_treffer']} von Festplatte), "
+    f"{cache_statistik['fehlschlaege']} Fehlschläge, "
+    f"{cache_statistik['eintraege']}/{cache_statistik['max_eintraege']} Einträge"
+)
+
+
+# Automatische Auswahl aus dem scipy.stats-Katalog (auf Knopfdruck, weil deutlich aufwendiger)
+with st.expander("Automatische Verteilungsauswahl (Rangliste)"):
+    if 'zusammenfassung' in st.session_state:
+        from bgv_auswahl import KRITERIEN, katalog_verteilungen, rangliste_als_dataframe, waehle_verteilungen
+        from bgv_core import zeichne_angepasste_verteilungen
+
+        katalog = st.radio("Kandidaten:", ["Standardliste für Blockgrößen", "gesamter scipy.stats-Katalog"])
+        kriterium = st.selectbox("Rangfolge nach:", list(KRITERIEN), format_func=KRITERIEN.get)
+        zusammenfassung = st.session_state.zusammenfassung
+        if st.button("Rangliste berechnen"):
+            fortschritt_balken = st.progress(0.0)
+            def fortschritt(stufe, fertig, gesamt):
+                text = "Teilstichprobe" if stufe == 1 else "alle Blöcke"
+                fortschritt_balken.progress(fertig / gesamt, text=f"Stufe {stufe} ({text}): {fertig}/{gesamt}")
+            with messung.stufe("rangliste", kriterium=kriterium):
+                artefakte.setze("rangliste", (kriterium, waehle_verteilungen(
+                    zusammenfassung, katalog_verteilungen() if katalog.startswith("gesamter") else None, kriterium,
+                    timeout=FIT_TIMEOUT_S, fit_cache=hole_fit_cache(), fortschritt=fortschritt)), zusammenfassung.daten_hash)
+            fortschritt_balken.empty()
+
+        # Rangliste nur zum aktuellen Datensatz anzeigen
+        rang_ergebnis = artefakte.hole("rangliste", zusammenfassung.daten_hash)
+        if rang_ergebnis is not None:
+            rang_kriterium, rangliste = rang_ergebnis
+            st.dataframe(rangliste_als_dataframe(rangliste, rang_kriterium), hide_index=True)
+            st.caption("Stufe 'voll': auf allen Blöcken bewertet; 'stichprobe'/'verworfen': nur auf der Teilstichprobe "
+                       "(Werte nicht mit 'voll' vergleichbar).")
+            beste = {b.name: b.parameter for b in rangliste if b.stufe == 'voll'}
+            beste = dict(list(beste.items())[:3])
+            if beste:
+                auswahl_kennung = (zusammenfassung.daten_hash, tuple(beste.items()))
+                fig_auswahl = artefakte.hole("fig_auswahl", auswahl_kennung)
+                if fig_auswahl is None:
+                    fig_auswahl = artefakte.setze("fig_auswahl", als_png(zeichne_angepasste_verteilungen(zusammenfassung, beste)),
+                                                  auswahl_kennung)
+                st.image(fig_auswahl, width="stretch")
+    else:
+        st.info("Bitte zuerst eine Blockdatei auswählen oder hochladen.")
 
 
 # Tabelle mit Perzentilen 
 st.subheader("Tabellenvergleich der Perzentilen")
 
 if 'm_achsen' in st.session_state:
-    Perc_steps_short = ['0', '25', '50', '75', '95', '96', '97', '98', '99', '100']
-    percentiles = [0, 25, 50, 75, 95, 96, 97, 98, 99, 100]
+    from bgv_perzentile import TABELLEN_PERZENTILE, berechne_quantil_matrix, quantil_matrix_als_dataframe
+
+    percentiles = TABELLEN_PERZENTILE
 
     # Sicherstellen, dass alle notwendigen Parameter gespeichert sind
-    if all(param in st.session_state for param in ['a1', 'b1', 'c1', 'loc1', 'scale1', 'loc3', 'scale3', 'a4', 'loc4', 'scale4']): # 'shape2', 'loc2', 'scale2', 
+    if all(param in st.session_state for namen in SESSION_PARAMETER.values() for param in namen):
         try:
-            # Berechnung der Perzentile für jede Verteilung
-            L1s = calculate_percentiles(stats.genexpon, percentiles, 
-                                        st.session_state.a1, st.session_state.b1, st.session_state.c1, 
-                                        st.session_state.loc1, st.session_state.scale1)
-            #L2s = calculate_percentiles(stats.lognorm, percentiles, 
-            #                            st.session_state.shape2, st.session_state.loc2, st.session_state.scale2)
-            L3s = calculate_percentiles(stats.expon, percentiles, 
-                                        st.session_state.loc3, st.session_state.scale3)
-            L4s = calculate_percentiles(stats.powerlaw, percentiles, 
-                                        st.session_state.a4, st.session_state.loc4, st.session_state.scale4)
-            
-            # Sicherstellen, dass alle Perzentile als numpy-Array vorliegen
-            upload_perz = berechne_perzentile(m_achsen, [0, 25, 50, 75, 95, 96, 97, 98, 99, 100])
-            upload_perz = np.array(upload_perz)
-            L1s = np.array(L1s)
-            #L2s = np.array(L2s)
-            L3s = np.array(L3s)
-            L4s = np.array(L4s)
-
-            upload_perz3 = upload_perz**3
-            L1s3 = L1s**3
-            #L2s3 = L2s**3
-            L3s3 = L3s**3
-            L4s3 = L4s**3
+            # Parameter aller Verteilungen in der Reihenfolge der Tabellenspalten
+            parameter = {name: tuple(st.session_state[param] for param in SESSION_PARAMETER[name])
+                         for name in ['expon', 'genexpon', 'powerlaw']}
+
+            # Berechnung der Perzentile (m und m³) für die Daten und alle Verteilungen in einem Schritt
+            with messung.stufe("quantile", perzentile=len(percentiles)):
+                matrix = berechne_quantil_matrix(percentiles, parameter, st.session_state.zusammenfassung)
+                df1 = quantil_matrix_als_dataframe(matrix, 'm³', st.session_state.get('bootstrap'))
             
-            df1 = pd.DataFrame({
-                "percentile": Perc_steps_short,
-                "upload [m³]": upload_perz3,
-                "expon [m³]": L3s3,
-                "genexpon [m³]": L1s3,
-                "powerlaw [m³]": L4s3
-            })
             # CSS-Styling für bestimmte Zeilen (5.-8. Zeile fett drucken)
             # Setze die Formatierung von Zeilen 5 bis 8 auf fett
             styled_df = df1.style.apply(lambda x: ['font-weight: bold' if 5 <= i <= 8 else '' for i in range(len(x))], axis=1)
@@ -582,6 +713,18 @@ if 'm_achsen' in st.session_state:
             styled_df = styled_df.hide(axis="index")
             # Zeige den DataFrame ohne Index und mit den gestylten Zeilen
             st.dataframe(styled_df)
+            if st.session_state.get('bootstrap') is not None:
+                bootstrap = st.session_state.bootstrap
+                st.caption(f"{bootstrap.niveau:.0%}-Konfidenzintervalle aus Perzentil-Bootstrap; Replikate je Spalte: "
+                           + ", ".join(f"{spalte} {anzahl}" for spalte, anzahl in bootstrap.replikate.items()))
+
+            # Feines Perzentilraster (0.1 %) als Download, ebenfalls ein ppf-Aufruf pro Verteilung
+            with messung.stufe("quantile_fein", perzentile=1001):
+                feine_matrix = berechne_quantil_matrix(np.round(np.arange(0, 1001) / 10, 1), parameter,
+                                                       st.session_state.zusammenfassung)
+            st.download_button("Perzentiltabelle im 0.1 %-Raster herunterladen (CSV)",
+                               quantil_matrix_als_dataframe(feine_matrix, 'm³').to_csv(index=False),
+                               file_name="perzentile_0.1_prozent.csv", mime="text/csv")
 
         except Exception as e:
             if 'einheit' in st.session_state:
@@ -589,4 +732,151 @@ if 'm_achsen' in st.session_state:
                 if 'm_achsen' not in st.session_state:
                     st.error("Blockliste erforderlich. Bitte auswählen oder hochladen!")
                 else:
-                    st.error(f"Bitte laden Sie die Beispiel-Datei neu.")
\ No newline at end of file
+                    st.error(f"Bitte laden Sie die Beispiel-Datei neu.")
+
+
+# Blockliste für die Steinschlagsimulation
+st.subheader("Blockliste für die Steinschlagsimulation (THROW)")
+
+verfügbare_verteilungen = [name for name in ['genexpon', 'expon', 'powerlaw']
+                           if all(param in st.session_state for param in SESSION_PARAMETER[name])]
+if 'm_achsen' in st.session_state and verfügbare_verteilungen:
+    from bgv_throw import erzeuge_blockliste_datei
+
+    throw_verteilung = st.selectbox("Verteilung für die Blockliste:", verfügbare_verteilungen)
+    throw_anzahl = st.number_input("Anzahl der Blöcke:", min_value=1, max_value=10_000_000, value=10_000, step=1_000)
+    throw_seed = st.number_input("Seed (gleicher Seed ergibt die gleiche Blockliste):", min_value=0, value=1, step=1)
+    throw_max_volumen = st.number_input("Maximales Blockvolumen [m³] (0 = ohne Begrenzung):", min_value=0.0, value=0.0, step=1.0)
+    throw_komprimiert = st.checkbox("gzip-komprimiert herunterladen (.txt.gz)", value=True)
+
+    throw_parameter = tuple(st.session_state[param] for param in SESSION_PARAMETER[throw_verteilung])
+    throw_dateiname = f"blocklist_{throw_verteilung}_{throw_anzahl}_seed{throw_seed}_m3.txt" + (".gz" if throw_komprimiert else "")
+    # Die Blockliste wird erst beim Klick auf den Download blockweise in eine temporäre Datei geschrieben
+    st.download_button(
+        "Blockliste erzeugen und herunterladen",
+        partial(erzeuge_blockliste_datei, throw_verteilung, throw_parameter, int(throw_anzahl), int(throw_seed),
+                throw_komprimiert, throw_max_volumen or None),
+        file_name=throw_dateiname,
+        mime="application/gzip" if throw_komprimiert else "text/plain",
+        on_click="ignore",
+    )
+else:
+    st.info("Für eine Blockliste müssen zuerst Verteilungen an eine Blockdatei angepasst werden.")
+
+
+# Vergleich mehrerer Datensätze (Beispiele und aktueller Datensatz) in einem Diagramm und einer Tabelle
+with st.expander("Vergleich mehrerer Datensätze"):
+    vergleich_optionen = {beispiel.anzeigename: beispiel.schluessel for beispiel in beispiele.values()}
+    if 'm_achsen' in st.session_state:
+        vergleich_optionen[f"Aktueller Datensatz ({st.session_state.get('datensatz_name') or 'ohne Namen'})"] = None
+    vergleich_auswahl = st.multiselect("Datensätze:", list(vergleich_optionen), key="vergleich_auswahl")
+    vergleich_verteilungen = st.multiselect("Angepasste Verteilungen im Diagramm:", list(SESSION_PARAMETER),
+                                            default=['genexpon'], key="vergleich_verteilungen")
+    if vergleich_auswahl:
+        from bgv_tabelle import gruppen_perzentile_als_dataframe
+
+        try:
+            datensaetze = {name: st.session_state.m_achsen if vergleich_optionen[name] is None
+                           else hole_beispiel_achsen(vergleich_optionen[name]) for name in vergleich_auswahl}
+
+            # Alle Verteilungen werden angepasst (gleicher Schlüssel für alle Sitzungen), gezeigt nur die gewählten
+            vergleich_fortschritt = st.progress(0.0, text="Anpassung der Datensätze …")
+            with messung.stufe("vergleich", datensaetze=len(datensaetze)):
+                vergleich_ergebnisse = hole_vergleichs_speicher().hole(
+                    datensaetze, timeout=FIT_TIMEOUT_S, cache_verzeichnis=FIT_CACHE_VERZEICHNIS,
+                    fit_cache=hole_fit_cache(),
+                    fortschritt=lambda name, fertig, gesamt: vergleich_fortschritt.progress(
+                        fertig / gesamt, text=f"'{name}' fertig ({fertig}/{gesamt})"))
+            vergleich_fortschritt.empty()
+
+            for g in vergleich_ergebnisse.values():
+                if g.ergebnis is None:
+                    st.warning(f"'{g.gruppe}' ({g.anzahl} Blöcke) wurde nicht angepasst: {g.meldung}")
+            angepasst = [g for g in vergleich_ergebnisse.values() if g.ergebnis is not None]
+            if angepasst:
+                vergleich_kennung = tuple((g.gruppe, g.ergebnis.zusammenfassung.daten_hash) for g in angepasst)
+                with messung.stufe("diagramm_vergleich"):
+                    png = hole_vergleich_png(vergleich_kennung, angepasst, tuple(vergleich_verteilungen))
+                st.image(png, width="stretch")
+
+                vergleich_einheit = st.radio("Einheit der Perzentile:", ['m³', 'm'], horizontal=True,
+                                             key="vergleich_einheit")
+                vergleich_tabelle = gruppen_perzentile_als_dataframe(angepasst, vergleich_einheit).rename(
+                    columns={"Gruppe": "Datensatz"})
+                st.dataframe(vergleich_tabelle, hide_index=True)
+                st.download_button("Perzentile des Vergleichs als CSV herunterladen",
+                                   vergleich_tabelle.to_csv(index=False, sep=";", decimal=",").encode("utf-8-sig"),
+                                   file_name="perzentile_vergleich.csv", mime="text/csv")
+        except Exception as e:
+            st.error(f"Fehler beim Vergleich der Datensätze: {e}")
+
+
+# Zusammenführung mehrerer Kampagnen über Quantil-Skizzen (ohne alle Rohdaten im Speicher)
+with st.expander("Kampagnen zusammenführen (speichersparender Skizzen-Modus)"):
+    kampagnen = st.file_uploader("Blocklisten mit m³-Werten oder gespeicherte Skizzen (.npz) mehrerer Kampagnen:",
+                                 type=UPLOAD_ENDUNGEN + ["npz"], accept_multiple_files=True, key="kampagnen")
+    if kampagnen:
+        from io import BytesIO
+
+        import matplotlib.pyplot as plt
+        import pandas as pd
+        from bgv_perzentile import TABELLEN_PERZENTILE
+        from bgv_skizze import QuantilSkizze, skizze_aus_blockliste, zeichne_skizze
+
+        try:
+            gesamt_skizze = QuantilSkizze()
+            for kampagne in kampagnen:
+                if kampagne.name.endswith(".npz"):
+                    skizze, abgelehnt = QuantilSkizze.laden(kampagne), 0
+                else:
+                    # Blockweise einlesen, die Rohdaten werden nicht gesammelt
+                    skizze, abgelehnt = skizze_aus_blockliste(kampagne)
+                st.write(f"{kampagne.name}: {skizze.anzahl} Blöcke, {abgelehnt} abgelehnte Zeilen")
+                gesamt_skizze.vereinigen(skizze)
+
+            st.write(f"Zusammen: {gesamt_skizze.anzahl} Blöcke "
+                     + ("(exakt)" if gesamt_skizze.ist_exakt else f"(Rangfehler höchstens {gesamt_skizze.max_rangfehler:.2%})"))
+            fig_skizze = zeichne_skizze(gesamt_skizze)
+            st.pyplot(fig_skizze)
+            plt.close(fig_skizze)
+
+            skizze_achsen = gesamt_skizze.perzentile(TABELLEN_PERZENTILE)
+            st.dataframe(pd.DataFrame({
+                "percentile": [str(p) for p in TABELLEN_PERZENTILE],
+                "upload [m]": skizze_achsen,
+                "upload [m³]": skizze_achsen ** 3,
+            }), hide_index=True)
+
+            skizze_puffer = BytesIO()
+            gesamt_skizze.speichern(skizze_puffer)
+            st.download_button("Zusammengeführte Skizze herunterladen (.npz)", skizze_puffer.getvalue(),
+                               file_name="skizze_kampagnen.npz", mime="application/octet-stream")
+        except Exception as e:
+            st.error(f"Fehler bei der Verarbeitung der Kampagnen: {e}")
+
+
+# Speicher der Sitzung (Datensatz und Artefakte) in der Seitenleiste
+sitzung_statistik = artefakte.statistik()
+st.sidebar.caption(
+    f"Sitzungsspeicher: {sitzung_statistik['belegt'] / 2**20:.1f}/{sitzung_statistik['budget'] / 2**20:g} MB "
+    f"({len(sitzung_statistik['artefakte'])} Artefakte, {sitzung_statistik['verdraengt']} verdrängt)"
+)
+
+
+# Messwerte dieses Durchlaufs in der Seitenleiste (alle Stufen stehen zusätzlich in der Trace-Datei)
+dauer_durchlauf = time.perf_counter() - DURCHLAUF_START
+messung.eintragen("durchlauf", dauer_durchlauf)
+messung.beenden()
+if zeige_messwerte:
+    import pandas as pd
+
+    with st.sidebar.expander("Messwerte dieses Durchlaufs", expanded=True):
+        st.dataframe(pd.DataFrame([{
+            "Schritt": "· " * e["ebene"] + e["stufe"],
+            "Dauer [ms]": round(e["dauer_s"] * 1000, 1),
+            "Speicher [MB]": round(e["speicher_bytes"] / 2**20, 2) if e["speicher_bytes"] is not None else None,
+            "Details": ", ".join(f"{k}={v}" for k, v in e.items()
+                                 if k not in ("stufe", "dauer_s", "speicher_bytes", "ebene")),
+        } for e in messung.eintraege]), hide_index=True)
+        st.caption(f"Durchlauf {st.session_state.durchlauf}: {dauer_durchlauf:.2f} s · "
+                   f"Trace: {TRACE_DATEI or 'aus'}")
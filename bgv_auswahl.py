@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  automatische Auswahl der Verteilungsfunktion (Rangliste)
+# Stufe 1: alle Kandidaten auf einer Teilstichprobe anpassen und bewerten,
+#          aussichtslose Kandidaten verwerfen
+# Stufe 2: nur die besten Kandidaten auf allen m_achsen neu anpassen
+# Bewertung mit KS, Anderson-Darling, AIC und BIC
+# --------------------------------------------------------------
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from bgv_core import benenne_parameter
+from bgv_fit import fitte_verteilungen_parallel
+from bgv_zusammenfassung import als_zusammenfassung
+
+# Kandidaten für Blockgrößen (positive, rechtsschiefe Verteilungen und einige Vergleichsverteilungen)
+AUSWAHL_KANDIDATEN = [
+    'expon', 'genexpon', 'powerlaw', 'lognorm', 'gamma', 'weibull_min', 'exponweib', 'exponpow',
+    'gengamma', 'genpareto', 'pareto', 'lomax', 'fisk', 'burr12', 'invgauss', 'invgamma', 'betaprime',
+    'halfnorm', 'rayleigh', 'nakagami', 'fatiguelife', 'loglaplace', 'genextreme', 'gumbel_r', 'norm',
+]
+
+# Verteilungen des Katalogs, die nicht angepasst werden (ohne fit oder um Größenordnungen zu langsam)
+AUSGESCHLOSSEN = {'irwinhall', 'levy_stable', 'studentized_range'}
+
+# Bewertungskriterien (kleiner ist besser) und ihre Anzeigenamen
+KRITERIEN = {'aic': 'AIC', 'bic': 'BIC', 'ks': 'Kolmogorov-Smirnov', 'ad': 'Anderson-Darling'}
+
+# Größe der Teilstichprobe für Stufe 1, Anzahl der Kandidaten für Stufe 2
+SCREENING_STICHPROBE = 2000
+VERFEINERN = 5
+
+# Kandidaten mit einer KS-Statistik über PRUNING_FAKTOR x der besten gelten als aussichtslos
+PRUNING_FAKTOR = 3.0
+
+# Zeitlimit pro Anpassung in Stufe 1 (Sekunden)
+SCREENING_TIMEOUT = 20
+
+# Untergrenze für log F und log(1 - F) in der Anderson-Darling-Statistik
+LOG_MIN = np.log(np.finfo(np.float64).tiny)
+
+# Stufen in der Reihenfolge der Rangliste: auf allen Daten bewertet, nur auf der Stichprobe,
+# in Stufe 1 verworfen, Anpassung fehlgeschlagen
+STUFEN = ['voll', 'stichprobe', 'verworfen', 'fehler']
+
+# Bewertung eines Kandidaten; stufe ist einer der Werte aus STUFEN
+Bewertung = namedtuple('Bewertung', ['name', 'parameter', 'ks', 'ad', 'aic', 'bic', 'loglik', 'anzahl',
+                                     'stufe', 'status', 'dauer', 'meldung'])
+
+
+# Funktion zur Liste aller stetigen Verteilungen in scipy.stats (ohne AUSGESCHLOSSEN)
+def katalog_verteilungen():
+    return sorted(name for name in dir(stats)
+                  if isinstance(getattr(stats, name), stats.rv_continuous) and name not in AUSGESCHLOSSEN)
+
+
+# Funktion zur Bewertung einer angepassten Verteilung auf sortierten Daten
+def bewerte_anpassung(name, parameter, sortiert):
+    verteilung = getattr(stats, name)
+    n = len(sortiert)
+    with np.errstate(all='ignore'):
+        loglik = float(np.sum(verteilung.logpdf(sortiert, *parameter)))
+        log_f = np.clip(np.nan_to_num(verteilung.logcdf(sortiert, *parameter), nan=LOG_MIN), LOG_MIN, 0)
+        log_s = np.clip(np.nan_to_num(verteilung.logsf(sortiert, *parameter), nan=LOG_MIN), LOG_MIN, 0)
+
+    # Kolmogorov-Smirnov: größter Abstand zwischen empirischer und angepasster CDF
+    f = np.exp(log_f)
+    i = np.arange(1, n + 1)
+    ks = float(max(np.max(i / n - f), np.max(f - (i - 1) / n)))
+
+    # Anderson-Darling: gewichtet die Ränder (große Blöcke) stärker
+    ad = float(-n - np.mean((2 * i - 1) * (log_f + log_s[::-1])))
+
+    k = len(parameter)
+    if not np.isfinite(loglik):
+        loglik = -np.inf
+    return ks, ad, 2 * k - 2 * loglik, k * np.log(n) - 2 * loglik, loglik
+
+
+# Funktion zur Umwandlung eines FitErgebnis in eine Bewertung
+def _bewertung(fit, sortiert, stufe):
+    if fit.parameter is None:
+        return Bewertung(fit.name, None, np.inf, np.inf, np.inf, np.inf, -np.inf, len(sortiert),
+                         'fehler', fit.status, fit.dauer, fit.meldung)
+    return Bewertung(fit.name, fit.parameter, *bewerte_anpassung(fit.name, fit.parameter, sortiert), len(sortiert),
+                     stufe, fit.status, fit.dauer, fit.meldung)
+
+
+# Funktion für den Sortierschlüssel der Rangliste (erst Stufe, dann Kriterium; NaN zuletzt)
+def rang_schluessel(kriterium):
+    def schluessel(bewertung):
+        wert = getattr(bewertung, kriterium)
+        return STUFEN.index(bewertung.stufe), wert if np.isfinite(wert) else np.inf
+    return schluessel
+
+
+# Funktion zur automatischen Auswahl: liefert alle Bewertungen als Rangliste (beste zuerst)
+# Werte verschiedener Stufen sind nicht vergleichbar (AIC/BIC hängen von der Anzahl der Blöcke ab).
+# fortschritt(stufe, fertig, gesamt) wird nach jeder Anpassung aufgerufen.
+def waehle_verteilungen(m_achsen, kandidaten=None, kriterium='aic', stichprobe=SCREENING_STICHPROBE,
+                        verfeinern=VERFEINERN, pruning_faktor=PRUNING_FAKTOR, timeout_screening=SCREENING_TIMEOUT,
+                        timeout=120, max_workers=None, fit_cache=None, seed=0, fortschritt=None):
+    if kriterium not in KRITERIEN:
+        raise ValueError(f"Unbekanntes Kriterium '{kriterium}', erlaubt: {list(KRITERIEN)}")
+    zusammenfassung = als_zusammenfassung(m_achsen)
+    daten = zusammenfassung.sortiert
+    kandidaten = list(AUSWAHL_KANDIDATEN if kandidaten is None else kandidaten)
+
+    # Kleine Datensätze werden direkt vollständig bewertet (mit Fit-Cache)
+    voll = len(daten) <= stichprobe
+    if voll:
+        teil = daten
+    else:
+        rng = np.random.default_rng(seed)
+        teil = daten[np.sort(rng.choice(len(daten), stichprobe, replace=False))]
+
+    # Stufe 1: alle Kandidaten parallel auf der Teilstichprobe
+    bewertungen = {}
+    for fit in fitte_verteilungen_parallel(teil, kandidaten, timeout=timeout_screening if not voll else timeout,
+                                           max_workers=max_workers, fit_cache=fit_cache if voll else None,
+                                           daten_hash=zusammenfassung.daten_hash if voll else None):
+        bewertungen[fit.name] = _bewertung(fit, teil, 'voll' if voll else 'stichprobe')
+        if fortschritt is not None:
+            fortschritt(1, len(bewertungen), len(kandidaten))
+
+    # Aussichtslose Kandidaten verwerfen (KS weit über dem besten oder Kriterium nicht endlich)
+    gueltig = [b for b in bewertungen.values() if b.stufe != 'fehler']
+    bester_ks = min((b.ks for b in gueltig), default=np.inf)
+    for b in gueltig:
+        if not np.isfinite(getattr(b, kriterium)) or b.ks > pruning_faktor * bester_ks:
+            bewertungen[b.name] = b._replace(stufe='verworfen')
+
+    # Stufe 2: die besten Kandidaten auf allen Daten neu anpassen
+    if not voll:
+        ueberlebende = sorted((b for b in bewertungen.values() if b.stufe == 'stichprobe'),
+                              key=rang_schluessel(kriterium))[:verfeinern]
+        namen = [b.name for b in ueberlebende]
+        for anzahl, fit in enumerate(fitte_verteilungen_parallel(daten, namen, timeout=timeout,
+                                                                 max_workers=max_workers, fit_cache=fit_cache,
+                                                                 daten_hash=zusammenfassung.daten_hash), start=1):
+            bewertungen[fit.name] = _bewertung(fit, daten, 'voll')
+            if fortschritt is not None:
+                fortschritt(2, anzahl, len(namen))
+
+    return sorted(bewertungen.values(), key=rang_schluessel(kriterium))
+
+
+# Funktion zur Umwandlung der Rangliste in eine Tabelle
+def rangliste_als_dataframe(bewertungen, kriterium='aic'):
+    bestes = min((getattr(b, kriterium) for b in bewertungen if b.stufe == 'voll'), default=np.nan)
+    zeilen = []
+    for rang, b in enumerate(bewertungen, start=1):
+        zeilen.append({
+            "Rang": rang,
+            "Verteilung": b.name,
+            "Stufe": b.stufe,
+            "KS": b.ks,
+            "AD": b.ad,
+            "AIC": b.aic,
+            "BIC": b.bic,
+            f"Δ{kriterium.upper()}": getattr(b, kriterium) - bestes if b.stufe == 'voll' else np.nan,
+            "Blöcke": b.anzahl,
+            "Dauer [s]": round(b.dauer, 3),
+            "Parameter": ", ".join(f"{k}={v:.4g}" for k, v in benenne_parameter(b.name, b.parameter).items())
+                         if b.parameter is not None else b.meldung,
+        })
+    return pd.DataFrame(zeilen)
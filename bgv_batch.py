@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  Stapelverarbeitung vieler Blocklisten ohne Streamlit
+#
+# Aufruf:
+#   python bgv_batch.py projektarchiv/ "weitere/blocklist_*_m3.txt" --ausgabe ergebnisse
+#
+# Pro Blockliste werden <name>_perzentile.csv und <name>_parameter.json geschrieben.
+# Die JSON-Datei wird zuletzt geschrieben und dient als Fertig-Markierung:
+# ein abgebrochener Lauf kann mit demselben Aufruf fortgesetzt werden. Dateien, die mit anderen Einstellungen
+# (Dichte, Verteilungen, Perzentile, Exportformat) verarbeitet wurden, werden neu berechnet.
+# --------------------------------------------------------------
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import scipy
+
+from bgv_cache import FitCache
+from bgv_core import benenne_parameter, verarbeite_blockliste
+from bgv_fit import STANDARD_VERTEILUNGEN
+from bgv_formate import EXPORT_FORMATE, basisname, export_dateiname, speichere_werte
+from bgv_perzentile import TABELLEN_PERZENTILE, quantil_matrix_als_dataframe
+
+# Dateimuster, nach dem in Verzeichnissen gesucht wird
+STANDARD_MUSTER = "blocklist_*_m3.txt"
+
+# Zeitlimit je Anpassung in Sekunden
+STANDARD_TIMEOUT_S = 120
+
+
+# Funktion zum Sammeln der Eingabedateien aus Verzeichnissen, Dateien und Glob-Mustern
+def sammle_dateien(eingaben, muster=STANDARD_MUSTER):
+    dateien = []
+    for eingabe in eingaben:
+        if os.path.isdir(eingabe):
+            dateien.extend(glob.glob(os.path.join(eingabe, "**", muster), recursive=True))
+        elif os.path.isfile(eingabe):
+            dateien.append(eingabe)
+        else:
+            dateien.extend(glob.glob(eingabe, recursive=True))
+    # Doppelte entfernen, Reihenfolge stabil halten
+    return sorted({os.path.abspath(d) for d in dateien})
+
+
+# Funktion zur Bestimmung der Ausgabepfade einer Blockliste
+def ausgabe_pfade(datei, ausgabe_verzeichnis):
+    name = basisname(datei)
+    return (os.path.join(ausgabe_verzeichnis, f"{name}_perzentile.csv"),
+            os.path.join(ausgabe_verzeichnis, f"{name}_parameter.json"))
+
+
+# Funktion für den Kennwert einer Eingabedatei (Größe und Änderungszeit)
+def datei_kennung(datei):
+    info = os.stat(datei)
+    return {"groesse": info.st_size, "mtime_ns": info.st_mtime_ns}
+
+
+# Funktion für die Konfiguration eines Laufs (wird im JSON gespeichert; nur bei gleicher Konfiguration
+# gilt eine Blockliste als erledigt)
+def lauf_konfiguration(verteilungen, perzentile, dichte_kg_m3=None, export_format=None):
+    return {
+        "dichte_kg_m3": None if dichte_kg_m3 is None else float(dichte_kg_m3),
+        "verteilungen": list(verteilungen),
+        "perzentile": [float(p) for p in perzentile],
+        "export_format": export_format,
+    }
+
+
+# Funktion zur Prüfung, ob eine Blockliste bereits vollständig und mit derselben Konfiguration verarbeitet wurde
+def ist_erledigt(datei, ausgabe_verzeichnis, konfiguration):
+    csv_pfad, json_pfad = ausgabe_pfade(datei, ausgabe_verzeichnis)
+    if not (os.path.exists(csv_pfad) and os.path.exists(json_pfad)):
+        return False
+    if konfiguration["export_format"] and not os.path.exists(
+            os.path.join(ausgabe_verzeichnis, export_dateiname(datei, konfiguration["export_format"]))):
+        return False
+    try:
+        with open(json_pfad, "r", encoding="utf-8") as f:
+            protokoll = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return protokoll.get("eingabe") == datei_kennung(datei) and protokoll.get("konfiguration") == konfiguration
+
+
+# Funktion zum atomaren Schreiben einer Textdatei (keine halben Dateien bei Abbruch)
+def schreibe_atomar(pfad, text):
+    tmp = f"{pfad}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    os.replace(tmp, pfad)
+
+
+# Funktion zur Verarbeitung einer Blockliste (läuft im Worker-Prozess)
+# export_format (z.B. 'npy') schreibt zusätzlich die sortierten Achsen, die spätere Läufe ohne Textparser laden
+# Die Anpassungen laufen nacheinander in einem eigenen Prozess (FitPool des Workers), damit timeout je Anpassung
+# greift; eine hängende Anpassung wird abgebrochen und als 'timeout' protokolliert.
+def verarbeite_datei(datei, ausgabe_verzeichnis, verteilungen, perzentile, dichte_kg_m3=None, cache_verzeichnis=None,
+                     export_format=None, timeout=STANDARD_TIMEOUT_S):
+    start = time.perf_counter()
+    fit_cache = FitCache(verzeichnis=cache_verzeichnis) if cache_verzeichnis else None
+    ergebnis = verarbeite_blockliste(datei, dichte_kg_m3=dichte_kg_m3, verteilungen=verteilungen,
+                                     perzentile=perzentile, timeout=timeout, max_workers=1, fit_cache=fit_cache)
+
+    # Perzentiltabelle in m und m³
+    tabelle = quantil_matrix_als_dataframe(ergebnis.quantile, 'm').merge(
+        quantil_matrix_als_dataframe(ergebnis.quantile, 'm³'), on="percentile")
+    csv_pfad, json_pfad = ausgabe_pfade(datei, ausgabe_verzeichnis)
+    schreibe_atomar(csv_pfad, tabelle.to_csv(index=False))
+    if export_format:
+        speichere_werte(ergebnis.m_achsen, os.path.join(ausgabe_verzeichnis, export_dateiname(datei, export_format)),
+                        export_format)
+
+    protokoll = {
+        "datei": datei,
+        "eingabe": datei_kennung(datei),
+        "anzahl_bloecke": int(len(ergebnis.werte)),
+        "anzahl_abgelehnt": int(ergebnis.anzahl_abgelehnt),
+        "abgelehnte_zeilen": [[nummer, text] for nummer, text in ergebnis.abgelehnt],
+        "dichte_kg_m3": dichte_kg_m3,
+        "konfiguration": lauf_konfiguration(verteilungen, perzentile, dichte_kg_m3, export_format),
+        "scipy_version": scipy.__version__,
+        "verteilungen": {
+            name: {
+                "status": fit.status,
+                "dauer_s": round(fit.dauer, 4),
+                "meldung": fit.meldung,
+                "parameter": benenne_parameter(name, fit.parameter) if fit.parameter is not None else None,
+            }
+            for name, fit in ergebnis.fit_ergebnisse.items()
+        },
+        "dauer_s": round(time.perf_counter() - start, 4),
+    }
+    # Zuletzt schreiben: die JSON-Datei markiert die Blockliste als erledigt
+    schreibe_atomar(json_pfad, json.dumps(protokoll, indent=2, ensure_ascii=False))
+    return protokoll
+
+
+# Funktion zur Verarbeitung aller Dateien über einen Prozesspool
+def verarbeite_stapel(dateien, ausgabe_verzeichnis, verteilungen=None, perzentile=TABELLEN_PERZENTILE,
+                      prozesse=None, dichte_kg_m3=None, cache_verzeichnis=None, neu=False, export_format=None,
+                      timeout=STANDARD_TIMEOUT_S, ausgabe=print):
+    os.makedirs(ausgabe_verzeichnis, exist_ok=True)
+    verteilungen = list(STANDARD_VERTEILUNGEN if verteilungen is None else verteilungen)
+
+    namen = [os.path.basename(ausgabe_pfade(d, ausgabe_verzeichnis)[1]) for d in dateien]
+    doppelt = {n for n in namen if namen.count(n) > 1}
+    if doppelt:
+        raise ValueError(f"Mehrere Eingabedateien ergeben dieselben Ausgabenamen: {sorted(doppelt)}")
+
+    konfiguration = lauf_konfiguration(verteilungen, perzentile, dichte_kg_m3, export_format)
+    offen = [d for d in dateien if neu or not ist_erledigt(d, ausgabe_verzeichnis, konfiguration)]
+    ausgabe(f"{len(dateien)} Blocklisten gefunden, {len(dateien) - len(offen)} bereits erledigt, {len(offen)} offen")
+
+    fehler = {}
+    with ProcessPoolExecutor(max_workers=prozesse) as executor:
+        futures = {executor.submit(verarbeite_datei, datei, ausgabe_verzeichnis, verteilungen, perzentile,
+                                   dichte_kg_m3, cache_verzeichnis, export_format, timeout): datei for datei in offen}
+        try:
+            for nummer, future in enumerate(as_completed(futures), start=1):
+                datei = futures[future]
+                try:
+                    protokoll = future.result()
+                    ausgabe(f"[{nummer}/{len(offen)}] {os.path.basename(datei)}: "
+                            f"{protokoll['anzahl_bloecke']} Blöcke, {protokoll['dauer_s']:.2f} s")
+                except Exception as e:
+                    fehler[datei] = str(e)
+                    ausgabe(f"[{nummer}/{len(offen)}] {os.path.basename(datei)}: FEHLER {e}")
+        except KeyboardInterrupt:
+            # Fertige Dateien bleiben erhalten; der nächste Aufruf setzt fort
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+    return fehler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Blockgrößenverteilung für viele Blocklisten berechnen")
+    parser.add_argument("eingaben", nargs="+", help="Verzeichnisse, Dateien oder Glob-Muster")
+    parser.add_argument("--ausgabe", default="bgv_ergebnisse", help="Ausgabeverzeichnis für CSV/JSON")
+    parser.add_argument("--muster", default=STANDARD_MUSTER, help="Dateimuster in Verzeichnissen")
+    parser.add_argument("--verteilungen", default=",".join(STANDARD_VERTEILUNGEN),
+                        help="kommagetrennte scipy.stats-Verteilungen")
+    parser.add_argument("--perzentile", default=",".join(str(p) for p in TABELLEN_PERZENTILE),
+                        help="kommagetrennte Perzentile")
+    parser.add_argument("--dichte", type=float, default=None,
+                        help="Dichte in kg/m³, wenn die Listen Massen in t enthalten")
+    parser.add_argument("--prozesse", type=int, default=None, help="Anzahl der Worker-Prozesse")
+    parser.add_argument("--cache-verzeichnis", default=None, help="Verzeichnis für den Fit-Cache")
+    parser.add_argument("--timeout", type=float, default=STANDARD_TIMEOUT_S,
+                        help="Zeitlimit je Anpassung in Sekunden (hängende Anpassungen werden abgebrochen)")
+    parser.add_argument("--neu", action="store_true", help="bereits erledigte Dateien erneut verarbeiten")
+    parser.add_argument("--export-achsen", choices=list(EXPORT_FORMATE), default=None,
+                        help="sortierte Achsen [m] zusätzlich als <name>_achsen_m.<format> schreiben")
+    args = parser.parse_args(argv)
+
+    dateien = sammle_dateien(args.eingaben, args.muster)
+    if not dateien:
+        print("Keine Blocklisten gefunden.", file=sys.stderr)
+        return 1
+
+    fehler = verarbeite_stapel(
+        dateien, args.ausgabe,
+        verteilungen=[v.strip() for v in args.verteilungen.split(",") if v.strip()],
+        perzentile=[float(p) for p in args.perzentile.split(",")],
+        prozesse=args.prozesse, dichte_kg_m3=args.dichte,
+        cache_verzeichnis=args.cache_verzeichnis, neu=args.neu, export_format=args.export_achsen,
+        timeout=args.timeout)
+    return 1 if fehler else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  Register der mitgelieferten Beispiel-Blocklisten
+# Die Dateien blocklist_*_m3.txt neben der App werden einmal eingelesen,
+# als .npy abgelegt und danach speicherabgebildet (mmap) geladen
+# --------------------------------------------------------------
+
+import glob
+import hashlib
+import os
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from bgv_parser import lese_blockliste
+
+# Verzeichnis mit den mitgelieferten Blocklisten
+BEISPIEL_VERZEICHNIS = os.path.dirname(os.path.abspath(__file__))
+
+# Verzeichnis für die vorverarbeiteten .npy-Dateien
+NPY_VERZEICHNIS = os.environ.get("BGV_BEISPIEL_CACHE_DIR", os.path.join(BEISPIEL_VERZEICHNIS, ".bgv_cache", "beispiele"))
+
+# Anzeigenamen der bekannten Beispiele (Schlüssel = Teil zwischen 'blocklist_' und '_m3')
+ANZEIGENAMEN = {
+    'dachsteinkalk': 'Kalk',
+    'mils_rauwacke': 'Rauwacke',
+    'rossatz_orthogneis': 'Orthogneis',
+    'vals_schiefer': 'Schiefer',
+    'langau_paragneis': 'Paragneis',
+}
+
+# Eintrag im Register
+Beispiel = namedtuple('Beispiel', ['schluessel', 'anzeigename', 'pfad'])
+
+_lock = threading.Lock()
+
+
+# Funktion zum Auffinden aller mitgelieferten Beispiel-Blocklisten
+def finde_beispiele(verzeichnis=BEISPIEL_VERZEICHNIS):
+    beispiele = {}
+    for pfad in sorted(glob.glob(os.path.join(verzeichnis, "blocklist_*_m3.txt"))):
+        schluessel = os.path.basename(pfad)[len("blocklist_"):-len("_m3.txt")]
+        anzeigename = ANZEIGENAMEN.get(schluessel, schluessel.replace("_", " ").title())
+        beispiele[schluessel] = Beispiel(schluessel, anzeigename, pfad)
+    # Bekannte Beispiele in der gewohnten Reihenfolge der App zuerst
+    reihenfolge = [s for s in ANZEIGENAMEN if s in beispiele] + [s for s in beispiele if s not in ANZEIGENAMEN]
+    return {s: beispiele[s] for s in reihenfolge}
+
+
+# Funktion zum Pfad der .npy-Datei; der Inhalts-Hash sorgt für Neuaufbau bei geänderter Textdatei
+def _npy_pfad(beispiel, npy_verzeichnis):
+    with open(beispiel.pfad, "rb") as f:
+        inhalt_hash = hashlib.sha256(f.read()).hexdigest()[:16]
+    return os.path.join(npy_verzeichnis, f"{beispiel.schluessel}-{inhalt_hash}.npy")
+
+
+# Funktion zum Laden der sortierten Volumina [m³] eines Beispiels als schreibgeschütztes mmap-Array
+def lade_beispiel(beispiel, npy_verzeichnis=NPY_VERZEICHNIS):
+    pfad = _npy_pfad(beispiel, npy_verzeichnis)
+    with _lock:
+        if not os.path.exists(pfad):
+            werte = np.sort(lese_blockliste(beispiel.pfad, min_wert=0.0).werte)
+            os.makedirs(npy_verzeichnis, exist_ok=True)
+            tmp = f"{pfad}.{os.getpid()}.tmp.npy"
+            np.save(tmp, werte)
+            os.replace(tmp, pfad)  # atomar, damit parallele Prozesse keine halben Dateien laden
+    return np.load(pfad, mmap_mode="r")
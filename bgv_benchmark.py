@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  Benchmark der Verarbeitungsschritte ohne Streamlit
+#
+# Aufruf:
+#   python bgv_benchmark.py --ausgabe benchmark_neu.json
+#   python bgv_benchmark.py --groessen 1000,100000 --vergleich benchmark_alt.json
+#
+# Synthetische Blocklisten (10^3 bis 10^7 Blöcke) werden durch Ziehen mit Zurücklegen
+# aus den mitgelieferten blocklist_*_m3.txt erzeugt. Gemessen werden Einlesen, dritte Wurzel,
+# Zusammenfassung, jede Anpassung, Perzentile und die Diagramme der App (inkl. PNG wie st.pyplot),
+# jeweils Laufzeit und Speicherspitze, sowie Kaltstart und Rerun der App.
+# Die JSON-Ergebnisse verschiedener Commits sind vergleichbar.
+# --------------------------------------------------------------
+
+import os
+
+# Diagramme ohne Bildschirm erzeugen (vor dem Import von matplotlib.pyplot)
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import argparse
+import glob
+import gzip
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+import scipy
+from scipy import stats
+
+from bgv_core import (berechne_dritte_wurzel, berechne_perzentile_und_visualisierung, calculate_percentiles,
+                      zeichne_angepasste_verteilungen)
+from bgv_fit import STANDARD_VERTEILUNGEN, fitte_verteilung
+from bgv_formate import exportiere_werte, lade_blockliste
+from bgv_inkrementell import InkrementellerDatensatz, fuege_sortiert_ein
+from bgv_parser import lese_blockliste
+from bgv_perzentile import TABELLEN_PERZENTILE, berechne_quantil_matrix
+from bgv_throw import schreibe_blockliste
+from bgv_zusammenfassung import Zusammenfassung
+
+# Version des JSON-Formats (bei inkompatiblen Änderungen erhöhen)
+FORMAT_VERSION = 1
+
+# Standardgrößen der synthetischen Blocklisten
+STANDARD_GROESSEN = [10**3, 10**4, 10**5, 10**6, 10**7]
+
+# Dateimuster der mitgelieferten Blocklisten (Grundlage der synthetischen Listen)
+BEISPIEL_MUSTER = "blocklist_*_m3.txt"
+
+# App für die Messung von Kaltstart und Rerun (in einem neuen Prozess über streamlit.testing)
+APP_SKRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "BGV_App.py")
+APP_MESSUNG_CODE = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=300)
+start = time.perf_counter()
+at.run()
+erster = time.perf_counter() - start
+start = time.perf_counter()
+at.run()
+print(json.dumps({"erster": erster, "rerun": time.perf_counter() - start, "fehler": len(at.exception)}))
+"""
+
+# Langsamer als (1 + VERGLEICH_TOLERANZ) x Referenz und um mehr als VERGLEICH_MIN_DIFFERENZ_S
+# gilt beim Vergleich als Verschlechterung (sehr kurze Stufen schwanken stark)
+VERGLEICH_TOLERANZ = 0.2
+VERGLEICH_MIN_DIFFERENZ_S = 0.005
+
+
+# Funktion zum Einlesen aller mitgelieferten Blocklisten als gemeinsamer Vorrat an Volumina [m³]
+def lade_vorrat(verzeichnis=None, muster=BEISPIEL_MUSTER):
+    verzeichnis = verzeichnis or os.path.dirname(os.path.abspath(__file__))
+    dateien = sorted(glob.glob(os.path.join(verzeichnis, muster)))
+    if not dateien:
+        raise FileNotFoundError(f"Keine Blocklisten '{muster}' in {verzeichnis}")
+    return np.concatenate([lese_blockliste(d, min_wert=0.0).werte for d in dateien])
+
+
+# Funktion zur Erzeugung einer synthetischen Blockliste als Text (CRLF, volle Genauigkeit wie die Beispiel-Dateien,
+# damit kleine Volumina nicht als 0 geschrieben werden)
+def erzeuge_blockliste_text(vorrat, anzahl, seed=0):
+    rng = np.random.default_rng(seed)
+    puffer = io.BytesIO()
+    chunks = (rng.choice(vorrat, min(1_000_000, anzahl - start)) for start in range(0, anzahl, 1_000_000))
+    schreibe_blockliste(puffer, chunks)
+    return puffer.getvalue()
+
+
+# Funktion zur Messung einer Stufe: beste und mittlere Laufzeit aus wiederholungen Läufen,
+# Speicherspitze (tracemalloc, erfasst auch numpy) in einem zusätzlichen Lauf, damit die Zeiten unverfälscht bleiben
+def miss_stufe(funktion, wiederholungen=1, speicher=True):
+    dauern = []
+    for _ in range(max(1, wiederholungen)):
+        start = time.perf_counter()
+        ergebnis = funktion()
+        dauern.append(time.perf_counter() - start)
+
+    messung = {"dauer_s": min(dauern), "dauer_median_s": statistics.median(dauern), "wiederholungen": len(dauern)}
+    if speicher:
+        tracemalloc.start()
+        try:
+            funktion()
+            messung["speicher_spitze_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return ergebnis, messung
+
+
+# Funktion zum Zeichnen und Rendern eines Diagramms als PNG (wie st.pyplot), danach schließen
+def rendere_diagramm(fig):
+    puffer = io.BytesIO()
+    fig.savefig(puffer, format="png")
+    plt.close(fig)
+    return puffer.getbuffer().nbytes
+
+
+# Funktion zur Messung aller Stufen für eine synthetische Blockliste
+# Liefert eine Liste von Messungen (eine pro Stufe), in der Reihenfolge der Verarbeitung in der App
+def benchmark_groesse(vorrat, anzahl, verteilungen, wiederholungen=1, speicher=True, seed=0, ausgabe=print):
+    text = erzeuge_blockliste_text(vorrat, anzahl, seed)
+    messungen = []
+
+    def stufe(name, funktion):
+        ergebnis, messung = miss_stufe(funktion, wiederholungen, speicher)
+        messungen.append({"groesse": anzahl, "stufe": name, **messung})
+        ausgabe(f"{anzahl:>10d} {name:28s} {messung['dauer_s'] * 1000:10.1f} ms"
+                + (f" {messung['speicher_spitze_mb']:8.1f} MB" if speicher else ""))
+        return ergebnis
+
+    eingelesen = stufe("parsen", lambda: lese_blockliste(io.BytesIO(text), min_wert=0.0))
+    werte = np.sort(eingelesen.werte)
+    m_achsen = stufe("dritte_wurzel", lambda: berechne_dritte_wurzel(werte))
+    # Dieselbe Liste gzip-komprimiert und die Achsen als .npy-Export (ohne Textparser, ohne Kopie)
+    gzip_daten = gzip.compress(text, compresslevel=6)
+    stufe("laden_gzip", lambda: lade_blockliste(gzip_daten, min_wert=0.0))
+    npy_daten = exportiere_werte(m_achsen, 'npy')
+    stufe("laden_npy", lambda: lade_blockliste(npy_daten, min_wert=0.0))
+    zusammenfassung = stufe("zusammenfassung", lambda: Zusammenfassung(m_achsen, ist_sortiert=True))
+
+    parameter = {}
+    for name in verteilungen:
+        parameter[name] = stufe(f"fit_{name}", lambda name=name: fitte_verteilung(name, zusammenfassung.sortiert))
+
+    stufe("calculate_percentiles", lambda: [calculate_percentiles(getattr(stats, name), TABELLEN_PERZENTILE, *werte)
+                                            for name, werte in parameter.items()])
+    stufe("quantil_matrix", lambda: berechne_quantil_matrix(TABELLEN_PERZENTILE, parameter, zusammenfassung))
+    stufe("diagramm_perzentile", lambda: rendere_diagramm(berechne_perzentile_und_visualisierung(zusammenfassung)))
+    stufe("diagramm_verteilungen",
+          lambda: rendere_diagramm(zeichne_angepasste_verteilungen(zusammenfassung, parameter)))
+
+    # Ergänzung von 1 % neuer Blöcke: Einfügen und Warmstart im Vergleich zu Neusortieren und Neuanpassung
+    neue_achsen = np.random.default_rng(seed + 1).choice(m_achsen, max(1, anzahl // 100))
+    stufe("neu_sortieren", lambda: np.sort(np.concatenate([m_achsen, neue_achsen])))
+    stufe("ergaenzen_einfuegen", lambda: fuege_sortiert_ein(m_achsen, neue_achsen))
+
+    def ergaenzen_und_anpassen():
+        datensatz = InkrementellerDatensatz(m_achsen, ist_sortiert=True, parameter=parameter)
+        datensatz.ergaenze(neue_achsen)
+        return list(datensatz.passe_an(verteilungen, max_workers=0))
+    stufe("ergaenzen_anpassung", ergaenzen_und_anpassen)
+    return messungen
+
+
+# Funktion zur Messung der App: erster Durchlauf in einem neuen Prozess (Startseite ohne Daten, inkl. Importe)
+# und ein Rerun ohne Interaktion; jeweils die beste Zeit aus wiederholungen neuen Prozessen
+def benchmark_app(wiederholungen=1, ausgabe=print):
+    zeiten = {"app_erster_durchlauf": [], "app_rerun": []}
+    for _ in range(max(1, wiederholungen)):
+        lauf = subprocess.run([sys.executable, "-c", APP_MESSUNG_CODE, APP_SKRIPT], capture_output=True, text=True,
+                              cwd=os.path.dirname(APP_SKRIPT))
+        try:
+            ergebnis = json.loads(lauf.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            ausgabe(f"App-Messung nicht möglich (streamlit installiert?): {lauf.stderr.strip()[-300:]}")
+            return []
+        zeiten["app_erster_durchlauf"].append(ergebnis["erster"])
+        zeiten["app_rerun"].append(ergebnis["rerun"])
+
+    messungen = []
+    for name, dauern in zeiten.items():
+        messungen.append({"groesse": 0, "stufe": name, "dauer_s": min(dauern),
+                          "dauer_median_s": statistics.median(dauern), "wiederholungen": len(dauern)})
+        ausgabe(f"{'App':>10s} {name:28s} {min(dauern) * 1000:10.1f} ms")
+    return messungen
+
+
+# Funktion für die Umgebung des Laufs (für den Vergleich zwischen Commits)
+def umgebung():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "matplotlib": matplotlib.__version__,
+        "plattform": platform.platform(),
+        "cpu_anzahl": os.cpu_count(),
+    }
+
+
+# Funktion zur Ausführung des ganzen Benchmarks; liefert das JSON-Protokoll als dict
+def fuehre_benchmark_aus(groessen=STANDARD_GROESSEN, verteilungen=STANDARD_VERTEILUNGEN, wiederholungen=1,
+                         speicher=True, seed=0, app=True, ausgabe=print):
+    vorrat = lade_vorrat()
+    start = time.perf_counter()
+    messungen = benchmark_app(wiederholungen, ausgabe) if app else []
+    for anzahl in groessen:
+        messungen.extend(benchmark_groesse(vorrat, int(anzahl), verteilungen, wiederholungen, speicher, seed, ausgabe))
+    return {
+        "format_version": FORMAT_VERSION,
+        "zeitpunkt": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "umgebung": umgebung(),
+        "seed": seed,
+        "verteilungen": list(verteilungen),
+        "messungen": messungen,
+        "dauer_gesamt_s": time.perf_counter() - start,
+    }
+
+
+# Funktion zur Prüfung, ob eine Stufe deutlich langsamer geworden ist
+def ist_langsamer(dauer_alt, dauer_neu, toleranz=VERGLEICH_TOLERANZ):
+    return dauer_neu > (1 + toleranz) * dauer_alt and dauer_neu - dauer_alt > VERGLEICH_MIN_DIFFERENZ_S
+
+
+# Funktion zum Vergleich zweier Protokolle; liefert Zeilen (groesse, stufe, alt, neu, Faktor) und die Verschlechterungen
+def vergleiche(alt, neu, toleranz=VERGLEICH_TOLERANZ):
+    referenz = {(m["groesse"], m["stufe"]): m for m in alt["messungen"]}
+    zeilen, schlechter = [], []
+    for m in neu["messungen"]:
+        r = referenz.get((m["groesse"], m["stufe"]))
+        if r is None:
+            continue
+        faktor = m["dauer_s"] / r["dauer_s"] if r["dauer_s"] > 0 else np.inf
+        zeile = (m["groesse"], m["stufe"], r["dauer_s"], m["dauer_s"], faktor)
+        zeilen.append(zeile)
+        if ist_langsamer(r["dauer_s"], m["dauer_s"], toleranz):
+            schlechter.append(zeile)
+    return zeilen, schlechter
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Laufzeit und Speicher der BGV-Verarbeitungsschritte messen")
+    parser.add_argument("--groessen", default=",".join(str(g) for g in STANDARD_GROESSEN),
+                        help="kommagetrennte Anzahlen der Blöcke")
+    parser.add_argument("--verteilungen", default=",".join(STANDARD_VERTEILUNGEN),
+                        help="kommagetrennte scipy.stats-Verteilungen")
+    parser.add_argument("--wiederholungen", type=int, default=1, help="Läufe pro Stufe (beste Zeit zählt)")
+    parser.add_argument("--ohne-speicher", action="store_true", help="keinen zusätzlichen Lauf für die Speicherspitze")
+    parser.add_argument("--ohne-app", action="store_true", help="Kaltstart und Rerun der App nicht messen")
+    parser.add_argument("--seed", type=int, default=0, help="Seed der synthetischen Blocklisten")
+    parser.add_argument("--ausgabe", default=None, help="JSON-Datei für die Ergebnisse")
+    parser.add_argument("--vergleich", default=None, help="JSON-Datei eines früheren Laufs zum Vergleich")
+    parser.add_argument("--toleranz", type=float, default=VERGLEICH_TOLERANZ,
+                        help="zulässige relative Verlangsamung beim Vergleich")
+    args = parser.parse_args(argv)
+
+    protokoll = fuehre_benchmark_aus(
+        groessen=[int(float(g)) for g in args.groessen.split(",")],
+        verteilungen=[v.strip() for v in args.verteilungen.split(",") if v.strip()],
+        wiederholungen=args.wiederholungen, speicher=not args.ohne_speicher, seed=args.seed, app=not args.ohne_app)
+
+    if args.ausgabe:
+        with open(args.ausgabe, "w", encoding="utf-8") as f:
+            json.dump(protokoll, f, indent=2, ensure_ascii=False)
+        print(f"Ergebnisse in {args.ausgabe}")
+
+    if args.vergleich:
+        with open(args.vergleich, "r", encoding="utf-8") as f:
+            alt = json.load(f)
+        zeilen, schlechter = vergleiche(alt, protokoll, args.toleranz)
+        print(f"Vergleich mit {args.vergleich} (Commit {alt.get('umgebung', {}).get('git_commit')}):")
+        for groesse, stufe, dauer_alt, dauer_neu, faktor in zeilen:
+            markierung = " LANGSAMER" if ist_langsamer(dauer_alt, dauer_neu, args.toleranz) else ""
+            print(f"{groesse or 'App':>10} {stufe:28s} {dauer_alt * 1000:10.1f} ms -> {dauer_neu * 1000:10.1f} ms "
+                  f"x{faktor:.2f}{markierung}")
+        return 1 if schlechter else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  Bootstrap-Konfidenzintervalle für Perzentile
+# Alle Stichproben werden als eine 2-D-Indexmatrix gezogen (Zeile = Replikat);
+# expon wird geschlossen über alle Zeilen geschätzt,
+# genexpon und powerlaw werden mit begrenztem Budget im gemeinsamen FitPool (bgv_fit) neu angepasst
+# --------------------------------------------------------------
+
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from bgv_fit import hole_fit_pool
+from bgv_interpolation import schnelle_ppf
+from bgv_mle import fitte_mle
+from bgv_zusammenfassung import als_zusammenfassung
+
+# Anzahl der Bootstrap-Replikate
+BOOTSTRAP_REPLIKATE = 1000
+
+# Konfidenzniveau der Intervalle (zweiseitig)
+KONFIDENZNIVEAU = 0.95
+
+# Höchstzahl der numerischen Neuanpassungen pro Verteilung (z.B. genexpon) und Zeitbudget dafür
+# (mit Warmstart über bgv_mle reicht das Budget für alle Replikate)
+MAX_NEUANPASSUNGEN = BOOTSTRAP_REPLIKATE
+ZEITBUDGET_S = 20.0
+
+# Speicherbudget für einen Block der Indexmatrix (Bytes); große Datensätze werden in Zeilenblöcken gezogen
+SPEICHER_BUDGET = 64 * 2**20
+
+# Replikate pro Aufgabe im Worker-Prozess
+REPLIKATE_PRO_AUFGABE = 10
+
+# Ergebnis: unten/oben sind Matrizen (Perzentile x Spalten) in m
+# replikate: Spalte -> Anzahl gültiger Replikate (ohne fehlgeschlagene Anpassungen und NaN-Quantile)
+BootstrapErgebnis = namedtuple('BootstrapErgebnis', ['perzentile', 'spalten', 'unten', 'oben', 'replikate', 'niveau'])
+
+
+# Funktion zur Ziehung der Indexmatrix (replikate x n), Zeile für Zeile mit Zurücklegen
+def ziehe_index_matrix(n, replikate, rng):
+    dtype = np.int32 if n < 2**31 else np.int64
+    return rng.integers(0, n, size=(replikate, n), dtype=dtype)
+
+
+# Funktion, die die Indexmatrix in Zeilenblöcken innerhalb des Speicherbudgets liefert
+# Die Zeilen hängen nur vom seed ab, nicht von der Blockgröße.
+def index_bloecke(n, replikate, seed=0, speicher_budget=SPEICHER_BUDGET):
+    # Pro Zeile: Indizes (int32) und die gezogenen Werte (float64)
+    zeilen = max(1, min(replikate, speicher_budget // (12 * n)))
+    for start, zeilen_rng in zip(range(0, replikate, zeilen),
+                                 np.random.SeedSequence(seed).spawn(-(-replikate // zeilen))):
+        yield ziehe_index_matrix(n, min(zeilen, replikate - start), np.random.default_rng(zeilen_rng))
+
+
+# Funktion für Quantile jeder Zeile einer zeilenweise sortierten Matrix (lineare Interpolation wie numpy)
+def zeilen_quantile(sortierte_zeilen, p):
+    n = sortierte_zeilen.shape[1]
+    position = (n - 1) * np.asarray(p, dtype=np.float64)
+    unten = np.floor(position).astype(np.intp)
+    oben = np.minimum(unten + 1, n - 1)
+    t = position - unten
+    a, b = sortierte_zeilen[:, unten], sortierte_zeilen[:, oben]
+    differenz = b - a
+    return np.where(t >= 0.5, b - differenz * (1 - t), a + differenz * t)
+
+
+# Geschlossene Schätzer über alle Zeilen (Zeile = Replikat), gleiche Formeln wie scipy.stats.<name>.fit
+def _expon_schaetzer(stichproben, parameter):
+    loc = stichproben.min(axis=1)
+    return loc, stichproben.mean(axis=1) - loc
+
+
+# Verteilungen mit geschlossenem Schätzer und Bedingung an die Parameter des ganzen Datensatzes
+# powerlaw fehlt absichtlich: auch bei Form <= 1 im ganzen Datensatz kann in einem Replikat die Lösung mit
+# Form > 1 die bessere sein (bgv_mle.fitte_powerlaw vergleicht beide wie scipy), daher Neuanpassung je Replikat
+GESCHLOSSENE_SCHAETZER = {
+    'expon': (_expon_schaetzer, lambda parameter: True),
+}
+
+
+# Funktion zur Prüfung, ob eine Verteilung ohne Neuanpassung geschätzt werden kann
+def hat_geschlossenen_schaetzer(name, parameter):
+    return name in GESCHLOSSENE_SCHAETZER and GESCHLOSSENE_SCHAETZER[name][1](parameter)
+
+
+# Funktion für den Worker: Neuanpassung mehrerer Replikate, Startwerte = Parameter des ganzen Datensatzes
+# Fehlgeschlagene Anpassungen ergeben NaN-Zeilen
+def _neuanpassung_aufgabe(name, indizes, startwerte, daten):
+    ergebnis = np.full((len(indizes), len(startwerte)), np.nan)
+    for i, zeile in enumerate(indizes):
+        try:
+            ergebnis[i] = fitte_mle(name, daten[zeile], startwerte)
+        except Exception:
+            pass
+    return name, ergebnis
+
+
+# Funktion zur Neuanpassung mit Zeitbudget; liefert Name -> Parametermatrix (Zeile = Replikat)
+# Die Aufgaben laufen im gemeinsamen FitPool (höchstens max_workers gleichzeitig); eine Aufgabe, die bei Ablauf
+# des Budgets noch läuft, wird mit ihrem Worker abgebrochen. max_workers=0 rechnet im aufrufenden Prozess.
+def neuanpassungen(daten, aufgaben, zeitbudget=ZEITBUDGET_S, max_workers=None):
+    teile = {name: [] for name in aufgaben}
+    frist = time.monotonic() + zeitbudget
+    auftraege = [(name, indizes[start:start + REPLIKATE_PRO_AUFGABE], startwerte, daten)
+                 for name, (indizes, startwerte) in aufgaben.items()
+                 for start in range(0, len(indizes), REPLIKATE_PRO_AUFGABE)]
+
+    if max_workers == 0:
+        for auftrag in auftraege:
+            if time.monotonic() > frist:
+                break
+            name, parameter = _neuanpassung_aufgabe(*auftrag)
+            teile[name].append(parameter)
+    elif auftraege:
+        pool = hole_fit_pool()
+        offen = queue.Queue()
+        for auftrag in auftraege:
+            offen.put(auftrag)
+        fertig = queue.Queue()
+
+        def arbeite():
+            while time.monotonic() < frist:
+                try:
+                    auftrag = offen.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    fertig.put(pool.fuehre_aus(_neuanpassung_aufgabe, auftrag, frist - time.monotonic()))
+                except (TimeoutError, RuntimeError):
+                    pass
+
+        threads = [threading.Thread(target=arbeite, name="bgv-bootstrap", daemon=True)
+                   for _ in range(min(len(auftraege), max_workers or pool.prozesse))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        while not fertig.empty():
+            name, parameter = fertig.get()
+            teile[name].append(parameter)
+
+    return {name: np.concatenate(t) if t else np.empty((0, len(aufgaben[name][1])))
+            for name, t in teile.items()}
+
+
+# Funktion zur Berechnung der Bootstrap-Konfidenzintervalle
+# m_achsen: Array oder Zusammenfassung; parameter: Name -> Parametertupel des ganzen Datensatzes
+# Die Spalte 'upload' enthält die Intervalle der empirischen Perzentile; perzentile wird sortiert.
+def berechne_bootstrap(m_achsen, parameter, perzentile, replikate=BOOTSTRAP_REPLIKATE, niveau=KONFIDENZNIVEAU,
+                       seed=0, max_neuanpassungen=MAX_NEUANPASSUNGEN, zeitbudget=ZEITBUDGET_S, max_workers=None,
+                       speicher_budget=SPEICHER_BUDGET):
+    daten = als_zusammenfassung(m_achsen).sortiert
+    perzentile = np.unique(np.asarray(perzentile, dtype=np.float64))
+    p = perzentile / 100
+
+    geschlossen = [name for name, werte in parameter.items() if hat_geschlossenen_schaetzer(name, werte)]
+    neu = [name for name in parameter if name not in geschlossen]
+    anzahl_neu = min(replikate, max_neuanpassungen)
+
+    quantile = {'upload': [], **{name: [] for name in geschlossen}}
+    neu_indizes = []
+    for indizes in index_bloecke(len(daten), replikate, seed, speicher_budget):
+        # Daten sind sortiert: sortierte Indizes ergeben sortierte Stichproben
+        indizes.sort(axis=1)
+        stichproben = daten[indizes]
+        quantile['upload'].append(zeilen_quantile(stichproben, p))
+        for name in geschlossen:
+            geschaetzt = GESCHLOSSENE_SCHAETZER[name][0](stichproben, parameter[name])
+            quantile[name].append(schnelle_ppf(name, p, tuple(np.asarray(g)[:, None] for g in geschaetzt)))
+        # Die ersten Replikate werden auch für die Neuanpassungen verwendet
+        if neu and sum(len(i) for i in neu_indizes) < anzahl_neu:
+            neu_indizes.append(indizes[:anzahl_neu - sum(len(i) for i in neu_indizes)].copy())
+        del stichproben
+
+    if neu:
+        neu_indizes = np.concatenate(neu_indizes)
+        angepasst = neuanpassungen(daten, {name: (neu_indizes, tuple(parameter[name])) for name in neu},
+                                   zeitbudget=zeitbudget, max_workers=max_workers)
+        for name in neu:
+            werte = angepasst[name]
+            werte = werte[np.isfinite(werte).all(axis=1)]
+            # Zeilenweise über schnelle_ppf: scipy.stats.genexpon.ppf liefert für manche Parameter NaN
+            quantile[name] = [np.array([schnelle_ppf(name, p, w) for w in werte]).reshape(len(werte), len(p))]
+
+    spalten = ['upload'] + list(parameter)
+    alpha = (1 - niveau) / 2
+    unten = np.full((len(perzentile), len(spalten)), np.nan)
+    oben = np.full((len(perzentile), len(spalten)), np.nan)
+    anzahl = {}
+    for j, spalte in enumerate(spalten):
+        q = np.concatenate(quantile[spalte]) if quantile[spalte] else np.empty((0, len(p)))
+        # Replikate mit NaN-Quantilen sind ungültig und zählen nicht; inf (z.B. ppf(1)) bleibt erhalten
+        q = q[~np.isnan(q).any(axis=1)]
+        anzahl[spalte] = len(q)
+        if len(q):
+            with np.errstate(invalid='ignore'):
+                unten[:, j], oben[:, j] = np.quantile(q, [alpha, 1 - alpha], axis=0)
+            # Die Interpolation zwischen inf-Werten ergibt NaN
+            unendlich = np.isposinf(q).all(axis=0)
+            unten[unendlich, j] = oben[unendlich, j] = np.inf
+    return BootstrapErgebnis(perzentile, spalten, unten, oben, anzahl, niveau)
+
+
+# Funktion zur Auswahl der Intervallgrenzen einer Spalte für bestimmte Perzentile (m)
+# Perzentile, die nicht berechnet wurden, ergeben NaN
+def bootstrap_grenzen(ergebnis, spalte, perzentile):
+    perzentile = np.asarray(perzentile, dtype=np.float64)
+    unten = np.full(len(perzentile), np.nan)
+    oben = np.full(len(perzentile), np.nan)
+    if spalte not in ergebnis.spalten:
+        return unten, oben
+    j = ergebnis.spalten.index(spalte)
+    position = np.clip(np.searchsorted(ergebnis.perzentile, perzentile), 0, len(ergebnis.perzentile) - 1)
+    gefunden = np.isclose(ergebnis.perzentile[position], perzentile)
+    unten[gefunden] = ergebnis.unten[position[gefunden], j]
+    oben[gefunden] = ergebnis.oben[position[gefunden], j]
+    return unten, oben
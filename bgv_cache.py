@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  Cache für angepasste Verteilungsparameter
+# Schlüssel: Hash der m_achsen + Verteilungsname + scipy-Version
+# --------------------------------------------------------------
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import scipy
+
+
+# Funktion zur Berechnung eines Hashes über die Achsenwerte (float64, Reihenfolge relevant)
+def berechne_daten_hash(m_achsen):
+    daten = np.ascontiguousarray(np.asarray(m_achsen, dtype=np.float64))
+    h = hashlib.sha256()
+    h.update(str(daten.shape).encode("ascii"))
+    h.update(daten.tobytes())
+    return h.hexdigest()
+
+
+# Funktion zur Berechnung des Cache-Schlüssels
+# verfahren: Kennung eines eigenen Schätzers (z.B. bgv_mle.MLE_VERSION); None = scipy.stats.<verteilung>.fit
+def berechne_cache_schluessel(daten_hash, verteilung, verfahren=None):
+    if verfahren:
+        return f"{verteilung}-{verfahren}-{scipy.__version__}-{daten_hash}"
+    return f"{verteilung}-{scipy.__version__}-{daten_hash}"
+
+
+# LRU-Cache im Speicher mit optionalem Verzeichnis auf der Festplatte
+class FitCache:
+    def __init__(self, max_eintraege=64, verzeichnis=None):
+        self.max_eintraege = max_eintraege
+        self.verzeichnis = verzeichnis
+        self._eintraege = OrderedDict()
+        self._lock = threading.Lock()
+        self.treffer = 0
+        self.disk_treffer = 0
+        self.fehlschlaege = 0
+        if verzeichnis:
+            os.makedirs(verzeichnis, exist_ok=True)
+
+    def _pfad(self, schluessel):
+        return os.path.join(self.verzeichnis, schluessel + ".json")
+
+    def _speichere_im_speicher(self, schluessel, parameter):
+        self._eintraege[schluessel] = parameter
+        self._eintraege.move_to_end(schluessel)
+        while len(self._eintraege) > self.max_eintraege:
+            self._eintraege.popitem(last=False)
+
+    # Parameter zu einem Schlüssel holen (None, falls nicht vorhanden)
+    def hole(self, schluessel):
+        with self._lock:
+            if schluessel in self._eintraege:
+                self._eintraege.move_to_end(schluessel)
+                self.treffer += 1
+                return self._eintraege[schluessel]
+
+        if self.verzeichnis:
+            try:
+                with open(self._pfad(schluessel), "r", encoding="utf-8") as f:
+                    parameter = tuple(json.load(f)["parameter"])
+            except (OSError, ValueError, KeyError):
+                parameter = None
+            if parameter is not None:
+                with self._lock:
+                    self._speichere_im_speicher(schluessel, parameter)
+                    self.treffer += 1
+                    self.disk_treffer += 1
+                return parameter
+
+        with self._lock:
+            self.fehlschlaege += 1
+        return None
+
+    # Parameter zu einem Schlüssel ablegen (Speicher und ggf. Festplatte)
+    def speichere(self, schluessel, parameter):
+        parameter = tuple(float(p) for p in parameter)
+        with self._lock:
+            self._speichere_im_speicher(schluessel, parameter)
+
+        if self.verzeichnis:
+            pfad = self._pfad(schluessel)
+            tmp = f"{pfad}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({"parameter": parameter}, f)
+                os.replace(tmp, pfad)  # atomar, damit parallele Prozesse keine halben Dateien lesen
+            except OSError:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        return parameter
+
+    # Anpassung über den Cache: nur bei einem Fehlschlag wird fit_funktion aufgerufen
+    def fit(self, verteilung, m_achsen, fit_funktion, daten_hash=None, verfahren=None):
+        if daten_hash is None:
+            daten_hash = berechne_daten_hash(m_achsen)
+        schluessel = berechne_cache_schluessel(daten_hash, verteilung, verfahren)
+        parameter = self.hole(schluessel)
+        if parameter is None:
+            parameter = self.speichere(schluessel, fit_funktion(m_achsen))
+        return parameter
+
+    def leeren(self):
+        with self._lock:
+            self._eintraege.clear()
+
+    def statistik(self):
+        with self._lock:
+            return {
+                "eintraege": len(self._eintraege),
+                "max_eintraege": self.max_eintraege,
+                "treffer": self.treffer,
+                "disk_treffer": self.disk_treffer,
+                "fehlschlaege": self.fehlschlaege,
+            }
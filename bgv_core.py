@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  Kern der Blockgrößenverteilung ohne Streamlit
+# Einlesen, Umrechnung, Anpassung, Perzentile und Diagramme;
+# wird von der App und von der Stapelverarbeitung (bgv_batch.py) verwendet
+# --------------------------------------------------------------
+
+from collections import namedtuple
+
+import matplotlib.pyplot as plt
+import numpy as np
+from scipy import stats
+
+from bgv_bootstrap import bootstrap_grenzen
+from bgv_fit import STANDARD_VERTEILUNGEN, fitte_verteilungen_parallel
+from bgv_formate import lade_blockliste, sortiert
+from bgv_interpolation import schnelle_cdf, schnelle_ppf
+from bgv_perzentile import TABELLEN_PERZENTILE, berechne_quantil_matrix
+from bgv_zusammenfassung import Zusammenfassung, als_zusammenfassung
+
+# Anzahl der Stützstellen der angepassten Kurven (unabhängig von der Anzahl der Blöcke)
+KURVEN_PUNKTE = 600
+
+# Funktion zur Berechnung der Masse in Tonnen aus m³ und Dichte
+def berechne_masse_in_tonnen(volumen_m3, dichte_kg_m3):
+    return (volumen_m3 * dichte_kg_m3) / 1000
+
+# Funktion zur Berechnung der dritten Wurzel von m³ (Einzelwert oder ganzes Array)
+def berechne_dritte_wurzel(v):
+    return np.round(np.power(v, 1/3), 2)
+
+# Funktion zur Berechnung der Perzentile
+def berechne_perzentile(Achsen, perzentile):
+    return np.percentile(Achsen, perzentile)
+    
+# Funktion für das Auswertungsgitter der angepassten Kurven zwischen x_min und x_max
+# Logarithmisch verteilt für die log-x-Achse der CDF, ergänzt um ein lineares Gitter für die pdf
+def kurven_gitter(x_min, x_max, punkte=KURVEN_PUNKTE):
+    linear = np.linspace(x_min, x_max, punkte // 2)
+    if not x_max > 0:
+        return linear
+    untergrenze = x_min if x_min > 0 else x_max * 1e-3
+    return np.union1d(np.geomspace(untergrenze, x_max, punkte), linear)
+
+# Farben der Verteilungen in den Diagrammen (auch für die Bootstrap-Bänder)
+FARBEN = {'upload': 'tab:blue', 'expon': '#333333', 'genexpon': '#800020', 'lognorm': '#00008B', 'powerlaw': '#006400'}
+
+# Perzentile der Konfidenzbänder in der CDF (ohne 0 und 100, dort sind die Quantile oft unendlich)
+BAND_PERZENTILE = np.arange(1, 100)
+
+# Funktion zur Berechnung der Perzentile und Visualisierung
+# m_achsen: Array oder Zusammenfassung (Histogramm und Quantile werden dann nicht neu berechnet)
+def berechne_perzentile_und_visualisierung(m_achsen):
+    zusammenfassung = als_zusammenfassung(m_achsen)
+    steps = zusammenfassung.cdf_steps
+
+    # Berechnung der Perzentile
+    percentiles_m_achsen = zusammenfassung.cdf_werte
+
+    # Visualisierung der Ergebnisse
+    fig, (ax1, ax2, ax3) = plt.subplots(nrows=1, ncols=3, figsize=(18, 4))
+
+    # Histogramm der Wahrscheinlichkeitsdichte
+    ax1.stairs(zusammenfassung.hist_dichte, zusammenfassung.hist_kanten, fill=True, color='tab:blue', alpha=0.3, label='upload pdf')
+    
+    # CDF auf normaler Skala
+    ax2.plot(percentiles_m_achsen, steps, lw=2.0, color='tab:blue', alpha=0.7, label='upload cdf')
+    
+    # CDF auf Log-Skala
+    ax3.plot(percentiles_m_achsen, steps, lw=2.0, color='tab:blue', alpha=0.7, label='upload cdf')
+
+    # Achsenbeschriftungen
+    ax1.set_xlim(left=None, right=None)
+    ax1.set_xlabel('Blockachse a [m]', fontsize=14)
+    ax1.set_ylabel('Wahrscheinlichkeitsdichte f(a)', fontsize=14)
+
+    ax2.set_xlim(left=None, right=None)
+    ax2.set_xlabel('Blockachse a [m]', fontsize=14)
+    ax2.set_ylabel('Kumulative Wahrscheinlichkeit F(a)', fontsize=14)
+
+    ax3.set_xscale('log')
+    ax3.set_xlabel('Blockachse a [m] (log)', fontsize=14)
+    ax3.set_ylabel('Kumulative Wahrscheinlichkeit F(a)', fontsize=14)
+
+    # Legenden
+    ax1.legend(loc='best', frameon=False)
+    ax2.legend(loc='best', frameon=False)
+    ax3.legend(loc='best', frameon=False)
+
+    # Diagramm übergeben
+    return(fig)
+    
+# Funktion zur Visualisierung der angepassten Verteilungen (parameter: Name -> Parametertupel)
+# m_achsen: Array oder Zusammenfassung; bootstrap (optional): BootstrapErgebnis für Konfidenzbänder in der CDF
+def zeichne_angepasste_verteilungen(m_achsen, parameter, bootstrap=None):
+    zusammenfassung = als_zusammenfassung(m_achsen)
+    fig, (ax4, ax5) = plt.subplots(nrows=1, ncols=2, figsize=(12, 4))
+
+    # Histogramm der m_achsen
+    ax4.stairs(zusammenfassung.hist_dichte, zusammenfassung.hist_kanten, fill=True, color='tab:blue', alpha=0.3, 
+               label='upload pdf')
+        
+    # CDF für m_achsen (kumulative Verteilung)
+    steps = zusammenfassung.cdf_steps
+    percentiles_m_achsen = zusammenfassung.cdf_werte
+    ax5.plot(percentiles_m_achsen, steps, lw=8.0, color='tab:blue', alpha=0.3, label='upload cdf')
+    
+    # Kumulative Verteilungen und CDF Berechnungen (auf einem festen Gitter, nicht pro Block)
+        
+    if 'expon' in parameter:
+        loc3, scale3 = parameter['expon']
+        X3 = kurven_gitter(stats.expon.ppf(0.001, loc=loc3, scale=scale3), 
+                           stats.expon.ppf(0.999, loc=loc3, scale=scale3))
+        ax4.plot(X3, stats.expon.pdf(X3, loc=loc3, scale=scale3), '#333333', lw=1.0, alpha=0.7, label='expon pdf')
+        ax5.plot(X3, stats.expon.cdf(X3, loc=loc3, scale=scale3), '#333333', lw=1.0, alpha=0.7, label='expon cdf')
+
+    if 'genexpon' in parameter:
+        a1, b1, c1, loc1, scale1 = parameter['genexpon']
+        X1 = kurven_gitter(*schnelle_ppf('genexpon', [0.001, 0.999], parameter['genexpon']))
+        ax4.plot(X1, stats.genexpon.pdf(X1, a1, b1, c1, loc=loc1, scale=scale1), '#800020', lw=1.0, alpha=0.7, label='genexpon pdf')
+        ax5.plot(X1, schnelle_cdf('genexpon', X1, parameter['genexpon']), '#800020', lw=1.0, alpha=0.7, label='genexpon cdf')
+                
+    #if 'lognorm' in parameter:
+    #    shape2, loc2, scale2 = parameter['lognorm']
+    #    X2 = kurven_gitter(stats.lognorm.ppf(0.001, shape2, loc=loc2, scale=scale2), 
+    #                       stats.lognorm.ppf(0.999, shape2, loc=loc2, scale=scale2))
+    #    ax4.plot(X2, stats.lognorm.pdf(X2, shape2, loc=loc2, scale=scale2), '#00008B', lw=1.0, alpha=0.7, label='lognorm pdf')
+    #    ax5.plot(X2, stats.lognorm.cdf(X2, shape2, loc=loc2, scale=scale2), '#00008B', lw=1.0, alpha=0.7, label='lognorm cdf')
+        
+    if 'powerlaw' in parameter:
+        a4, loc4, scale4 = parameter['powerlaw']
+        X4 = kurven_gitter(stats.powerlaw.ppf(0.001, a4, loc=loc4, scale=scale4), 
+                           stats.powerlaw.ppf(0.999, a4, loc=loc4, scale=scale4))
+        ax4.plot(X4, stats.powerlaw.pdf(X4, a4, loc=loc4, scale=scale4), '#006400', lw=1.0, alpha=0.7, label='powerlaw pdf')
+        ax5.plot(X4, stats.powerlaw.cdf(X4, a4, loc=loc4, scale=scale4), '#006400', lw=1.0, alpha=0.7, label='powerlaw cdf')
+
+    # Weitere Verteilungen (z.B. aus der automatischen Auswahl) mit den Standardfarben von matplotlib
+    for name, werte in parameter.items():
+        if name in ('expon', 'genexpon', 'powerlaw'):
+            continue
+        verteilung = getattr(stats, name)(*werte)
+        X = kurven_gitter(verteilung.ppf(0.001), verteilung.ppf(0.999))
+        linie, = ax4.plot(X, verteilung.pdf(X), color=FARBEN.get(name), lw=1.0, alpha=0.7, label=f'{name} pdf')
+        ax5.plot(X, verteilung.cdf(X), color=linie.get_color(), lw=1.0, alpha=0.7, label=f'{name} cdf')
+    
+    # Konfidenzbänder der Perzentile (horizontal: Bereich der Blockachse je Wahrscheinlichkeit)
+    if bootstrap is not None:
+        for spalte in bootstrap.spalten:
+            if spalte != 'upload' and spalte not in parameter:
+                continue
+            unten, oben = bootstrap_grenzen(bootstrap, spalte, BAND_PERZENTILE)
+            ax5.fill_betweenx(BAND_PERZENTILE / 100, unten, oben, color=FARBEN.get(spalte, 'grey'), alpha=0.15, lw=0,
+                              label=f'{spalte} {bootstrap.niveau:.0%}-Band')
+
+    # Maximaler Wert des Histogramms (aus der Zusammenfassung, ohne neue Klassierung)
+    max_y_value = zusammenfassung.hist_dichte.max()
+
+    # Achsen für das Diagramm
+    ax4.legend(loc='best', frameon=False)
+    ax4.set_ylim(0, max_y_value * 1.1)
+    ax4.set_xlabel('Blockachse a [m]', fontsize=12)
+    ax4.set_ylabel('Wahrscheinlichkeitsdichte f(a)', fontsize=12)
+    
+    ax5.legend(loc='best', frameon=False)
+    ax5.set_xscale('log')
+    ax5.set_xlabel('Blockachse a [m] (log)', fontsize=12)
+    ax5.set_ylabel('Kumulative Wahrscheinlichkeit F(a)', fontsize=12)
+    
+    # Diagramm übergeben
+    return fig
+
+# Function to calculate percentiles for a distribution (one vectorized ppf call, genexpon tabulated)
+def calculate_percentiles(distribution, percentiles, *params):
+    return schnelle_ppf(distribution.name, np.asarray(percentiles, dtype=np.float64) / 100, params)
+
+# Ergebnis der Verarbeitung einer Blockliste
+# parameter: Name -> Parametertupel (nur erfolgreiche Anpassungen), fit_ergebnisse: Name -> FitErgebnis
+BlocklistenErgebnis = namedtuple('BlocklistenErgebnis', [
+    'werte', 'm_achsen', 'parameter', 'fit_ergebnisse', 'quantile', 'abgelehnt', 'anzahl_abgelehnt'])
+
+# Ergebnis der Anpassung und der Perzentile für einen Satz sortierter Achsen
+AnpassungsErgebnis = namedtuple('AnpassungsErgebnis', ['zusammenfassung', 'parameter', 'fit_ergebnisse', 'quantile'])
+
+
+# Funktion zur Anpassung aller Verteilungen und Berechnung der Perzentiltabelle für sortierte m_achsen
+# max_workers=0 passt die Verteilungen im aufrufenden Prozess an (z.B. innerhalb eines Worker-Prozesses, ohne Zeitlimit).
+def passe_an_und_berechne_quantile(m_achsen, verteilungen=None, perzentile=TABELLEN_PERZENTILE, timeout=120,
+                                   max_workers=0, fit_cache=None):
+    verteilungen = list(STANDARD_VERTEILUNGEN if verteilungen is None else verteilungen)
+    zusammenfassung = Zusammenfassung(m_achsen, ist_sortiert=True)
+
+    fit_ergebnisse = {}
+    for ergebnis in fitte_verteilungen_parallel(zusammenfassung.sortiert, verteilungen, timeout=timeout,
+                                                max_workers=max_workers, fit_cache=fit_cache,
+                                                daten_hash=zusammenfassung.daten_hash):
+        fit_ergebnisse[ergebnis.name] = ergebnis
+    # Spalten in der angefragten Reihenfolge, unabhängig davon, welcher Fit zuerst fertig war
+    parameter = {name: fit_ergebnisse[name].parameter for name in verteilungen
+                 if fit_ergebnisse[name].parameter is not None}
+
+    quantile = berechne_quantil_matrix(perzentile, parameter, zusammenfassung)
+    return AnpassungsErgebnis(zusammenfassung, parameter, fit_ergebnisse, quantile)
+
+
+# Funktion zur Verarbeitung einer Blockliste: Einlesen -> Sortieren -> dritte Wurzel -> Anpassung -> Perzentile
+# Ohne dichte_kg_m3 enthält die Liste Volumina in m³, sonst Massen in t; exportierte Achsen (bgv_formate)
+# werden direkt übernommen. Formate: Text, gzip/zstd, .npy, Parquet, Arrow.
+# max_workers=0 passt die Verteilungen im aufrufenden Prozess an (z.B. innerhalb eines Worker-Prozesses, ohne Zeitlimit).
+def verarbeite_blockliste(quelle, dichte_kg_m3=None, verteilungen=None, perzentile=TABELLEN_PERZENTILE,
+                          timeout=120, max_workers=0, fit_cache=None, dateiname=None):
+    eingelesen = lade_blockliste(quelle, dateiname, min_wert=0.0)
+    if len(eingelesen.werte) == 0:
+        raise ValueError("Die Blockliste enthält keine gültigen Werte")
+    if eingelesen.achsen:
+        # Exportierte Achsen sind bereits sortiert, die Volumina werden nur für das Ergebnis berechnet
+        m_achsen = sortiert(eingelesen.werte)
+        werte = m_achsen ** 3
+    else:
+        werte = sortiert(eingelesen.werte)
+        if dichte_kg_m3 is not None:
+            # Umrechnung von Tonnen in m³
+            werte = werte * 1000 / dichte_kg_m3
+        # Berechnung der dritten Wurzel (Achsen in Metern); sortierte Werte ergeben sortierte Achsen
+        m_achsen = berechne_dritte_wurzel(werte)
+    ergebnis = passe_an_und_berechne_quantile(m_achsen, verteilungen, perzentile, timeout, max_workers, fit_cache)
+    return BlocklistenErgebnis(werte, m_achsen, ergebnis.parameter, ergebnis.fit_ergebnisse, ergebnis.quantile,
+                               eingelesen.abgelehnt, eingelesen.anzahl_abgelehnt)
+
+
+# Funktion zur Benennung der Parameter einer scipy-Verteilung (Formparameter, loc, scale)
+def benenne_parameter(name, parameter):
+    formen = getattr(stats, name).shapes
+    namen = [f.strip() for f in formen.split(',')] if formen else []
+    return dict(zip(namen + ['loc', 'scale'], (float(p) for p in parameter)))
@@ -0,0 +1,596 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  lokaler HTTP/JSON-Dienst für Skripte (z.B. THROW-Pipelines)
+#
+# Aufruf:
+#   python bgv_dienst.py --port 8765 --cache-verzeichnis .bgv_cache/fits
+#
+# Endpunkte (POST mit JSON, Antwort JSON):
+#   /parse        Blockliste einlesen -> daten_hash, Anzahl, abgelehnte Zeilen
+#   /fit          Verteilungen anpassen -> Parameter je Verteilung
+#   /perzentile   Perzentiltabelle (Daten und/oder Parameter) in m und m³
+#   /stichprobe   Blockvolumina aus einer angepassten Verteilung ziehen (JSON oder gzip-Blockliste)
+#   GET /metriken, GET /gesundheit
+#
+# Daten werden als "text" (Blockliste), "base64" (gz, zst, npy, Parquet, Arrow) oder "werte" (Liste in m³)
+# übergeben; eingelesene Datensätze bleiben unter ihrem daten_hash im Dienst und können danach nur noch
+# über "daten_hash" angesprochen werden. Gleichzeitige Anpassungen werden gesammelt, doppelte zusammengelegt
+# und im FitPool aus bgv_fit gerechnet (forkserver/spawn, Zeitlimit je Anpassung); Parameter werden über den
+# Fit-Cache wiederverwendet.
+# --------------------------------------------------------------
+
+import argparse
+import base64
+import itertools
+import json
+import queue
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from scipy import stats
+
+from bgv_cache import FitCache
+from bgv_core import benenne_parameter, berechne_dritte_wurzel
+from bgv_fit import STANDARD_VERTEILUNGEN, FitErgebnis, FitPool, _fit_aufgabe, fit_cache_schluessel, hole_fit_pool
+from bgv_formate import lade_blockliste, sortiert
+from bgv_messung import Messprotokoll, richte_trace_ein
+from bgv_perzentile import TABELLEN_PERZENTILE, berechne_quantil_matrix
+from bgv_sitzung import ArtefaktSpeicher
+from bgv_throw import erzeuge_blockliste_stuecke, erzeuge_volumen_chunks
+from bgv_zusammenfassung import Zusammenfassung
+
+# Standardadresse (nur lokal erreichbar)
+STANDARD_HOST = "127.0.0.1"
+STANDARD_PORT = 8765
+
+# Sammelzeit und Höchstgröße eines Stapels von Anpassungen
+STAPEL_WARTEZEIT_S = 0.02
+MAX_STAPEL = 64
+
+# Speicher für eingelesene Datensätze (LRU über daten_hash)
+DATENSATZ_BUDGET = 512 * 2**20
+
+# Größte Anfrage in Bytes und größte Stichprobe als JSON-Liste (größere nur als gzip-Blockliste)
+MAX_ANFRAGE_BYTES = 256 * 2**20
+MAX_STICHPROBE_JSON = 1_000_000
+
+# Anzahl der Latenzen je Endpunkt für Median und Perzentile in /metriken
+LATENZ_FENSTER = 1000
+
+
+# Funktion für JSON-taugliche Zahlen (inf/NaN -> None)
+def _json_zahlen(werte):
+    werte = np.asarray(werte, dtype=np.float64)
+    return [float(w) if np.isfinite(w) else None for w in werte.ravel()]
+
+
+# Funktion zur Prüfung der Verteilungsnamen einer Anfrage (stetige Verteilungen aus scipy.stats)
+# Unbekannte Namen sind ein Fehler der Anfrage (400) statt stillschweigend übergangen zu werden.
+def pruefe_verteilungen(namen, feld="verteilungen"):
+    if isinstance(namen, str) or not isinstance(namen, (list, tuple)):
+        raise ValueError(f"'{feld}' muss eine Liste von Verteilungsnamen sein, "
+                         f"z.B. {json.dumps(STANDARD_VERTEILUNGEN)}")
+    unbekannt = [str(n) for n in namen
+                 if not isinstance(n, str) or not isinstance(getattr(stats, n, None), stats.rv_continuous)]
+    if unbekannt:
+        raise ValueError(f"Unbekannte Verteilung(en) in '{feld}': {', '.join(unbekannt)} (erlaubt sind stetige "
+                         f"Verteilungen aus scipy.stats, z.B. {', '.join(STANDARD_VERTEILUNGEN)})")
+    return list(namen)
+
+
+# Funktion zur Prüfung der Parameter einer Verteilung (Formparameter, loc, scale); liefert ein Tupel von floats
+def pruefe_parameter(name, werte):
+    pruefe_verteilungen([name], "parameter")
+    anzahl = getattr(stats, name).numargs + 2
+    if isinstance(werte, (str, dict)) or not isinstance(werte, (list, tuple)) or len(werte) != anzahl:
+        raise ValueError(f"'{name}' braucht eine Liste mit {anzahl} Parametern (Formparameter, loc, scale)")
+    try:
+        werte = tuple(float(p) for p in werte)
+    except (TypeError, ValueError):
+        raise ValueError(f"Die Parameter von '{name}' müssen Zahlen sein") from None
+    if not np.all(np.isfinite(werte)) or werte[-1] <= 0:
+        raise ValueError(f"Die Parameter von '{name}' müssen endlich sein, scale größer als 0")
+    # Ungültige Formparameter ergeben in scipy einen NaN-Träger
+    if np.isnan(getattr(stats, name).support(*werte)).any():
+        raise ValueError(f"Ungültige Formparameter für '{name}': {list(werte[:-2])}")
+    return werte
+
+
+# Funktion zur Prüfung der Perzentile einer Anfrage (Liste von Zahlen zwischen 0 und 100)
+def pruefe_perzentile(perzentile):
+    if isinstance(perzentile, (str, dict)) or not isinstance(perzentile, (list, tuple)) or len(perzentile) == 0:
+        raise ValueError("'perzentile' muss eine nicht leere Liste von Zahlen sein")
+    try:
+        perzentile = np.array([float(p) for p in perzentile])
+    except (TypeError, ValueError):
+        raise ValueError("'perzentile' muss eine nicht leere Liste von Zahlen sein") from None
+    if not np.all((perzentile >= 0) & (perzentile <= 100)):
+        raise ValueError("'perzentile' müssen zwischen 0 und 100 liegen")
+    return perzentile
+
+
+# Funktion für eine Zahl der Anfrage (fehlt sie, gilt standard); positiv: größer als 0, sonst mindestens 0
+def zahl_aus_anfrage(anfrage, feld, standard=None, positiv=True, ganzzahl=False):
+    wert = anfrage.get(feld, standard)
+    if wert is None:
+        return None
+    if isinstance(wert, bool) or not isinstance(wert, (int, float)) or (ganzzahl and not float(wert).is_integer()):
+        raise ValueError(f"'{feld}' muss eine {'ganze ' if ganzzahl else ''}Zahl sein")
+    wert = int(wert) if ganzzahl else float(wert)
+    if not np.isfinite(wert) or (wert <= 0 if positiv else wert < 0):
+        raise ValueError(f"'{feld}' muss {'größer als 0' if positiv else 'mindestens 0'} sein")
+    return wert
+
+
+# Sammelt gleichzeitige Anpassungen und rechnet sie im FitPool (ein Worker je Anpassung, mit Zeitlimit)
+# Gleiche Anpassungen (Datensatz und Verteilung) laufen nur einmal, fertige kommen aus dem Fit-Cache.
+# prozesse=None nutzt den gemeinsamen FitPool des Prozesses, eine Zahl einen eigenen;
+# prozesse=0 rechnet im Sammel-Thread (ohne Pool und ohne Zeitlimit, z.B. für Tests).
+class FitStapler:
+    def __init__(self, prozesse=None, fit_cache=None, wartezeit=STAPEL_WARTEZEIT_S, max_stapel=MAX_STAPEL):
+        self.fit_cache = fit_cache if fit_cache is not None else FitCache(max_eintraege=256)
+        self.wartezeit = wartezeit
+        self.max_stapel = max_stapel
+        self._eigener_pool = bool(prozesse)
+        self._pool = None if prozesse == 0 else FitPool(prozesse) if prozesse else hole_fit_pool()
+        self.prozesse = self._pool.prozesse if self._pool is not None else 0
+        # Threads, die auf die Worker warten (höchstens so viele wie Worker)
+        self._threads = ThreadPoolExecutor(max_workers=self.prozesse, thread_name_prefix="bgv-fit") \
+            if self._pool is not None else None
+        self._warteschlange = queue.Queue()
+        self._laufend = {}
+        self._lock = threading.Lock()
+        self.stapel = 0
+        self.stapel_anpassungen = 0
+        self.zusammengelegt = 0
+        self._thread = threading.Thread(target=self._schleife, name="bgv-fit-stapler", daemon=True)
+        self._thread.start()
+
+    # Funktion zur Anpassung mehrerer Verteilungen an einen Datensatz; liefert Name -> FitErgebnis
+    # Nach timeout Sekunden wird 'timeout' gemeldet; im Pool wird eine Anpassung nach timeout Sekunden Rechenzeit
+    # mit ihrem Worker beendet (bis dahin läuft sie weiter und füllt den Cache).
+    def fitte(self, zusammenfassung, namen, timeout=120):
+        ergebnisse = {}
+        warten = {}
+        for name in namen:
+            schluessel = fit_cache_schluessel(zusammenfassung.daten_hash, name)
+            parameter = self.fit_cache.hole(schluessel)
+            if parameter is not None:
+                ergebnisse[name] = FitErgebnis(name, parameter, 'cache', 0.0, '')
+                continue
+            with self._lock:
+                future = self._laufend.get(schluessel)
+                if future is None:
+                    future = self._laufend[schluessel] = Future()
+                    self._warteschlange.put((schluessel, name, zusammenfassung, future, timeout))
+                else:
+                    self.zusammengelegt += 1
+            warten[name] = future
+
+        frist = time.monotonic() + timeout
+        for name, future in warten.items():
+            try:
+                ergebnisse[name] = future.result(timeout=max(frist - time.monotonic(), 0))
+            except FutureTimeout:
+                ergebnisse[name] = FitErgebnis(name, None, 'timeout', float(timeout),
+                                               f"Anpassung nach {timeout} s nicht fertig")
+        return {name: ergebnisse[name] for name in namen}
+
+    # Sammel-Thread: wartet auf die erste Anpassung, sammelt bis zur Wartezeit weitere und gibt den Stapel ab
+    def _schleife(self):
+        while True:
+            erste = self._warteschlange.get()
+            if erste is None:
+                return
+            stapel = [erste]
+            frist = time.monotonic() + self.wartezeit
+            while len(stapel) < self.max_stapel:
+                try:
+                    auftrag = self._warteschlange.get(timeout=max(frist - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if auftrag is None:
+                    self._warteschlange.put(None)
+                    break
+                stapel.append(auftrag)
+            self._verarbeite(stapel)
+
+    # Funktion zur Abgabe eines Stapels: jede Anpassung an einen Worker des FitPools
+    def _verarbeite(self, stapel):
+        self.stapel += 1
+        self.stapel_anpassungen += len(stapel)
+        for auftrag in stapel:
+            _, name, zusammenfassung, _, _ = auftrag
+            if self._threads is None:
+                self._fertig(auftrag, _fit_aufgabe(name, zusammenfassung.sortiert))
+                continue
+            try:
+                self._threads.submit(self._fitte_im_pool, auftrag)
+            except RuntimeError as e:
+                # Stapler bereits beendet
+                self._fertig(auftrag, (name, None, 'fehler', 0.0, str(e)))
+
+    def _fitte_im_pool(self, auftrag):
+        _, name, zusammenfassung, _, timeout = auftrag
+        try:
+            ergebnis = self._pool.fitte(name, zusammenfassung.sortiert, None, timeout)
+        except Exception as e:
+            ergebnis = (name, None, 'fehler', 0.0, str(e))
+        self._fertig(auftrag, ergebnis)
+
+    def _fertig(self, auftrag, ergebnis):
+        schluessel, _, _, future, _ = auftrag
+        name, parameter, status, dauer, meldung = ergebnis
+        if parameter is not None:
+            parameter = self.fit_cache.speichere(schluessel, parameter)
+        with self._lock:
+            self._laufend.pop(schluessel, None)
+        future.set_result(FitErgebnis(name, parameter, status, dauer, meldung))
+
+    # Anpassungen, die ihr Zeitlimit überschritten haben (Worker beendet)
+    def abgebrochen(self):
+        return self._pool.beendet if self._pool is not None else 0
+
+    def beenden(self):
+        self._warteschlange.put(None)
+        self._thread.join(timeout=5)
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._eigener_pool:
+            self._pool.schliessen()
+
+
+# Durchsatz und Latenzen je Endpunkt
+class DienstMetriken:
+    def __init__(self, fenster=LATENZ_FENSTER):
+        self.start = time.time()
+        self._lock = threading.Lock()
+        self._fenster = fenster
+        self._endpunkte = {}
+        self._zeitpunkte = deque(maxlen=100_000)
+
+    def erfasse(self, endpunkt, dauer, fehler=False):
+        with self._lock:
+            e = self._endpunkte.setdefault(endpunkt, {"anzahl": 0, "fehler": 0, "summe_s": 0.0,
+                                                      "latenzen": deque(maxlen=self._fenster)})
+            e["anzahl"] += 1
+            e["fehler"] += bool(fehler)
+            e["summe_s"] += dauer
+            e["latenzen"].append(dauer)
+            self._zeitpunkte.append(time.monotonic())
+
+    # Funktion für die Auswertung: Anfragen je Sekunde (gesamt und letzte Minute), Latenzen in ms
+    def auswertung(self):
+        with self._lock:
+            jetzt = time.monotonic()
+            laufzeit = time.time() - self.start
+            letzte_minute = sum(1 for t in self._zeitpunkte if jetzt - t <= 60)
+            endpunkte = {}
+            for name, e in self._endpunkte.items():
+                latenzen = np.array(e["latenzen"]) * 1000
+                endpunkte[name] = {
+                    "anzahl": e["anzahl"],
+                    "fehler": e["fehler"],
+                    "mittel_ms": e["summe_s"] / e["anzahl"] * 1000,
+                    "median_ms": float(np.median(latenzen)),
+                    "p95_ms": float(np.percentile(latenzen, 95)),
+                    "max_ms": float(latenzen.max()),
+                }
+            gesamt = sum(e["anzahl"] for e in self._endpunkte.values())
+        return {
+            "laufzeit_s": laufzeit,
+            "anfragen": gesamt,
+            "anfragen_pro_s": gesamt / laufzeit if laufzeit > 0 else 0.0,
+            "anfragen_pro_s_letzte_minute": letzte_minute / min(60.0, max(laufzeit, 1e-9)),
+            "endpunkte": endpunkte,
+        }
+
+
+# Zustand des Dienstes: Datensätze, Fit-Stapler, Metriken und (optional) Trace-Logger
+class BGVDienst:
+    def __init__(self, prozesse=None, cache_verzeichnis=None, datensatz_budget=DATENSATZ_BUDGET, trace_datei=None,
+                 wartezeit=STAPEL_WARTEZEIT_S):
+        self.fit_cache = FitCache(max_eintraege=256, verzeichnis=cache_verzeichnis)
+        self.stapler = FitStapler(prozesse, self.fit_cache, wartezeit=wartezeit)
+        self.datensaetze = ArtefaktSpeicher(datensatz_budget)
+        self._datensatz_lock = threading.Lock()
+        self.metriken = DienstMetriken()
+        self.logger = richte_trace_ein(trace_datei) if trace_datei else None
+
+    # Funktion zum Einlesen der Daten einer Anfrage oder zum Abruf eines bekannten Datensatzes
+    def datensatz(self, anfrage, pflicht=True):
+        if "daten_hash" in anfrage:
+            with self._datensatz_lock:
+                zusammenfassung = self.datensaetze.hole(anfrage["daten_hash"])
+            if zusammenfassung is None:
+                raise KeyError(f"Unbekannter daten_hash {anfrage['daten_hash']} (Daten erneut mit /parse senden)")
+            return zusammenfassung, None
+
+        if "werte" in anfrage:
+            werte = np.asarray(anfrage["werte"], dtype=np.float64)
+            gueltig = np.isfinite(werte) & (werte >= 0)
+            abgelehnt = [(int(i) + 1, str(werte[i])) for i in np.flatnonzero(~gueltig)[:100]]
+            werte, achsen, anzahl_abgelehnt = werte[gueltig], False, int((~gueltig).sum())
+        elif "text" in anfrage or "base64" in anfrage:
+            inhalt = anfrage["text"].encode("utf-8") if "text" in anfrage else base64.b64decode(anfrage["base64"])
+            eingelesen = lade_blockliste(inhalt, anfrage.get("dateiname"), min_wert=0.0)
+            werte, achsen = eingelesen.werte, eingelesen.achsen
+            abgelehnt, anzahl_abgelehnt = eingelesen.abgelehnt, eingelesen.anzahl_abgelehnt
+        elif pflicht:
+            raise ValueError("Die Anfrage braucht 'daten_hash', 'text', 'base64' oder 'werte'")
+        else:
+            return None, None
+        if len(werte) == 0:
+            raise ValueError("Die Blockliste enthält keine gültigen Werte")
+
+        if achsen:
+            m_achsen = sortiert(werte)
+        else:
+            werte = sortiert(werte)
+            dichte = zahl_aus_anfrage(anfrage, "dichte_kg_m3")
+            if dichte is not None:
+                # Umrechnung von Tonnen in m³
+                werte = werte * 1000 / dichte
+            m_achsen = berechne_dritte_wurzel(werte)
+        zusammenfassung = Zusammenfassung(m_achsen, ist_sortiert=True)
+        with self._datensatz_lock:
+            self.datensaetze.setze(zusammenfassung.daten_hash, zusammenfassung)
+        return zusammenfassung, {"abgelehnt": [[n, t] for n, t in abgelehnt], "anzahl_abgelehnt": anzahl_abgelehnt}
+
+    # Funktion für die Parameter einer Anfrage: "parameter" (Name -> Liste) oder Anpassung an die Daten
+    def parameter(self, anfrage, zusammenfassung, namen=None):
+        if "parameter" in anfrage:
+            if not isinstance(anfrage["parameter"], dict):
+                raise ValueError("'parameter' muss ein Objekt Name -> Parameterliste sein, "
+                                 "z.B. {\"expon\": [0.0, 0.5]}")
+            return {name: pruefe_parameter(name, werte) for name, werte in anfrage["parameter"].items()}, {}
+        if zusammenfassung is None:
+            raise ValueError("Die Anfrage braucht 'parameter' oder Daten zum Anpassen")
+        namen = pruefe_verteilungen(namen or anfrage.get("verteilungen") or STANDARD_VERTEILUNGEN)
+        fits = self.stapler.fitte(zusammenfassung, list(namen), zahl_aus_anfrage(anfrage, "timeout", 120))
+        return {n: f.parameter for n, f in fits.items() if f.parameter is not None}, fits
+
+    def parse(self, anfrage):
+        zusammenfassung, meldungen = self.datensatz(anfrage)
+        return {"daten_hash": zusammenfassung.daten_hash, "anzahl": zusammenfassung.anzahl,
+                **(meldungen or {"abgelehnt": [], "anzahl_abgelehnt": 0})}
+
+    def fit(self, anfrage):
+        zusammenfassung, meldungen = self.datensatz(anfrage)
+        _, fits = self.parameter(anfrage, zusammenfassung)
+        return {
+            "daten_hash": zusammenfassung.daten_hash,
+            "anzahl": zusammenfassung.anzahl,
+            **(meldungen or {}),
+            "verteilungen": {
+                name: {
+                    "status": f.status,
+                    "dauer_s": f.dauer,
+                    "meldung": f.meldung,
+                    "parameter": list(f.parameter) if f.parameter is not None else None,
+                    "parameter_benannt": benenne_parameter(name, f.parameter) if f.parameter is not None else None,
+                }
+                for name, f in fits.items()
+            },
+        }
+
+    def perzentile(self, anfrage):
+        zusammenfassung, _ = self.datensatz(anfrage, pflicht="parameter" not in anfrage)
+        parameter, fits = self.parameter(anfrage, zusammenfassung)
+        perzentile = pruefe_perzentile(anfrage["perzentile"]) if "perzentile" in anfrage else TABELLEN_PERZENTILE
+        matrix = berechne_quantil_matrix(perzentile, parameter, zusammenfassung)
+        return {
+            "daten_hash": zusammenfassung.daten_hash if zusammenfassung is not None else None,
+            "perzentile": _json_zahlen(matrix.perzentile),
+            "spalten": matrix.spalten,
+            "m": {spalte: _json_zahlen(matrix.m[:, j]) for j, spalte in enumerate(matrix.spalten)},
+            "m3": {spalte: _json_zahlen(matrix.m3[:, j]) for j, spalte in enumerate(matrix.spalten)},
+            "status": {name: f.status for name, f in fits.items()},
+        }
+
+    # Stichprobe: Volumina [m³] als JSON oder (ausgabe='blockliste') als gzip-Blockliste wie in der App,
+    # die blockweise erzeugt und gesendet wird
+    def stichprobe(self, anfrage):
+        name = anfrage.get("verteilung", "genexpon")
+        pruefe_verteilungen([name], "verteilung")
+        if "parameter" in anfrage and not isinstance(anfrage["parameter"], dict):
+            werte = pruefe_parameter(name, anfrage["parameter"])
+        else:
+            zusammenfassung, _ = self.datensatz(anfrage, pflicht="parameter" not in anfrage)
+            parameter, _ = self.parameter(anfrage, zusammenfassung, [name])
+            if "parameter" in anfrage and name not in parameter:
+                raise ValueError(f"'parameter' enthält keine Parameter für '{name}'")
+            if name not in parameter:
+                raise ValueError(f"Anpassung '{name}' fehlgeschlagen")
+            werte = parameter[name]
+        anzahl = zahl_aus_anfrage(anfrage, "anzahl", 1000, positiv=False, ganzzahl=True)
+        seed = zahl_aus_anfrage(anfrage, "seed", positiv=False, ganzzahl=True)
+        max_volumen = zahl_aus_anfrage(anfrage, "max_volumen_m3")
+        if anfrage.get("ausgabe") == "blockliste":
+            stuecke = erzeuge_blockliste_stuecke(name, werte, anzahl, seed, komprimiert=True, max_volumen_m3=max_volumen)
+            # Das erste Stück vorab erzeugen, damit ungültige Anfragen noch mit 400 beantwortet werden
+            return itertools.chain([next(stuecke, b"")], stuecke)
+        if anzahl > MAX_STICHPROBE_JSON:
+            raise ValueError(f"Höchstens {MAX_STICHPROBE_JSON} Werte als JSON, größere Stichproben mit "
+                             f"\"ausgabe\": \"blockliste\"")
+        volumen = np.concatenate(list(erzeuge_volumen_chunks(name, werte, anzahl, seed, max_volumen_m3=max_volumen))
+                                 or [np.empty(0)])
+        return {"verteilung": name, "parameter": list(werte), "volumen_m3": _json_zahlen(volumen)}
+
+    def metriken_auswertung(self):
+        auswertung = self.metriken.auswertung()
+        auswertung["fit_cache"] = self.fit_cache.statistik()
+        auswertung["stapel"] = {
+            "anzahl": self.stapler.stapel,
+            "anpassungen": self.stapler.stapel_anpassungen,
+            "mittlere_groesse": self.stapler.stapel_anpassungen / self.stapler.stapel if self.stapler.stapel else 0.0,
+            "zusammengelegt": self.stapler.zusammengelegt,
+            "abgebrochen": self.stapler.abgebrochen(),
+            "prozesse": self.stapler.prozesse,
+        }
+        statistik = self.datensaetze.statistik()
+        auswertung["datensaetze"] = {"anzahl": len(statistik["artefakte"]), "belegt_bytes": statistik["belegt"],
+                                     "verdraengt": statistik["verdraengt"]}
+        return auswertung
+
+    # Funktion für den Trace einer Anfrage (eine JSON-Zeile wie bei der App, Auswertung mit bgv_messung.py)
+    def protokolliere(self, endpunkt, dauer, status):
+        self.metriken.erfasse(endpunkt, dauer, fehler=status >= 400)
+        if self.logger is not None:
+            Messprotokoll(logger=self.logger, kontext={"dienst": True}).eintragen(f"dienst_{endpunkt}", dauer,
+                                                                               status=status)
+
+    def beenden(self):
+        self.stapler.beenden()
+
+
+# HTTP-Handler: ein Thread je Verbindung (ThreadingHTTPServer), Keep-Alive über HTTP/1.1
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    dienst = None
+
+    POST_ENDPUNKTE = {"/parse": "parse", "/fit": "fit", "/perzentile": "perzentile", "/stichprobe": "stichprobe"}
+
+    # inhalt: JSON-Objekt, Bytes oder Folge von Byte-Stücken (chunked, ohne die ganze Antwort im Speicher)
+    def _antworte(self, status, inhalt, typ="application/json"):
+        if typ == "application/json":
+            inhalt = json.dumps(inhalt, ensure_ascii=False, allow_nan=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", typ)
+        if isinstance(inhalt, bytes):
+            self.send_header("Content-Length", str(len(inhalt)))
+            self.end_headers()
+            self.wfile.write(inhalt)
+            return
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for stueck in inhalt:
+                if stueck:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(stueck), stueck))
+        except Exception:
+            # Status und Kopf sind gesendet (oder der Client ist weg): Verbindung ohne Abschluss schließen,
+            # der Client sieht eine unvollständige Antwort
+            self.close_connection = True
+            return
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        start = time.perf_counter()
+        pfad = self.path.split("?", 1)[0]
+        if pfad == "/metriken":
+            status, inhalt = 200, self.dienst.metriken_auswertung()
+        elif pfad == "/gesundheit":
+            status, inhalt = 200, {"status": "ok"}
+        else:
+            status, inhalt = 404, {"fehler": f"Unbekannter Endpunkt {pfad}"}
+        self._antworte(status, inhalt)
+        self.dienst.protokolliere(pfad.strip("/") if status == 200 else "unbekannt", time.perf_counter() - start,
+                                  status)
+
+    def do_POST(self):
+        start = time.perf_counter()
+        pfad = self.path.split("?", 1)[0]
+        endpunkt = self.POST_ENDPUNKTE.get(pfad)
+        laenge = int(self.headers.get("Content-Length", 0))
+        typ = "application/json"
+        try:
+            if endpunkt is None:
+                self.rfile.read(laenge)
+                status, inhalt = 404, {"fehler": f"Unbekannter Endpunkt {pfad}"}
+            elif laenge > MAX_ANFRAGE_BYTES:
+                self.close_connection = True
+                status, inhalt = 413, {"fehler": f"Anfrage größer als {MAX_ANFRAGE_BYTES} Bytes"}
+            else:
+                anfrage = json.loads(self.rfile.read(laenge) or b"{}")
+                if not isinstance(anfrage, dict):
+                    raise ValueError("Die Anfrage muss ein JSON-Objekt sein")
+                inhalt = getattr(self.dienst, endpunkt)(anfrage)
+                status = 200
+                if not isinstance(inhalt, dict):
+                    typ = "application/gzip"
+        except KeyError as e:
+            status, inhalt = 400, {"fehler": str(e.args[0]) if e.args else str(e)}
+        except (ValueError, TypeError, ImportError) as e:
+            status, inhalt = 400, {"fehler": str(e)}
+        except Exception as e:
+            status, inhalt = 500, {"fehler": f"{type(e).__name__}: {e}"}
+        self._antworte(status, inhalt, typ)
+        self.dienst.protokolliere(endpunkt or "unbekannt", time.perf_counter() - start, status)
+
+    # Kein Zugriffsprotokoll auf stderr (Messwerte über /metriken und die Trace-Datei)
+    def log_message(self, format, *args):
+        pass
+
+
+# Funktion zum Start des Dienstes; port=0 wählt einen freien Port (server.server_address)
+# hintergrund=True startet den Server in einem Thread (z.B. für Tests gegen localhost).
+def starte_dienst(host=STANDARD_HOST, port=STANDARD_PORT, hintergrund=False, **optionen):
+    dienst = BGVDienst(**optionen)
+    handler = type("BGVHandler", (_Handler,), {"dienst": dienst})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.dienst = dienst
+    if hintergrund:
+        threading.Thread(target=server.serve_forever, name="bgv-dienst", daemon=True).start()
+    return server
+
+
+# Funktion zum Beenden eines gestarteten Dienstes (Server und Prozesspool)
+def beende_dienst(server):
+    server.shutdown()
+    server.server_close()
+    server.dienst.beenden()
+
+
+# Funktion für eine Anfrage an einen laufenden Dienst (JSON hin, JSON oder Bytes zurück)
+def anfrage(url, endpunkt, daten=None, timeout=300):
+    if daten is None:
+        request = urllib.request.Request(url.rstrip("/") + endpunkt)
+    else:
+        request = urllib.request.Request(url.rstrip("/") + endpunkt, data=json.dumps(daten).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as antwort:
+            inhalt = antwort.read()
+            if antwort.headers.get("Content-Type") == "application/json":
+                return json.loads(inhalt)
+            return inhalt
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(f"{e.code}: {json.loads(e.read()).get('fehler')}") from None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lokaler HTTP/JSON-Dienst für Anpassung, Perzentile und Stichproben")
+    parser.add_argument("--host", default=STANDARD_HOST)
+    parser.add_argument("--port", type=int, default=STANDARD_PORT)
+    parser.add_argument("--prozesse", type=int, default=None, help="Anzahl der Worker-Prozesse (0 = im Dienst)")
+    parser.add_argument("--cache-verzeichnis", default=None, help="Verzeichnis für den Fit-Cache")
+    parser.add_argument("--trace", default=None, help="Trace-Datei (eine JSON-Zeile pro Anfrage)")
+    parser.add_argument("--wartezeit-ms", type=float, default=STAPEL_WARTEZEIT_S * 1000,
+                        help="Sammelzeit für gleichzeitige Anpassungen")
+    args = parser.parse_args(argv)
+
+    server = starte_dienst(args.host, args.port, prozesse=args.prozesse, cache_verzeichnis=args.cache_verzeichnis,
+                           trace_datei=args.trace, wartezeit=args.wartezeit_ms / 1000)
+    print(f"BGV-Dienst läuft auf http://{server.server_address[0]}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.dienst.beenden()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  parallele Anpassung der Verteilungsfunktionen
+# Die Anpassungen laufen in einem langlebigen Pool von Worker-Prozessen (forkserver bzw. spawn, kein fork aus dem
+# Streamlit-Server mit seinen Threads); jede Anpassung hat ihr eigenes Zeitlimit, ein hängender Worker wird beendet
+# und beim nächsten Bedarf ersetzt.
+# --------------------------------------------------------------
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from bgv_cache import berechne_cache_schluessel, berechne_daten_hash
+from bgv_mle import MLE_VERSION, SPEZIAL_FITTER, fitte_mle
+
+# Standardmäßig angepasste Verteilungen (Reihenfolge wie in der App)
+STANDARD_VERTEILUNGEN = ['genexpon', 'expon', 'powerlaw']
+
+# Ergebnis einer Anpassung; status ist 'ok', 'cache', 'timeout' oder 'fehler'
+FitErgebnis = namedtuple('FitErgebnis', ['name', 'parameter', 'status', 'dauer', 'meldung'])
+
+# Startmethode der Worker-Prozesse (forkserver, wo verfügbar, sonst spawn)
+STANDARD_KONTEXT = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+# Funktion für den Cache-Schlüssel einer Anpassung (eigene Schätzer aus bgv_mle mit ihrer Version)
+def fit_cache_schluessel(daten_hash, name):
+    return berechne_cache_schluessel(daten_hash, name, MLE_VERSION if name in SPEZIAL_FITTER else None)
+
+
+# Funktion zur Anpassung einer einzelnen Verteilung (läuft im Worker-Prozess)
+# expon, powerlaw und genexpon über die spezialisierten Schätzer aus bgv_mle, alle anderen über scipy
+# startwerte: z.B. die Parameter der vorherigen Anpassung (Warmstart)
+def fitte_verteilung(name, m_achsen, startwerte=None):
+    return tuple(float(p) for p in fitte_mle(name, m_achsen, startwerte))
+
+
+# Funktion für den Worker: Fehler werden als Ergebnis zurückgegeben statt geworfen
+def _fit_aufgabe(name, m_achsen, startwerte=None):
+    start = time.perf_counter()
+    try:
+        parameter = fitte_verteilung(name, m_achsen, startwerte)
+        return name, parameter, 'ok', time.perf_counter() - start, ''
+    except Exception as e:
+        return name, None, 'fehler', time.perf_counter() - start, str(e)
+
+
+# Schleife eines Worker-Prozesses: Aufträge (funktion, argumente) über die Pipe, (True, Ergebnis) oder
+# (False, Fehlermeldung) zurück. funktion muss auf Modulebene stehen (z.B. _fit_aufgabe).
+# Nach dem Start (Importe erledigt) meldet der Worker sich bereit, damit der Start nicht zum Zeitlimit zählt.
+def _worker_schleife(verbindung):
+    verbindung.send("bereit")
+    while True:
+        try:
+            auftrag = verbindung.recv()
+        except EOFError:
+            return
+        if auftrag is None:
+            return
+        funktion, argumente = auftrag
+        try:
+            verbindung.send((True, funktion(*argumente)))
+        except Exception as e:
+            verbindung.send((False, f"{type(e).__name__}: {e}"))
+
+
+# Langlebiger Pool von Worker-Prozessen für die Anpassungen (einer pro Prozess, von allen Aufrufen geteilt)
+# Worker werden erst bei Bedarf gestartet, höchstens prozesse gleichzeitig. Jede Anpassung belegt einen Worker;
+# überschreitet sie ihr Zeitlimit, wird nur dieser Worker beendet.
+class FitPool:
+    def __init__(self, prozesse=None, kontext=STANDARD_KONTEXT):
+        self.prozesse = prozesse or os.cpu_count() or 1
+        self._kontext = multiprocessing.get_context(kontext)
+        self._frei = []
+        self._gestartet = 0
+        self._bedingung = threading.Condition()
+        self.beendet = 0
+
+    def _hole_worker(self):
+        with self._bedingung:
+            while not self._frei and self._gestartet >= self.prozesse:
+                self._bedingung.wait()
+            if self._frei:
+                return self._frei.pop()
+            self._gestartet += 1
+        try:
+            eltern, kind = self._kontext.Pipe()
+            prozess = self._kontext.Process(target=_worker_schleife, args=(kind,), daemon=True)
+            prozess.start()
+            kind.close()
+            eltern.recv()
+            return prozess, eltern
+        except Exception:
+            self._verwerfe(None)
+            raise
+
+    def _gib_zurueck(self, worker):
+        with self._bedingung:
+            self._frei.append(worker)
+            self._bedingung.notify()
+
+    def _verwerfe(self, worker):
+        if worker is not None:
+            prozess, verbindung = worker
+            prozess.kill()
+            prozess.join()
+            verbindung.close()
+            self.beendet += 1
+        with self._bedingung:
+            self._gestartet -= 1
+            self._bedingung.notify()
+
+    # Funktion zum Ausführen von funktion(*argumente) in einem Worker (blockiert bis zum Ergebnis oder zum Zeitlimit)
+    # Das Zeitlimit zählt ab dem Start im Worker, nicht ab dem Warten auf einen freien Worker.
+    # Bei Überschreitung wird der Worker beendet (TimeoutError); Fehler im Worker ergeben RuntimeError.
+    def fuehre_aus(self, funktion, argumente, timeout=120):
+        worker = self._hole_worker()
+        prozess, verbindung = worker
+        try:
+            verbindung.send((funktion, argumente))
+            if verbindung.poll(timeout):
+                ok, ergebnis = verbindung.recv()
+                self._gib_zurueck(worker)
+                if not ok:
+                    raise RuntimeError(ergebnis)
+                return ergebnis
+        except (EOFError, OSError) as e:
+            self._verwerfe(worker)
+            raise RuntimeError(f"Worker-Prozess beendet ({e or type(e).__name__})") from None
+        self._verwerfe(worker)
+        raise TimeoutError(f"nach {timeout} s abgebrochen")
+
+    # Funktion für eine Anpassung in einem Worker; liefert (name, parameter, status, dauer, meldung) wie _fit_aufgabe
+    def fitte(self, name, daten, startwerte=None, timeout=120):
+        try:
+            return self.fuehre_aus(_fit_aufgabe, (name, daten, startwerte), timeout)
+        except TimeoutError:
+            return name, None, 'timeout', float(timeout), f"Anpassung nach {timeout} s abgebrochen"
+        except RuntimeError as e:
+            return name, None, 'fehler', 0.0, str(e)
+
+    def schliessen(self):
+        with self._bedingung:
+            frei, self._frei = self._frei, []
+        for prozess, verbindung in frei:
+            try:
+                verbindung.send(None)
+            except OSError:
+                pass
+            prozess.join(timeout=1)
+            if prozess.is_alive():
+                prozess.kill()
+            verbindung.close()
+            with self._bedingung:
+                self._gestartet -= 1
+
+
+_fit_pool = None
+_fit_pool_lock = threading.Lock()
+
+
+# Funktion für den gemeinsamen Pool dieses Prozesses (beim ersten Aufruf angelegt)
+def hole_fit_pool():
+    global _fit_pool
+    with _fit_pool_lock:
+        if _fit_pool is None:
+            _fit_pool = FitPool()
+        return _fit_pool
+
+
+# Funktion zur Anpassung mehrerer Verteilungen, parallel und mit Zeitlimit pro Fit.
+# Generator: liefert ein FitErgebnis, sobald eine Anpassung fertig ist.
+# Die Anpassungen laufen im gemeinsamen FitPool; max_workers begrenzt, wie viele davon gleichzeitig laufen.
+# max_workers=0 passt sequentiell im aufrufenden Prozess an (ohne Zeitlimit).
+# daten_hash: bereits bekannter Hash der Daten für den Cache (spart das erneute Hashen)
+# startwerte: Name -> Parametertupel für den Warmstart (z.B. aus der vorherigen Anpassung)
+def fitte_verteilungen_parallel(m_achsen, namen=None, timeout=120, max_workers=None, fit_cache=None, daten_hash=None,
+                                startwerte=None):
+    namen = list(STANDARD_VERTEILUNGEN if namen is None else namen)
+    startwerte = startwerte or {}
+    daten = np.ascontiguousarray(np.asarray(m_achsen, dtype=np.float64))
+
+    # Bereits bekannte Parameter direkt aus dem Cache liefern
+    schluessel = {}
+    offen = []
+    if fit_cache is not None:
+        if daten_hash is None:
+            daten_hash = berechne_daten_hash(daten)
+        for name in namen:
+            schluessel[name] = fit_cache_schluessel(daten_hash, name)
+            parameter = fit_cache.hole(schluessel[name])
+            if parameter is not None:
+                yield FitErgebnis(name, parameter, 'cache', 0.0, '')
+            else:
+                offen.append(name)
+    else:
+        offen = namen
+
+    if not offen:
+        return
+
+    def _ergebnis(name, parameter, status, dauer, meldung):
+        if parameter is not None and fit_cache is not None:
+            parameter = fit_cache.speichere(schluessel[name], parameter)
+        return FitErgebnis(name, parameter, status, dauer, meldung)
+
+    if max_workers == 0:
+        for name in offen:
+            yield _ergebnis(*_fit_aufgabe(name, daten, startwerte.get(name)))
+        return
+
+    # Höchstens max_workers Anpassungen dieses Aufrufs gleichzeitig im gemeinsamen Pool
+    pool = hole_fit_pool()
+    auftraege = queue.Queue()
+    for name in offen:
+        auftraege.put(name)
+    fertig = queue.Queue()
+
+    def arbeite():
+        while True:
+            try:
+                name = auftraege.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                fertig.put(pool.fitte(name, daten, startwerte.get(name), timeout))
+            except Exception as e:
+                fertig.put((name, None, 'fehler', 0.0, str(e)))
+
+    for _ in range(min(len(offen), max_workers or pool.prozesse)):
+        threading.Thread(target=arbeite, name="bgv-fit", daemon=True).start()
+    for _ in offen:
+        yield _ergebnis(*fertig.get())
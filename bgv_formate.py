@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  komprimierte und binäre Formate für Blocklisten
+# Text (.txt), gzip- und zstd-komprimierter Text (.gz, .zst) werden beim Lesen
+# blockweise entpackt und vom Parser gelesen; .npy, Parquet und Arrow werden ohne Textparser
+# speicherabgebildet (mmap) bzw. ohne Kopie aus dem Puffer geladen.
+# Export der verarbeiteten Achsen in denselben Formaten (Dateiname endet auf _achsen_m.<format>),
+# damit spätere Sitzungen und Stapelläufe die dritte Wurzel nicht neu berechnen. Die Kennung steht
+# in der Datei selbst: Spalte 'achse_m' (Parquet/Arrow), Feld 'achse_m' (.npy), Kopfzeile '# achse_m' (Text);
+# der Dateiname zählt nur noch bei älteren Exporten ohne Kennung.
+# zstd braucht das Paket zstandard, Parquet und Arrow das Paket pyarrow.
+# --------------------------------------------------------------
+
+import gzip
+import importlib.util
+import io
+import os
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from bgv_parser import ParseErgebnis, lese_blockliste
+
+# Formate mit Dateiendungen (in der Reihenfolge der Prüfung) und Kennbytes am Dateianfang
+FORMATE = {
+    'gzip': ((".txt.gz", ".gz"), b"\x1f\x8b"),
+    'zstd': ((".txt.zst", ".zst"), b"\x28\xb5\x2f\xfd"),
+    'npy': ((".npy",), b"\x93NUMPY"),
+    'parquet': ((".parquet", ".parq"), b"PAR1"),
+    'arrow': ((".arrow", ".feather", ".ipc"), b"ARROW1"),
+    'text': ((".txt", ".csv", ".dat"), None),
+}
+
+# Dateiendungen für st.file_uploader (ohne Punkt)
+UPLOAD_ENDUNGEN = ["txt", "gz", "zst", "npy", "parquet", "arrow", "feather"]
+
+# Endung und MIME-Typ je Exportformat
+EXPORT_FORMATE = {
+    'npy': (".npy", "application/octet-stream"),
+    'parquet': (".parquet", "application/vnd.apache.parquet"),
+    'arrow': (".arrow", "application/vnd.apache.arrow.file"),
+    'gzip': (".txt.gz", "application/gzip"),
+    'zstd': (".txt.zst", "application/zstd"),
+    'text': (".txt", "text/plain"),
+}
+
+# Kennzeichen exportierter Achsen im Dateinamen, Spalten- bzw. Feldname in Parquet/Arrow/.npy
+# und Kopfzeile in Textdateien (der Parser überspringt Zeilen mit '#')
+ACHSEN_ENDUNG = "_achsen_m"
+ACHSEN_SPALTE = "achse_m"
+ACHSEN_KOPF = b"# " + ACHSEN_SPALTE.encode("ascii")
+
+# Kopien aus dem Browser-Download, z.B. "x_achsen_m (1).npy"
+KOPIE_MUSTER = re.compile(r"\s*\(\d+\)$")
+
+# Ergebnis des Ladens: wie ParseErgebnis, achsen=True bei exportierten Achsen [m] (sonst m³ bzw. t)
+LadeErgebnis = namedtuple('LadeErgebnis', ParseErgebnis._fields + ('achsen', 'format'))
+
+
+# Funktion zur Bestimmung des Formats aus den Kennbytes, sonst aus der Dateiendung (Standard: Text)
+def erkenne_format(quelle, dateiname=None):
+    if isinstance(quelle, (bytes, bytearray, memoryview)):
+        kopf = bytes(quelle[:8])
+    elif isinstance(quelle, (str, os.PathLike)):
+        with open(quelle, "rb") as f:
+            kopf = f.read(8)
+        dateiname = dateiname or os.fspath(quelle)
+    else:
+        kopf = b""
+    for name, (_, kennung) in FORMATE.items():
+        if kennung is not None and kopf.startswith(kennung):
+            return name
+    dateiname = str(dateiname or getattr(quelle, "name", "")).lower()
+    for name, (endungen, _) in FORMATE.items():
+        if dateiname.endswith(endungen):
+            return name
+    return 'text'
+
+
+# Funktion für den Dateinamen ohne Verzeichnis und ohne bekannte Endung (auch doppelte wie .txt.gz)
+def basisname(dateiname):
+    name = os.path.basename(str(dateiname or ""))
+    for endungen, _ in FORMATE.values():
+        for endung in endungen:
+            if name.lower().endswith(endung):
+                return name[:-len(endung)]
+    return os.path.splitext(name)[0]
+
+
+# Funktion zur Prüfung am Dateinamen, ob eine Datei exportierte Achsen enthält (ältere Exporte ohne Kennung)
+def ist_achsen_datei(dateiname):
+    return KOPIE_MUSTER.sub("", basisname(dateiname)).lower().endswith(ACHSEN_ENDUNG)
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("Für zstd-komprimierte Blocklisten wird zstandard benötigt (pip install zstandard).") from e
+    return zstandard
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Für Parquet- und Arrow-Dateien wird pyarrow benötigt (pip install pyarrow).") from e
+    return pyarrow
+
+
+# Funktion zum Öffnen einer komprimierten Textdatei als Dateiobjekt, das blockweise entpackt
+# Übergebene Dateiobjekte bleiben beim Schließen offen.
+def oeffne_text(quelle, format):
+    if isinstance(quelle, (bytes, bytearray, memoryview)):
+        quelle = io.BytesIO(quelle)
+    if format == 'gzip':
+        return gzip.open(quelle, "rb")
+    if format == 'zstd':
+        eigene_datei = isinstance(quelle, (str, os.PathLike))
+        if eigene_datei:
+            quelle = open(quelle, "rb")
+        return _zstandard().ZstdDecompressor().stream_reader(quelle, read_across_frames=True, closefd=eigene_datei)
+    raise ValueError(f"Kein komprimiertes Textformat: {format}")
+
+
+# Funktion zur Prüfung, ob eine (komprimierte) Textdatei mit der Kopfzeile '# achse_m' beginnt
+# Dateiobjekte werden danach an ihre Position zurückgesetzt; nicht rücksetzbare gelten als ohne Kopfzeile.
+def hat_achsen_kopf(quelle, format):
+    laenge = len(ACHSEN_KOPF) + 3
+    position = None
+    if not isinstance(quelle, (str, os.PathLike, bytes, bytearray, memoryview)):
+        if not (hasattr(quelle, "seekable") and quelle.seekable()):
+            return False
+        position = quelle.tell()
+    try:
+        if format != 'text':
+            with oeffne_text(quelle, format) as text:
+                kopf = text.read(laenge)
+        elif position is not None:
+            kopf = quelle.read(laenge)
+        elif isinstance(quelle, (str, os.PathLike)):
+            with open(quelle, "rb") as f:
+                kopf = f.read(laenge)
+        else:
+            kopf = bytes(quelle[:laenge])
+    finally:
+        if position is not None:
+            quelle.seek(position)
+    if isinstance(kopf, str):
+        kopf = kopf.encode("utf-8")
+    if kopf.startswith(b"\xef\xbb\xbf"):
+        kopf = kopf[3:]
+    return kopf.split(b"\n", 1)[0].rstrip() == ACHSEN_KOPF
+
+
+# Funktion zum Laden eines .npy-Arrays: Pfad über mmap, Bytes ohne Kopie (Array zeigt in den Puffer)
+# Strukturierte Arrays liefern das Feld achse_m (bzw. das erste Feld), ebenfalls ohne Kopie.
+def _lade_npy(quelle):
+    werte = _lade_npy_array(quelle)
+    if werte.dtype.names is None:
+        return werte, False
+    feld = ACHSEN_SPALTE if ACHSEN_SPALTE in werte.dtype.names else werte.dtype.names[0]
+    return werte[feld], feld == ACHSEN_SPALTE
+
+
+def _lade_npy_array(quelle):
+    if isinstance(quelle, (str, os.PathLike)):
+        return np.load(quelle, mmap_mode="r")
+    if not isinstance(quelle, (bytes, bytearray, memoryview)):
+        quelle = quelle.read()
+    kopf = io.BytesIO(quelle)
+    version = np.lib.format.read_magic(kopf)
+    lese_kopf = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+    form, fortran, dtype = lese_kopf(kopf)
+    if dtype.hasobject:
+        raise ValueError(".npy-Dateien mit Python-Objekten werden nicht geladen")
+    werte = np.frombuffer(quelle, dtype=dtype, count=int(np.prod(form)), offset=kopf.tell())
+    return werte.reshape(form, order="F" if fortran else "C")
+
+
+# Funktion zum Laden einer Parquet- oder Arrow-Datei (Spalte achse_m bzw. erste Zahlenspalte)
+# Pfade werden speicherabgebildet, einteilige Spalten ohne Lücken werden ohne Kopie übernommen.
+def _lade_tabelle(quelle, format):
+    pa = _pyarrow()
+    if isinstance(quelle, (bytes, bytearray, memoryview)):
+        quelle = pa.BufferReader(pa.py_buffer(quelle))
+    elif isinstance(quelle, (str, os.PathLike)) and format == 'arrow':
+        quelle = pa.memory_map(os.fspath(quelle), "r")
+    if format == 'parquet':
+        tabelle = pa.parquet.read_table(quelle, memory_map=True)
+    else:
+        tabelle = pa.ipc.open_file(quelle).read_all()
+    namen = tabelle.column_names
+    if ACHSEN_SPALTE in namen:
+        spalte = ACHSEN_SPALTE
+    else:
+        zahlen = [n for n in namen if pa.types.is_floating(tabelle.schema.field(n).type)
+                  or pa.types.is_integer(tabelle.schema.field(n).type)]
+        if not zahlen:
+            raise ValueError("Die Tabelle enthält keine Zahlenspalte")
+        spalte = zahlen[0]
+    werte = tabelle.column(spalte)
+    if werte.num_chunks == 1:
+        werte = werte.chunk(0)
+    else:
+        werte = werte.combine_chunks()
+    return werte.to_numpy(zero_copy_only=False), spalte == ACHSEN_SPALTE
+
+
+# Funktion zur Prüfung eines binär geladenen Arrays (ein Wert pro "Zeile" = Element)
+# Gültige Arrays werden unverändert (ohne Kopie) zurückgegeben.
+def _pruefe_werte(werte, min_wert, max_gemeldet):
+    werte = np.asarray(werte).reshape(-1)
+    if werte.dtype != np.float64:
+        werte = werte.astype(np.float64)
+    gueltig = np.isfinite(werte)
+    if min_wert is not None:
+        gueltig &= werte >= min_wert
+    if gueltig.all():
+        return werte, [], 0
+    ungueltig = np.flatnonzero(~gueltig)
+    abgelehnt = [(int(i) + 1, str(werte[i])) for i in ungueltig[:max_gemeldet]]
+    return werte[gueltig], abgelehnt, len(ungueltig)
+
+
+# Funktion zum Einlesen einer Blockliste in jedem unterstützten Format
+# quelle: Pfad, Bytes oder Dateiobjekt; dateiname hilft bei der Erkennung (Uploads, exportierte Achsen)
+# Binäre Formate liefern schreibgeschützte Arrays (mmap bzw. Upload-Puffer).
+def lade_blockliste(quelle, dateiname=None, min_wert=None, max_gemeldet=100):
+    if dateiname is None:
+        dateiname = os.fspath(quelle) if isinstance(quelle, (str, os.PathLike)) else getattr(quelle, "name", None)
+    format = erkenne_format(quelle, dateiname)
+    achsen = ist_achsen_datei(dateiname)
+
+    if format in ('text', 'gzip', 'zstd'):
+        achsen = achsen or hat_achsen_kopf(quelle, format)
+    if format == 'text':
+        return LadeErgebnis(*lese_blockliste(quelle, min_wert=min_wert, max_gemeldet=max_gemeldet), achsen, format)
+    if format in ('gzip', 'zstd'):
+        with oeffne_text(quelle, format) as text:
+            ergebnis = lese_blockliste(text, min_wert=min_wert, max_gemeldet=max_gemeldet)
+        return LadeErgebnis(*ergebnis, achsen, format)
+
+    if format == 'npy':
+        werte, feld_achsen = _lade_npy(quelle)
+    else:
+        werte, feld_achsen = _lade_tabelle(quelle, format)
+    achsen = achsen or feld_achsen
+    anzahl = int(np.size(werte))
+    werte, abgelehnt, anzahl_abgelehnt = _pruefe_werte(werte, min_wert, max_gemeldet)
+    return LadeErgebnis(werte, abgelehnt, anzahl_abgelehnt, anzahl, achsen, format)
+
+
+# Funktion, die ein Array sortiert zurückgibt; bereits sortierte Arrays (z.B. Exporte) ohne Kopie
+def sortiert(werte):
+    werte = np.asarray(werte)
+    if len(werte) < 2 or not np.any(werte[1:] < werte[:-1]):
+        return werte
+    return np.sort(werte)
+
+
+# Funktion für die Exportformate, deren optionale Pakete installiert sind
+def verfuegbare_exportformate():
+    benoetigt = {'zstd': "zstandard", 'parquet': "pyarrow", 'arrow': "pyarrow"}
+    return [f for f in EXPORT_FORMATE if f not in benoetigt or importlib.util.find_spec(benoetigt[f]) is not None]
+
+
+# Funktion zum Export eines Arrays als Bytes im gewünschten Format
+# Kennung: Spalte 'achse_m' (Parquet/Arrow), Feld 'achse_m' (.npy), Kopfzeile '# achse_m' (Text)
+def exportiere_werte(werte, format='npy', spalte=ACHSEN_SPALTE):
+    werte = np.ascontiguousarray(werte, dtype=np.float64)
+    if format == 'npy':
+        puffer = io.BytesIO()
+        np.save(puffer, werte.view(np.dtype([(spalte, np.float64)])))
+        return puffer.getvalue()
+    if format in ('parquet', 'arrow'):
+        pa = _pyarrow()
+        tabelle = pa.table({spalte: werte})
+        puffer = pa.BufferOutputStream()
+        if format == 'parquet':
+            pa.parquet.write_table(tabelle, puffer)
+        else:
+            with pa.ipc.new_file(puffer, tabelle.schema) as schreiber:
+                schreiber.write_table(tabelle)
+        return puffer.getvalue().to_pybytes()
+    # Text mit Kopfzeile und voller Genauigkeit (repr von float64), ein Wert pro Zeile
+    text = "\n".join([f"# {spalte}"] + list(map(repr, werte.tolist()))).encode("utf-8") + b"\n"
+    if format == 'gzip':
+        return gzip.compress(text, compresslevel=6)
+    if format == 'zstd':
+        return _zstandard().ZstdCompressor(level=3).compress(text)
+    if format == 'text':
+        return text
+    raise ValueError(f"Unbekanntes Exportformat: {format}")
+
+
+# Funktion zum Dateinamen eines Exports der Achsen (z.B. blocklist_kalk_achsen_m.npy)
+def export_dateiname(basis, format='npy'):
+    basis = basisname(basis) or "blockliste"
+    if not basis.endswith(ACHSEN_ENDUNG):
+        basis += ACHSEN_ENDUNG
+    return basis + EXPORT_FORMATE[format][0]
+
+
+# Funktion zum atomaren Speichern eines Exports (keine halben Dateien bei Abbruch)
+def speichere_werte(werte, pfad, format=None):
+    format = format or erkenne_format(b"", pfad)
+    daten = exportiere_werte(werte, format)
+    tmp = f"{pfad}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(daten)
+    os.replace(tmp, pfad)
+    return pfad
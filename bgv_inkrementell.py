@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  inkrementeller Datensatz (Blöcke zu einem bestehenden Inventar ergänzen)
+# Neue Achsen werden in das bereits sortierte Array eingefügt (O(n + k) statt neu zu sortieren),
+# expon wird aus Anzahl, Summe und Minimum geschlossen aktualisiert, die übrigen Verteilungen
+# werden mit den vorherigen Parametern warm gestartet.
+# --------------------------------------------------------------
+
+import time
+
+import numpy as np
+
+from bgv_fit import STANDARD_VERTEILUNGEN, FitErgebnis, fit_cache_schluessel, fitte_verteilungen_parallel
+from bgv_formate import sortiert
+from bgv_mle import expon_aus_statistik
+from bgv_zusammenfassung import Zusammenfassung
+
+
+# Funktion zum Einfügen neuer Werte in ein sortiertes Array; liefert ein neues sortiertes Array
+# Nur die k neuen Werte werden sortiert, das Zusammenführen ist linear in n + k.
+def fuege_sortiert_ein(sortierte_werte, neue_werte):
+    neue_werte = sortiert(np.asarray(neue_werte, dtype=np.float64))
+    if len(neue_werte) == 0:
+        return sortierte_werte
+    positionen = np.searchsorted(sortierte_werte, neue_werte, side='right')
+    return np.insert(sortierte_werte, positionen, neue_werte)
+
+
+# Sortierte Achsen eines Inventars mit suffizienten Statistiken und den zuletzt angepassten Parametern
+class InkrementellerDatensatz:
+    def __init__(self, m_achsen, ist_sortiert=False, parameter=None):
+        m_achsen = np.asarray(m_achsen, dtype=np.float64)
+        self.sortiert = m_achsen if ist_sortiert else np.sort(m_achsen)
+        if len(self.sortiert) == 0:
+            raise ValueError("Der Datensatz braucht mindestens einen Wert")
+        self.anzahl = len(self.sortiert)
+        self.summe = float(self.sortiert.sum())
+        self.parameter = dict(parameter or {})
+        self.ergaenzungen = 0
+        self._zusammenfassung = None
+
+    # Funktion zum Ergänzen neuer Achsen [m]; liefert die Anzahl der übernommenen Werte
+    def ergaenze(self, neue_m_achsen):
+        neue_m_achsen = np.asarray(neue_m_achsen, dtype=np.float64)
+        if len(neue_m_achsen) == 0:
+            return 0
+        self.sortiert = fuege_sortiert_ein(self.sortiert, neue_m_achsen)
+        self.anzahl += len(neue_m_achsen)
+        self.summe += float(neue_m_achsen.sum())
+        self.ergaenzungen += 1
+        self._zusammenfassung = None
+        return len(neue_m_achsen)
+
+    # Funktion für die Zusammenfassung des aktuellen Stands (nach einer Ergänzung einmal neu berechnet)
+    def zusammenfassung(self):
+        if self._zusammenfassung is None:
+            self._zusammenfassung = Zusammenfassung(self.sortiert, ist_sortiert=True)
+        return self._zusammenfassung
+
+    # Funktion für die geschlossen aktualisierbaren Parameter (ohne Durchlauf über die Daten)
+    def geschlossene_parameter(self):
+        return {'expon': expon_aus_statistik(self.anzahl, self.summe, self.sortiert[0])}
+
+    # Funktion zur Anpassung nach einer Ergänzung (Generator wie fitte_verteilungen_parallel)
+    # expon geschlossen, die übrigen Verteilungen mit den vorherigen Parametern als Startwerten
+    def passe_an(self, namen=None, timeout=120, max_workers=None, fit_cache=None):
+        namen = list(STANDARD_VERTEILUNGEN if namen is None else namen)
+        daten_hash = self.zusammenfassung().daten_hash
+
+        offen = []
+        geschlossen = self.geschlossene_parameter()
+        for name in namen:
+            if name not in geschlossen:
+                offen.append(name)
+                continue
+            start = time.perf_counter()
+            parameter = geschlossen[name]
+            if fit_cache is not None:
+                parameter = fit_cache.speichere(fit_cache_schluessel(daten_hash, name), parameter)
+            self.parameter[name] = parameter
+            yield FitErgebnis(name, parameter, 'ok', time.perf_counter() - start, '')
+
+        for ergebnis in fitte_verteilungen_parallel(self.sortiert, offen, timeout=timeout, max_workers=max_workers,
+                                                    fit_cache=fit_cache, daten_hash=daten_hash,
+                                                    startwerte=self.parameter):
+            if ergebnis.parameter is not None:
+                self.parameter[ergebnis.name] = ergebnis.parameter
+            yield ergebnis
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  tabellierte ppf/cdf für genexpon
+# ppf: kubische Hermite-Interpolation über sqrt(-log(1 - p)) mit exakten Ableitungen,
+#      auf einem gleichmäßigen Gitter (Index ohne Suche), einmal pro Parametersatz aufgebaut
+# cdf: geschlossene Formel ohne den Overhead von scipy.stats
+# Außerhalb des tabellierten Bereichs wird scipy verwendet.
+# Vergleich mit scipy (Arrays, Skalare, Randwerte): tests/test_interpolation.py
+# --------------------------------------------------------------
+
+import functools
+
+import numpy as np
+from scipy import stats
+
+# Tabellierter Bereich: p von 0 bis 1 - exp(-T_MAX) (ca. 1 - 1e-12)
+T_MAX = 27.6
+
+# Zulässiger relativer Fehler der ppf (an den Intervallmitten über die exakte Beziehung t(z) geprüft)
+FEHLERGRENZE = 1e-12
+
+# Anzahl der Stützstellen: beginnend bei MIN_KNOTEN, verdoppelt bis die Fehlergrenze erreicht ist
+MIN_KNOTEN = 257
+MAX_KNOTEN = 16385
+
+
+# Funktion für y - (1 - exp(-y)), für kleine y als Reihe (keine Auslöschung)
+def _y_plus_expm1(y):
+    with np.errstate(over='ignore'):
+        ergebnis = y + np.expm1(-y)
+    klein = y < 1e-2
+    if np.any(klein):
+        yk = y[klein]
+        ergebnis[klein] = yk * yk * (1 / 2 - yk * (1 / 6 - yk * (1 / 24 - yk * (1 / 120 - yk / 720))))
+    return ergebnis
+
+
+# Tabelle einer genexpon-Verteilung mit festen Parametern
+# Für die Standardverteilung gilt exakt t(z) = -log(1 - F(z)) = a z + b / c (c z - 1 + exp(-c z)),
+# dt/dz ist die Ausfallrate a + b (1 - exp(-c z)). Tabelliert wird z über u = sqrt(t): dort ist z(u)
+# auch bei kleinem a glatt (z ~ u² / a am Anfang, ~ u bei wachsender Ausfallrate, ~ u² / (a + b) im Schwanz).
+# Ein Newton-Schritt auf t(z) korrigiert den Rest der kubischen Interpolation.
+class GenexponTabelle:
+    def __init__(self, a, b, c, loc=0.0, scale=1.0, fehlergrenze=FEHLERGRENZE, t_max=T_MAX):
+        self.parameter = (float(a), float(b), float(c), float(loc), float(scale))
+        self.t_max = t_max
+        self.fehlergrenze = fehlergrenze
+        knoten = MIN_KNOTEN
+        while True:
+            self._baue(knoten)
+            self.fehler = self._pruefe()
+            if self.fehler <= fehlergrenze or knoten >= MAX_KNOTEN:
+                break
+            knoten = 2 * knoten - 1
+
+    def _t_aus_z(self, z):
+        a, b, c = self.parameter[:3]
+        return a * z + b / c * _y_plus_expm1(c * z)
+
+    def _rate(self, z):
+        a, b, c = self.parameter[:3]
+        return a + b * -np.expm1(-c * z)
+
+    # Stützstellen z(u) der Standardverteilung (scipy als Startwert, dann Newton; t(z) ist konvex)
+    # und Koeffizienten der kubischen Hermite-Polynome je Intervall
+    def _baue(self, knoten):
+        a, b, c = self.parameter[:3]
+        self.knoten = knoten
+        self.schrittweite = np.sqrt(self.t_max) / (knoten - 1)
+        u = np.linspace(0.0, np.sqrt(self.t_max), knoten)
+        t = u * u
+        with np.errstate(all='ignore'):
+            z = np.asarray(stats.genexpon.ppf(-np.expm1(-t), a, b, c), dtype=np.float64)
+        # Ohne brauchbaren Startwert: t(z) >= a z, also liegt z = t / a rechts der Nullstelle
+        z = np.where(np.isfinite(z) & (z >= 0), z, t / a)
+        for _ in range(200):
+            neu = np.maximum(z - (self._t_aus_z(z) - t) / self._rate(z), 0.0)
+            fertig = np.all(np.abs(neu - z) <= 1e-15 * np.abs(neu))
+            z = neu
+            if fertig:
+                break
+        # dz/du = dz/dt * 2u, auf die Schrittweite bezogen
+        d = 2 * u / self._rate(z) * self.schrittweite
+        z0, z1, d0, d1 = z[:-1], z[1:], d[:-1], d[1:]
+        self._koeffizienten = np.column_stack([z0, d0, 3 * (z1 - z0) - 2 * d0 - d1, 2 * (z0 - z1) + d0 + d1])
+
+    # Größter relativer Fehler an den Intervallmitten (dort ist der Interpolationsfehler am größten)
+    def _pruefe(self):
+        u = (np.arange(self.knoten - 1) + 0.5) * self.schrittweite
+        t = u * u
+        z = self._z_aus_t(t)
+        # Fehler in z aus dem Fehler in t (erste Ordnung: dz = dt / Rate)
+        fehler = np.abs(self._t_aus_z(z) - t) / self._rate(z) / z
+        return float(np.max(fehler)) if np.all(np.isfinite(fehler)) else np.inf
+
+    # Standard-ppf an t (alle t im tabellierten Bereich): Hermite-Polynom in u und ein Newton-Schritt
+    def _z_aus_t(self, t):
+        position = np.sqrt(t) / self.schrittweite
+        k = np.minimum(position.astype(np.intp), self.knoten - 2)
+        s = position - k
+        k0, k1, k2, k3 = self._koeffizienten[k].T
+        z = k0 + s * (k1 + s * (k2 + s * k3))
+        return np.maximum(z - (self._t_aus_z(z) - t) / self._rate(z), 0.0)
+
+    # Quantile [m] zu Wahrscheinlichkeiten p; außerhalb von [0, 1 - exp(-t_max)], bei NaN
+    # und wenn die Fehlergrenze mit MAX_KNOTEN Stützstellen nicht erreicht wurde über scipy
+    # (Skalare wie bei scipy, intern als Array mit einem Element)
+    def ppf(self, p):
+        p = np.asarray(p, dtype=np.float64)
+        form = p.shape
+        p = np.atleast_1d(p)
+        a, b, c, loc, scale = self.parameter
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = -np.log1p(-p)
+        tabelliert = (t >= 0) & (t <= self.t_max) & (self.fehler <= self.fehlergrenze)
+        if tabelliert.all():
+            return (loc + scale * self._z_aus_t(t)).reshape(form)
+        ergebnis = np.asarray(stats.genexpon.ppf(p, a, b, c, loc=loc, scale=scale), dtype=np.float64)
+        if tabelliert.any():
+            ergebnis[tabelliert] = loc + scale * self._z_aus_t(t[tabelliert])
+        return ergebnis.reshape(form)
+
+    # Verteilungsfunktion: F = 1 - exp(-t(z)) für z >= 0
+    def cdf(self, x):
+        loc, scale = self.parameter[3:]
+        z = np.maximum((np.asarray(x, dtype=np.float64) - loc) / scale, 0.0)
+        return -np.expm1(-self._t_aus_z(np.atleast_1d(z))).reshape(z.shape)
+
+
+# Funktion zur Tabelle eines Parametersatzes; einmal aufgebaut und im Prozess zwischengespeichert
+@functools.lru_cache(maxsize=32)
+def genexpon_tabelle(a, b, c, loc=0.0, scale=1.0):
+    return GenexponTabelle(a, b, c, loc, scale)
+
+
+# Funktion für Quantile einer Verteilung: genexpon über die Tabelle, alle anderen über scipy
+def schnelle_ppf(name, p, parameter):
+    if name == 'genexpon':
+        return genexpon_tabelle(*(float(w) for w in parameter)).ppf(p)
+    return getattr(stats, name).ppf(p, *parameter)
+
+
+# Funktion für die Verteilungsfunktion: genexpon über die geschlossene Formel, alle anderen über scipy
+def schnelle_cdf(name, x, parameter):
+    if name == 'genexpon':
+        return genexpon_tabelle(*(float(w) for w in parameter)).cdf(x)
+    return getattr(stats, name).cdf(x, *parameter)
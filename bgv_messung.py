@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  Laufzeit- und Speichermessung der Verarbeitungsschritte
+# Ein Messprotokoll pro Durchlauf der App: Dauer und (optional) Speicherspitze je Stufe,
+# jede Stufe wird zusätzlich als JSON-Zeile in eine Trace-Datei geschrieben.
+# Auswertung gesammelter Trace-Dateien: python bgv_messung.py trace.jsonl [weitere.jsonl ...]
+# --------------------------------------------------------------
+
+import argparse
+import contextlib
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
+
+import numpy as np
+
+# Größe einer Trace-Datei bis zur Rotation und Anzahl der aufbewahrten alten Dateien
+TRACE_MAX_BYTES = 10 * 2**20
+TRACE_BACKUPS = 5
+
+# Name des Loggers für die Trace-Zeilen
+TRACE_LOGGER = "bgv.trace"
+
+_trace_lock = threading.Lock()
+
+# tracemalloc ist prozessweit: Anzahl der Messprotokolle mit speicher=True (geschützt durch _tracemalloc_lock)
+# und ob das erste davon tracemalloc gestartet hat
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_nutzer = 0
+_tracemalloc_von_messung = False
+
+
+# Funktion zur Einrichtung des Trace-Loggers (eine JSON-Zeile pro Stufe, rotierende Datei)
+# Mehrfache Aufrufe mit demselben Pfad richten nur einen Handler ein.
+def richte_trace_ein(pfad, max_bytes=TRACE_MAX_BYTES, backups=TRACE_BACKUPS):
+    logger = logging.getLogger(TRACE_LOGGER)
+    pfad = os.path.abspath(pfad)
+    with _trace_lock:
+        if not any(getattr(h, "baseFilename", None) == pfad for h in logger.handlers):
+            os.makedirs(os.path.dirname(pfad), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(pfad, maxBytes=max_bytes, backupCount=backups,
+                                                           encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+# Funktion zum Anmelden einer Speichermessung; das erste Messprotokoll startet tracemalloc
+def _tracemalloc_anmelden():
+    global _tracemalloc_nutzer, _tracemalloc_von_messung
+    with _tracemalloc_lock:
+        if _tracemalloc_nutzer == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_von_messung = True
+        _tracemalloc_nutzer += 1
+
+
+# Funktion zum Abmelden; erst das letzte Messprotokoll stoppt tracemalloc
+# (ein anderweitig gestartetes tracemalloc bleibt unberührt)
+def _tracemalloc_abmelden():
+    global _tracemalloc_nutzer, _tracemalloc_von_messung
+    with _tracemalloc_lock:
+        _tracemalloc_nutzer = max(0, _tracemalloc_nutzer - 1)
+        if _tracemalloc_nutzer == 0 and _tracemalloc_von_messung:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            _tracemalloc_von_messung = False
+
+
+# Messprotokoll eines Durchlaufs
+# speicher=True misst die Speicherspitze je Stufe mit tracemalloc (erfasst auch numpy, kostet aber Laufzeit;
+# tracemalloc ist prozessweit, gleichzeitige Sitzungen fließen mit ein). tracemalloc läuft, solange ein
+# Messprotokoll mit speicher=True besteht; ein abgebrochener Durchlauf ohne beenden() meldet sich bei der
+# Freigabe des Protokolls ab.
+# kontext (z.B. Sitzung und Durchlauf) wird in jede Trace-Zeile übernommen.
+class Messprotokoll:
+    def __init__(self, speicher=False, logger=None, kontext=None):
+        self.eintraege = []
+        self.logger = logger
+        self.kontext = dict(kontext or {})
+        self.speicher = speicher
+        self._stapel = []
+        self._abmeldung = None
+        if speicher:
+            _tracemalloc_anmelden()
+            self._abmeldung = weakref.finalize(self, _tracemalloc_abmelden)
+
+    # Kontextmanager für eine Stufe; zusatz (z.B. Anzahl der Blöcke) erscheint in Tabelle und Trace
+    # Verschachtelte Stufen sind erlaubt, die äußere enthält die Speicherspitze der inneren.
+    @contextlib.contextmanager
+    def stufe(self, name, **zusatz):
+        rahmen = {"basis": 0, "spitze": 0}
+        if self.speicher:
+            aktuell, spitze = tracemalloc.get_traced_memory()
+            if self._stapel:
+                self._stapel[-1]["spitze"] = max(self._stapel[-1]["spitze"], spitze)
+            tracemalloc.reset_peak()
+            rahmen["basis"] = aktuell
+        self._stapel.append(rahmen)
+        start = time.perf_counter()
+        try:
+            yield zusatz
+        finally:
+            dauer = time.perf_counter() - start
+            self._stapel.pop()
+            speicher_bytes = None
+            if self.speicher:
+                spitze = max(rahmen["spitze"], tracemalloc.get_traced_memory()[1])
+                # Freigaben anderer Sitzungen können die Spitze unter die Basis drücken
+                speicher_bytes = max(0, spitze - rahmen["basis"])
+                if self._stapel:
+                    self._stapel[-1]["spitze"] = max(self._stapel[-1]["spitze"], spitze)
+            self.eintragen(name, dauer, speicher_bytes, ebene=len(self._stapel), **zusatz)
+
+    # Funktion für einen anderswo gemessenen Eintrag (z.B. Anpassungen in Worker-Prozessen)
+    def eintragen(self, name, dauer, speicher_bytes=None, ebene=None, **zusatz):
+        eintrag = {"stufe": name, "dauer_s": dauer, "speicher_bytes": speicher_bytes,
+                   "ebene": len(self._stapel) if ebene is None else ebene, **zusatz}
+        self.eintraege.append(eintrag)
+        if self.logger is not None:
+            zeile = {"zeit": time.strftime("%Y-%m-%dT%H:%M:%S"), **self.kontext, **eintrag}
+            try:
+                self.logger.info(json.dumps(zeile, ensure_ascii=False, default=str))
+            except Exception:
+                # Die Messung darf die App nicht stören
+                pass
+        return eintrag
+
+    # Funktion zum Abschluss des Durchlaufs (meldet die Speichermessung einmalig ab)
+    def beenden(self):
+        if self._abmeldung is not None:
+            self._abmeldung()
+
+
+# Funktion zum Einlesen von Trace-Dateien (fehlerhafte Zeilen werden übersprungen)
+def lese_trace(pfade):
+    eintraege = []
+    for pfad in pfade:
+        with open(pfad, "r", encoding="utf-8") as f:
+            for zeile in f:
+                try:
+                    eintraege.append(json.loads(zeile))
+                except ValueError:
+                    continue
+    return eintraege
+
+
+# Funktion zur Auswertung je Stufe: Anzahl, Median, 95 %-Perzentil und Maximum der Dauer, größte Speicherspitze
+def werte_trace_aus(eintraege):
+    stufen = {}
+    for e in eintraege:
+        stufen.setdefault(e["stufe"], []).append(e)
+    auswertung = {}
+    for name, liste in sorted(stufen.items()):
+        dauern = np.array([e["dauer_s"] for e in liste], dtype=np.float64)
+        speicher = [e["speicher_bytes"] for e in liste if e.get("speicher_bytes") is not None]
+        auswertung[name] = {
+            "anzahl": len(liste),
+            "median_s": float(np.median(dauern)),
+            "p95_s": float(np.percentile(dauern, 95)),
+            "max_s": float(dauern.max()),
+            "summe_s": float(dauern.sum()),
+            "max_speicher_bytes": max(speicher) if speicher else None,
+        }
+    return auswertung
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trace-Dateien der BGV-App je Stufe auswerten")
+    parser.add_argument("dateien", nargs="+", help="Trace-Dateien (JSON-Zeilen)")
+    parser.add_argument("--json", action="store_true", help="Auswertung als JSON ausgeben")
+    args = parser.parse_args(argv)
+
+    auswertung = werte_trace_aus(lese_trace(args.dateien))
+    if args.json:
+        print(json.dumps(auswertung, indent=2, ensure_ascii=False))
+        return 0
+    print(f"{'Stufe':28s} {'Anzahl':>7s} {'Median':>10s} {'p95':>10s} {'Max':>10s} {'Speicher':>10s}")
+    for name, a in sorted(auswertung.items(), key=lambda x: -x[1]["summe_s"]):
+        speicher = f"{a['max_speicher_bytes'] / 2**20:7.1f} MB" if a["max_speicher_bytes"] is not None else ""
+        print(f"{name:28s} {a['anzahl']:7d} {a['median_s'] * 1000:7.1f} ms {a['p95_s'] * 1000:7.1f} ms "
+              f"{a['max_s'] * 1000:7.1f} ms {speicher:>10s}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
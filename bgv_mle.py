@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  spezialisierte Maximum-Likelihood-Schätzer
+# expon:    geschlossene Lösung
+# powerlaw: Profil-Likelihood (Form und scale geschlossen, nur loc numerisch)
+# genexpon: L-BFGS-B mit analytischem Gradienten und Warmstart
+# Vergleich mit scipy.stats.<name>.fit: tests/test_mle.py
+# --------------------------------------------------------------
+
+import time
+
+import numpy as np
+from scipy import optimize, stats
+
+# Kennung der Schätzer (Teil des Fit-Cache-Schlüssels; bei Änderungen erhöhen)
+MLE_VERSION = "mle2"
+
+# Grenzen für die logarithmierten Parameter von genexpon (verhindert Überläufe im Optimierer)
+LOG_GRENZE = 30.0
+
+# Grenzen für b und c von genexpon (relativ zu scale = Mittelwert - Minimum)
+# Ohne Grenzen läuft die Anpassung bei manchen Datensätzen (z.B. Langau) in den Grenzfall b -> inf, c -> 0
+# mit festem b*c; dort liefert scipy.stats.genexpon.ppf durch Auslöschung NaN. Mit b <= 100 und c >= 0.01 bleibt
+# der relative Fehler der scipy-ppf für 0.001 <= p <= 0.999 unter 1e-8.
+GENEXPON_MAX_B = 100.0
+GENEXPON_MIN_C = 0.01
+
+
+# expon: loc = Minimum, scale = Mittelwert - Minimum (wie scipy)
+def fitte_expon(m_achsen, startwerte=None):
+    x = np.asarray(m_achsen, dtype=np.float64)
+    return expon_aus_statistik(len(x), x.sum(), x.min())
+
+
+# expon aus den suffizienten Statistiken (Anzahl, Summe, Minimum), z.B. beim Ergänzen von Blöcken
+def expon_aus_statistik(anzahl, summe, minimum):
+    loc = float(minimum)
+    return loc, float(summe) / anzahl - loc
+
+
+# Funktion für die Profil-Likelihood von powerlaw: zu gegebenem loc sind scale und Form geschlossen bestimmt
+# Liefert (negative Log-Likelihood, a, scale)
+def _powerlaw_profil(x, loc, summe_log=None):
+    n = len(x)
+    scale = np.nextafter(x[-1] - loc, np.inf)
+    if summe_log is None:
+        summe_log = np.sum(np.log(x - loc))
+    summe = summe_log - n * np.log(scale)
+    a = -n / summe
+    return -(n * np.log(a) + (a - 1) * summe - n * np.log(scale)), a, scale
+
+
+# powerlaw: die Lösung mit Form <= 1 (loc knapp unter dem Minimum) und die mit Form > 1
+# (loc aus der eindimensionalen Profil-Likelihood) werden verglichen, wie in scipy
+def fitte_powerlaw(m_achsen, startwerte=None):
+    x = np.sort(np.asarray(m_achsen, dtype=np.float64))
+    if x[0] == x[-1]:
+        return tuple(float(p) for p in stats.powerlaw.fit(x))
+    spannweite = x[-1] - x[0]
+    kandidaten = []
+
+    # Form <= 1: Likelihood wächst bis zum Minimum, loc liegt direkt darunter
+    loc = np.nextafter(x[0], -np.inf)
+    nll, a, scale = _powerlaw_profil(x, loc)
+    if a <= 1:
+        kandidaten.append((nll, a, loc, scale))
+
+    # Form > 1: Abstand d = Minimum - loc logarithmisch zwischen 1e-12 und 1e6 Spannweiten suchen
+    def profil(log_d):
+        return _powerlaw_profil(x, x[0] - np.exp(log_d) * spannweite)[0]
+    ergebnis = optimize.minimize_scalar(profil, bounds=(np.log(1e-12), np.log(1e6)), method='bounded',
+                                        options={'xatol': 1e-10})
+    loc = x[0] - np.exp(ergebnis.x) * spannweite
+    nll, a, scale = _powerlaw_profil(x, loc)
+    if a > 1:
+        kandidaten.append((nll, a, loc, scale))
+
+    if not kandidaten:
+        return tuple(float(p) for p in stats.powerlaw.fit(x))
+    _, a, loc, scale = min(kandidaten)
+    return float(a), float(loc), float(scale)
+
+
+# Negative mittlere Log-Likelihood von genexpon und ihr Gradient bei festem scale
+# theta = (log a, log b, log c, loc). scale ist überzählig: a/scale, b/scale und c/scale bestimmen die Verteilung,
+# deshalb wird scale festgehalten und nur (a, b, c, loc) optimiert.
+def _genexpon_nll(theta, x, s):
+    a, b, c = np.exp(theta[:3])
+    loc = theta[3]
+    n = len(x)
+    z = (x - loc) / s
+    e = np.exp(-c * z)
+    g = -np.expm1(-c * z)
+    h = a + b * g
+    nll = -(np.sum(np.log(h)) - (a + b) * np.sum(z) + b / c * np.sum(g)) / n + np.log(s)
+
+    # Ableitungen der Log-Likelihood nach a, b, c und loc
+    d_a = np.sum(1 / h) - np.sum(z)
+    d_b = np.sum(g / h) - np.sum(z) + np.sum(g) / c
+    d_c = b * np.sum(z * e / h) - b / c**2 * np.sum(g) + b / c * np.sum(z * e)
+    d_loc = -np.sum(b * c * e / h - (a + b) + b * e) / s
+
+    # Kettenregel für die logarithmierten Parameter
+    return nll, -np.array([a * d_a, b * d_b, c * d_c, d_loc]) / n
+
+
+# Startwerte (a, b, c) für genexpon ohne Warmstart, relativ zu scale = Mittelwert - Minimum.
+# Die Likelihood hat mehrere lokale Maxima (u.a. den Grenzfall expon mit b -> 0), deshalb mehrere Starts.
+GENEXPON_STARTS = [(1.0, 1.0, 1.0), (1.0, 0.1, 10.0), (0.1, 1.0, 10.0), (1.0, 10.0, 10.0)]
+
+
+# Funktion für eine lokale Optimierung von genexpon ab (a, b, c, loc) bei festem scale s
+def _genexpon_lokal(x, a, b, c, loc, s):
+    theta = np.array([np.log(a), np.log(min(b, GENEXPON_MAX_B)), np.log(max(c, GENEXPON_MIN_C)), min(loc, x[0])])
+    grenzen = [(-LOG_GRENZE, LOG_GRENZE), (-LOG_GRENZE, np.log(GENEXPON_MAX_B)),
+               (np.log(GENEXPON_MIN_C), LOG_GRENZE), (None, x[0])]
+    with np.errstate(all='ignore'):
+        return optimize.minimize(_genexpon_nll, theta, args=(x, s), jac=True, method='L-BFGS-B',
+                                 bounds=grenzen, options={'maxiter': 2000, 'ftol': 1e-13, 'gtol': 1e-9})
+
+
+# genexpon: L-BFGS-B mit analytischem Gradienten; loc ist durch das Minimum der Daten begrenzt
+# startwerte (a, b, c, loc, scale), z.B. die Parameter der vorherigen Anpassung, ersetzen die Mehrfachstarts
+def fitte_genexpon(m_achsen, startwerte=None):
+    x = np.sort(np.asarray(m_achsen, dtype=np.float64))
+    if startwerte is not None and all(np.isfinite(startwerte)) and min(startwerte[:3]) > 0 and startwerte[4] > 0:
+        starts = [tuple(float(p) for p in startwerte)]
+    else:
+        s = max(float(np.mean(x) - x[0]), 1e-12)
+        starts = [(a, b, c, float(x[0]), s) for a, b, c in GENEXPON_STARTS]
+
+    bestes, bestes_s = None, None
+    for a, b, c, loc, s in starts:
+        ergebnis = _genexpon_lokal(x, a, b, c, loc, s)
+        if np.isfinite(ergebnis.fun) and (bestes is None or ergebnis.fun < bestes.fun):
+            bestes, bestes_s = ergebnis, s
+    if bestes is None:
+        return tuple(float(p) for p in stats.genexpon.fit(x))
+    a, b, c = np.exp(bestes.x[:3])
+    return float(a), float(b), float(c), float(bestes.x[3]), float(bestes_s)
+
+
+# Spezialisierte Schätzer je Verteilung
+SPEZIAL_FITTER = {
+    'expon': fitte_expon,
+    'powerlaw': fitte_powerlaw,
+    'genexpon': fitte_genexpon,
+}
+
+
+# Funktion zur Anpassung einer Verteilung: spezialisierter Schätzer, sonst scipy (mit Startwerten, falls gegeben)
+def fitte_mle(name, m_achsen, startwerte=None):
+    if name in SPEZIAL_FITTER:
+        return SPEZIAL_FITTER[name](m_achsen, startwerte)
+    verteilung = getattr(stats, name)
+    if startwerte is None:
+        return tuple(float(p) for p in verteilung.fit(m_achsen))
+    return tuple(float(p) for p in verteilung.fit(m_achsen, *startwerte[:-2], loc=startwerte[-2],
+                                                  scale=startwerte[-1]))
+
+
+# Funktion zum Vergleich mit scipy: Log-Likelihood, Perzentile und Laufzeit beider Schätzer
+def vergleiche_mit_scipy(name, m_achsen, perzentile=(50, 95, 99)):
+    x = np.asarray(m_achsen, dtype=np.float64)
+    start = time.perf_counter()
+    spezial = SPEZIAL_FITTER[name](x)
+    dauer_spezial = time.perf_counter() - start
+    start = time.perf_counter()
+    referenz = tuple(float(p) for p in getattr(stats, name).fit(x))
+    dauer_scipy = time.perf_counter() - start
+
+    verteilung = getattr(stats, name)
+    p = np.asarray(perzentile, dtype=np.float64) / 100
+    q_spezial, q_scipy = verteilung.ppf(p, *spezial), verteilung.ppf(p, *referenz)
+    return {
+        "verteilung": name,
+        "loglik_spezial": float(-verteilung.nnlf(spezial, x)),
+        "loglik_scipy": float(-verteilung.nnlf(referenz, x)),
+        "max_rel_abweichung_perzentile": float(np.max(np.abs(q_spezial - q_scipy) / np.abs(q_scipy))),
+        "dauer_spezial_s": dauer_spezial,
+        "dauer_scipy_s": dauer_scipy,
+        "parameter_spezial": spezial,
+        "parameter_scipy": referenz,
+    }
+
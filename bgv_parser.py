@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  schneller Parser für Blocklisten (ein Wert pro Zeile)
+# Liest Bytes blockweise direkt in ein float64-Array ein,
+# akzeptiert Punkt und Komma als Dezimaltrennzeichen sowie Exponenten (1e-3); das Komma gilt nur in Zeilen
+# mit genau einem Komma und ohne Punkt als Dezimaltrennzeichen, andere Zeilen mit Komma werden abgelehnt;
+# Kommentarzeilen mit '#' (z.B. die Kopfzeile exportierter Achsen) werden übersprungen
+# --------------------------------------------------------------
+
+import io
+import os
+from collections import namedtuple
+
+import numpy as np
+
+# Standardgröße eines Lese-Blocks in Bytes (begrenzt den Spitzenspeicher)
+CHUNK_GROESSE = 8 * 1024 * 1024
+
+# Alle Bytes außer Komma und Zeilenumbruch: nach dem Löschen steht ",," für eine Zeile mit mehr als einem Komma
+OHNE_KOMMA_UND_UMBRUCH = bytes(b for b in range(256) if b not in b",\n")
+
+# Ergebnis: werte (float64-Array), abgelehnt (Liste von (Zeilennummer, Inhalt)),
+# anzahl_abgelehnt (Gesamtzahl, auch wenn nicht alle Zeilen gemeldet werden), anzahl_zeilen
+ParseErgebnis = namedtuple('ParseErgebnis', ['werte', 'abgelehnt', 'anzahl_abgelehnt', 'anzahl_zeilen'])
+
+
+# Funktion zum blockweisen Lesen aus Bytes, Pfad oder Dateiobjekt
+def _lese_chunks(quelle, chunk_groesse):
+    if isinstance(quelle, (bytes, bytearray, memoryview)):
+        quelle = io.BytesIO(quelle)
+    elif isinstance(quelle, (str, os.PathLike)):
+        with open(quelle, "rb") as f:
+            yield from _lese_chunks(f, chunk_groesse)
+        return
+
+    while True:
+        chunk = quelle.read(chunk_groesse)
+        if not chunk:
+            return
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        yield chunk
+
+
+# Funktion zum Ersetzen des Dezimalkommas: nur bei genau einem Komma und ohne Punkt (z.B. "0,25"),
+# sonst bleibt die Zeile unverändert und wird abgelehnt (z.B. "1.000,5" oder "1,2,3")
+def _dezimalkomma(zeile):
+    if zeile.count(b",") == 1 and b"." not in zeile:
+        return zeile.replace(b",", b".")
+    return zeile
+
+
+# Funktion zum Umwandeln vollständiger Zeilen in Zahlen; erste_zeile ist die Zeilennummer (1-basiert)
+def _parse_zeilen(zeilen, erste_zeile, min_wert, abgelehnt, max_gemeldet):
+    # Schneller Weg: alle Zeilen sind gültige Zahlen (float() ignoriert Leerraum und '\r')
+    try:
+        werte = np.fromiter(map(float, zeilen), dtype=np.float64, count=len(zeilen))
+        gueltig = np.isfinite(werte)
+        if min_wert is not None:
+            gueltig &= werte >= min_wert
+        if gueltig.all():
+            return werte, 0
+    except ValueError:
+        pass
+
+    # Langsamer Weg nur für diesen Block: Zeile für Zeile mit Zeilennummer
+    werte = np.empty(len(zeilen), dtype=np.float64)
+    anzahl = 0
+    anzahl_abgelehnt = 0
+    for i, zeile in enumerate(zeilen):
+        text = zeile.strip()
+        if not text or text.startswith(b"#"):
+            continue  # Leer- und Kommentarzeilen werden ohne Meldung übersprungen
+        try:
+            wert = float(text)
+            ok = np.isfinite(wert) and (min_wert is None or wert >= min_wert)
+        except ValueError:
+            ok = False
+        if ok:
+            werte[anzahl] = wert
+            anzahl += 1
+        else:
+            anzahl_abgelehnt += 1
+            if len(abgelehnt) < max_gemeldet:
+                abgelehnt.append((erste_zeile + i, text.decode("utf-8", errors="replace")))
+    return werte[:anzahl], anzahl_abgelehnt
+
+
+# Funktion zum blockweisen Einlesen einer Blockliste (Generator, ein ParseErgebnis pro Block)
+# abgelehnt/anzahl_abgelehnt beziehen sich auf den jeweiligen Block, anzahl_zeilen zählt bis zum Blockende.
+# Insgesamt werden höchstens max_gemeldet abgelehnte Zeilen mit Inhalt gemeldet.
+def lese_blockliste_chunks(quelle, min_wert=None, chunk_groesse=CHUNK_GROESSE, max_gemeldet=100):
+    gemeldet = 0
+    naechste_zeile = 1
+    rest = b""
+
+    for nummer, chunk in enumerate(_lese_chunks(quelle, chunk_groesse)):
+        if nummer == 0 and chunk.startswith(b"\xef\xbb\xbf"):
+            chunk = chunk[3:]  # UTF-8-BOM entfernen
+        chunk = rest + chunk
+        ende = chunk.rfind(b"\n")
+        if ende < 0:
+            rest = chunk
+            continue
+        rest = chunk[ende + 1:]
+        teil = chunk[:ende]
+        # Komma als Dezimaltrennzeichen zulassen: ohne Punkt und ohne Zeile mit zwei Kommas im ganzen Block
+        # auf einmal, sonst Zeile für Zeile
+        komma_zeilenweise = False
+        if b"," in teil:
+            if b"." in teil or b",," in teil.translate(None, OHNE_KOMMA_UND_UMBRUCH):
+                komma_zeilenweise = True
+            else:
+                teil = teil.replace(b",", b".")
+        zeilen = teil.split(b"\n")
+        if komma_zeilenweise:
+            zeilen = list(map(_dezimalkomma, zeilen))
+        abgelehnt = []
+        werte, n = _parse_zeilen(zeilen, naechste_zeile, min_wert, abgelehnt, max_gemeldet - gemeldet)
+        gemeldet += len(abgelehnt)
+        naechste_zeile += len(zeilen)
+        yield ParseErgebnis(werte, abgelehnt, n, naechste_zeile - 1)
+
+    # Letzte Zeile ohne abschließenden Zeilenumbruch
+    if rest.strip():
+        abgelehnt = []
+        werte, n = _parse_zeilen([_dezimalkomma(rest)], naechste_zeile, min_wert, abgelehnt, max_gemeldet - gemeldet)
+        yield ParseErgebnis(werte, abgelehnt, n, naechste_zeile)
+
+
+# Funktion zum Einlesen einer Blockliste in ein float64-Array
+# min_wert: kleinere Werte werden als abgelehnte Zeilen gemeldet (z.B. 0.0 für negative Werte)
+def lese_blockliste(quelle, min_wert=None, chunk_groesse=CHUNK_GROESSE, max_gemeldet=100):
+    teile = []
+    abgelehnt = []
+    anzahl_abgelehnt = 0
+    anzahl_zeilen = 0
+
+    for teil in lese_blockliste_chunks(quelle, min_wert, chunk_groesse, max_gemeldet):
+        teile.append(teil.werte)
+        abgelehnt.extend(teil.abgelehnt)
+        anzahl_abgelehnt += teil.anzahl_abgelehnt
+        anzahl_zeilen = teil.anzahl_zeilen
+
+    werte = np.concatenate(teile) if teile else np.empty(0, dtype=np.float64)
+    return ParseErgebnis(werte, abgelehnt, anzahl_abgelehnt, anzahl_zeilen)
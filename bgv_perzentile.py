@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  Perzentiltabellen für alle angepassten Verteilungen
+# Ein vektorisierter ppf-Aufruf pro Verteilung statt einer Schleife je Perzentil
+# --------------------------------------------------------------
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from bgv_bootstrap import bootstrap_grenzen
+from bgv_interpolation import schnelle_ppf
+from bgv_zusammenfassung import Zusammenfassung
+
+# Perzentile der Tabelle in der App (Zeilen 95-99 sind die Bemessungsblöcke)
+TABELLEN_PERZENTILE = [0, 25, 50, 75, 95, 96, 97, 98, 99, 100]
+
+# Ergebnis: Zeilen = Perzentile, Spalten = Datenquellen ('upload' und Verteilungen)
+QuantilMatrix = namedtuple('QuantilMatrix', ['perzentile', 'spalten', 'm', 'm3'])
+
+
+# Funktion zur Berechnung der Quantile einer Verteilung für ein ganzes Perzentilraster
+# (genexpon über die tabellierte ppf aus bgv_interpolation)
+def berechne_verteilungs_quantile(name, perzentile, parameter):
+    p = np.asarray(perzentile, dtype=np.float64) / 100
+    return schnelle_ppf(name, p, parameter)
+
+
+# Funktion zur Berechnung der Quantilmatrix in m und m³
+# parameter: Name -> Parametertupel; m_achsen (optional, Array oder Zusammenfassung) ergibt die Spalte 'upload'
+def berechne_quantil_matrix(perzentile, parameter, m_achsen=None):
+    perzentile = np.asarray(perzentile, dtype=np.float64)
+    spalten = []
+    m = np.empty((len(perzentile), len(parameter) + (m_achsen is not None)))
+
+    if m_achsen is not None:
+        spalten.append('upload')
+        if isinstance(m_achsen, Zusammenfassung):
+            m[:, 0] = m_achsen.perzentile(perzentile)
+        else:
+            m[:, 0] = np.percentile(np.asarray(m_achsen, dtype=np.float64), perzentile)
+
+    for name, werte in parameter.items():
+        m[:, len(spalten)] = berechne_verteilungs_quantile(name, perzentile, werte)
+        spalten.append(name)
+
+    return QuantilMatrix(perzentile, spalten, m, m ** 3)
+
+
+# Funktion zur Umwandlung der Quantilmatrix in eine Tabelle (einheit 'm' oder 'm³')
+# bootstrap (optional): BootstrapErgebnis; ergänzt jede Spalte um die Grenzen des Konfidenzintervalls
+def quantil_matrix_als_dataframe(matrix, einheit='m³', bootstrap=None):
+    hoch = 3 if einheit == 'm³' else 1
+    werte = matrix.m3 if einheit == 'm³' else matrix.m
+    daten = {"percentile": [f"{p:g}" for p in matrix.perzentile]}
+    for j, spalte in enumerate(matrix.spalten):
+        daten[f"{spalte} [{einheit}]"] = werte[:, j]
+        if bootstrap is not None and spalte in bootstrap.spalten:
+            unten, oben = bootstrap_grenzen(bootstrap, spalte, matrix.perzentile)
+            daten[f"{spalte} {bootstrap.niveau:.0%}-KI unten [{einheit}]"] = unten ** hoch
+            daten[f"{spalte} {bootstrap.niveau:.0%}-KI oben [{einheit}]"] = oben ** hoch
+    return pd.DataFrame(daten)
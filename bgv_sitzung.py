@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  Speicherbudget einer Sitzung
+# Abgeleitete Artefakte (Diagramme als PNG-Bytes, eingelesene Tabellen, Ranglisten ...) werden mit
+# Kennung und geschätzter Größe abgelegt; wird das Budget überschritten, fallen die am längsten
+# nicht benutzten Artefakte weg und werden bei Bedarf neu berechnet.
+# --------------------------------------------------------------
+
+import io
+import sys
+from collections import OrderedDict
+
+import numpy as np
+
+# Standardbudget je Sitzung in Bytes
+STANDARD_BUDGET = 256 * 2**20
+
+# Länge der Textvorschau hochgeladener Dateien (Zeilen und Bytes)
+VORSCHAU_ZEILEN = 200
+VORSCHAU_BYTES = 64 * 1024
+
+# Auflösung der gespeicherten Diagramme (wie st.pyplot)
+DIAGRAMM_DPI = 200
+
+
+# Funktion zur Schätzung des Speicherbedarfs eines Objekts in Bytes
+# numpy-Arrays über nbytes, pandas über memory_usage,
+# Container und Objekte rekursiv; mehrfach referenzierte Objekte werden einmal gezählt.
+def schaetze_groesse(objekt, _gesehen=None):
+    gesehen = set() if _gesehen is None else _gesehen
+    if id(objekt) in gesehen:
+        return 0
+    gesehen.add(id(objekt))
+
+    if isinstance(objekt, np.ndarray):
+        # Sichten zählen mit ihrem Basis-Array (einmal); mmap- und Puffer-Arrays belegen keinen eigenen Speicher
+        basis = objekt
+        while isinstance(basis.base, np.ndarray):
+            basis = basis.base
+        if basis is not objekt:
+            if id(basis) in gesehen:
+                return 0
+            gesehen.add(id(basis))
+        return basis.nbytes if basis.flags.owndata else 0
+    if isinstance(objekt, (bytes, bytearray)):
+        return len(objekt)
+    if isinstance(objekt, io.BytesIO):
+        return objekt.getbuffer().nbytes
+    if hasattr(objekt, "memory_usage") and hasattr(objekt, "columns"):
+        return int(objekt.memory_usage(index=True, deep=True).sum())
+    if isinstance(objekt, dict):
+        return sys.getsizeof(objekt) + sum(schaetze_groesse(k, gesehen) + schaetze_groesse(v, gesehen)
+                                           for k, v in objekt.items())
+    if isinstance(objekt, (list, tuple, set, frozenset)):
+        return sys.getsizeof(objekt) + sum(schaetze_groesse(w, gesehen) for w in objekt)
+    if hasattr(objekt, "__dict__"):
+        return sys.getsizeof(objekt) + schaetze_groesse(vars(objekt), gesehen)
+    return sys.getsizeof(objekt)
+
+
+# Artefakte einer Sitzung mit LRU-Verdrängung
+# grundlast: Bytes, die nicht verdrängt werden können (z.B. die Achsen des aktuellen Datensatzes)
+class ArtefaktSpeicher:
+    def __init__(self, budget=STANDARD_BUDGET):
+        self.budget = budget
+        self.grundlast = 0
+        self.verdraengt = 0
+        self._eintraege = OrderedDict()
+
+    # Funktion zum Abruf eines Artefakts; None, wenn es fehlt oder zu einer anderen Kennung gehört
+    def hole(self, name, kennung=None):
+        eintrag = self._eintraege.get(name)
+        if eintrag is None or eintrag[0] != kennung:
+            return None
+        self._eintraege.move_to_end(name)
+        return eintrag[1]
+
+    # Funktion zum Ablegen eines Artefakts; ältere Artefakte werden verdrängt, bis das Budget eingehalten ist
+    # (das neue Artefakt bleibt auch dann erhalten, wenn es allein größer als das Budget ist)
+    def setze(self, name, wert, kennung=None, groesse=None):
+        self._eintraege.pop(name, None)
+        self._eintraege[name] = (kennung, wert, schaetze_groesse(wert) if groesse is None else groesse)
+        self._raeume_auf(behalten=name)
+        return wert
+
+    def entferne(self, name):
+        self._eintraege.pop(name, None)
+
+    # Funktion zum Setzen der nicht verdrängbaren Grundlast (danach wird das Budget geprüft)
+    def setze_grundlast(self, grundlast):
+        self.grundlast = grundlast
+        self._raeume_auf()
+
+    def _raeume_auf(self, behalten=None):
+        while self.belegt() > self.budget:
+            name = next((n for n in self._eintraege if n != behalten), None)
+            if name is None:
+                break
+            del self._eintraege[name]
+            self.verdraengt += 1
+
+    # Funktion für den belegten Speicher (Grundlast und alle Artefakte)
+    def belegt(self):
+        return self.grundlast + sum(e[2] for e in self._eintraege.values())
+
+    # Funktion für die Anzeige: Name -> Größe in Bytes, älteste zuerst
+    def statistik(self):
+        return {"budget": self.budget, "belegt": self.belegt(), "grundlast": self.grundlast,
+                "verdraengt": self.verdraengt, "artefakte": {n: e[2] for n, e in self._eintraege.items()}}
+
+    def __contains__(self, name):
+        return name in self._eintraege
+
+
+# Funktion zum Rendern einer matplotlib-Figur als PNG-Bytes; die Figur wird danach geschlossen
+def als_png(fig, dpi=DIAGRAMM_DPI):
+    import matplotlib.pyplot as plt
+
+    puffer = io.BytesIO()
+    try:
+        fig.savefig(puffer, format="png", dpi=dpi, bbox_inches="tight")
+    finally:
+        plt.close(fig)
+    return puffer.getvalue()
+
+
+# Funktion für eine gekürzte Textvorschau (höchstens zeilen Zeilen bzw. max_bytes Bytes)
+# Liefert (text, gekuerzt)
+def textvorschau(daten, zeilen=VORSCHAU_ZEILEN, max_bytes=VORSCHAU_BYTES):
+    kopf = bytes(daten[:max_bytes])
+    gekuerzt = len(daten) > max_bytes
+    teile = kopf.split(b"\n", zeilen)
+    if len(teile) > zeilen:
+        kopf = b"\n".join(teile[:zeilen])
+        gekuerzt = gekuerzt or bool(teile[zeilen].strip())
+    elif gekuerzt and b"\n" in kopf:
+        # Keine abgeschnittene letzte Zeile zeigen
+        kopf = kopf[:kopf.rfind(b"\n")]
+    return kopf.decode("utf-8", errors="replace"), gekuerzt
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  Quantil-Skizze für Blockinventare, die nicht in den Speicher passen
+#
+# Die Skizze speichert die verschiedenen Achsenwerte mit ihrer Häufigkeit.
+# Da berechne_dritte_wurzel auf 0.01 m rundet, bleibt das bei realen Inventaren
+# wenige tausend Einträge groß und ist exakt (Perzentile identisch zu np.quantile).
+# Erst wenn mehr als max_stuetzstellen verschiedene Werte auftreten, wird verdichtet;
+# der dadurch mögliche Rangfehler wird als Schranke mitgeführt (max_rangfehler).
+# Skizzen mehrerer Kampagnen lassen sich ohne die Rohdaten zusammenführen.
+#
+# Aufruf:
+#   python bgv_skizze.py kampagne_2023.txt kampagne_2024.npz --speichern hang.npz --ausgabe hang_perzentile.csv
+# --------------------------------------------------------------
+
+import argparse
+import os
+import sys
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from bgv_core import berechne_dritte_wurzel
+from bgv_formate import erkenne_format, hat_achsen_kopf, ist_achsen_datei, lade_blockliste, oeffne_text
+from bgv_parser import CHUNK_GROESSE, lese_blockliste_chunks
+from bgv_perzentile import TABELLEN_PERZENTILE
+from bgv_zusammenfassung import MAX_HISTOGRAMM_KLASSEN
+
+# Höchstzahl verschiedener Werte, bevor verdichtet wird
+MAX_STUETZSTELLEN = 100_000
+
+
+# Skizze der Achsenverteilung: sortierte verschiedene Werte mit Häufigkeiten
+class QuantilSkizze:
+    def __init__(self, max_stuetzstellen=MAX_STUETZSTELLEN):
+        self.max_stuetzstellen = max_stuetzstellen
+        self.werte = np.empty(0, dtype=np.float64)
+        self.gewichte = np.empty(0, dtype=np.int64)
+        # Obere Schranke für den Rangfehler aller Abfragen (Anteil an der Gesamtzahl, 0 = exakt)
+        self.max_rangfehler = 0.0
+
+    @property
+    def anzahl(self):
+        return int(self.gewichte.sum())
+
+    @property
+    def ist_exakt(self):
+        return self.max_rangfehler == 0.0
+
+    # Werte eines Blocks hinzufügen
+    def hinzufuegen(self, werte):
+        werte = np.asarray(werte, dtype=np.float64)
+        if len(werte):
+            neu, haeufigkeit = np.unique(werte, return_counts=True)
+            self._vereinige(neu, haeufigkeit)
+        return self
+
+    # Andere Skizze hinzufügen (z.B. eine weitere Kampagne)
+    def vereinigen(self, andere):
+        anzahl_vorher, anzahl_andere = self.anzahl, andere.anzahl
+        if anzahl_vorher + anzahl_andere:
+            # Rangfehler addieren sich gewichtet nach dem Anteil der jeweiligen Skizze
+            self.max_rangfehler = ((self.max_rangfehler * anzahl_vorher + andere.max_rangfehler * anzahl_andere)
+                                   / (anzahl_vorher + anzahl_andere))
+        self._vereinige(andere.werte, andere.gewichte)
+        return self
+
+    def _vereinige(self, werte, gewichte):
+        alle = np.concatenate([self.werte, werte])
+        eindeutig, index = np.unique(alle, return_inverse=True)
+        summen = np.bincount(index, weights=np.concatenate([self.gewichte, gewichte]), minlength=len(eindeutig))
+        self.werte = eindeutig
+        self.gewichte = np.rint(summen).astype(np.int64)
+        if len(self.werte) > self.max_stuetzstellen:
+            self._verdichte()
+
+    # Verdichtung auf max_stuetzstellen/2 Gruppen gleichen Gewichts; jede Gruppe wird durch
+    # ihren mittleren Wert vertreten, der Rangfehler ist höchstens das größte Gruppengewicht
+    def _verdichte(self):
+        ziel = self.max_stuetzstellen // 2
+        anzahl = self.anzahl
+        kumuliert = np.cumsum(self.gewichte)
+        gruppe = np.minimum(((kumuliert - self.gewichte) * ziel) // anzahl, ziel - 1)
+        _, erster, groesse = np.unique(gruppe, return_index=True, return_counts=True)
+        gruppen_gewichte = np.add.reduceat(self.gewichte, erster)
+        self.werte = self.werte[erster + (groesse - 1) // 2]
+        self.gewichte = gruppen_gewichte
+        self.max_rangfehler += float(gruppen_gewichte.max()) / anzahl
+
+    # Quantile wie np.quantile(stichprobe, p) (lineare Interpolation), p in [0, 1]
+    def quantile(self, p):
+        p = np.asarray(p, dtype=np.float64)
+        kumuliert = np.cumsum(self.gewichte)
+        position = (self.anzahl - 1) * p
+        unten = np.floor(position)
+        # Wert der k-ten Ordnungsstatistik (0-basiert)
+        x_unten = self.werte[np.searchsorted(kumuliert, unten, side='right')]
+        x_oben = self.werte[np.searchsorted(kumuliert, np.minimum(unten + 1, self.anzahl - 1), side='right')]
+        return x_unten + (position - unten) * (x_oben - x_unten)
+
+    # Perzentile wie np.percentile, p in [0, 100]
+    def perzentile(self, p):
+        return self.quantile(np.asarray(p, dtype=np.float64) / 100)
+
+    # Empirische Verteilungsfunktion: (werte, F(werte))
+    def ecdf(self):
+        return self.werte, np.cumsum(self.gewichte) / self.anzahl
+
+    # Klassengrenzen wie bins='auto' (Minimum aus Freedman-Diaconis und Sturges), höchstens MAX_HISTOGRAMM_KLASSEN
+    def histogramm_kanten(self):
+        x_min, x_max = self.werte[0], self.werte[-1]
+        if x_max <= x_min:
+            return np.array([x_min - 0.5, x_max + 0.5])
+        anzahl = self.anzahl
+        q25, q75 = self.quantile([0.25, 0.75])
+        breite_sturges = (x_max - x_min) / (np.log2(anzahl) + 1.0)
+        breite_fd = 2.0 * (q75 - q25) * anzahl ** (-1.0 / 3.0)
+        breite = min(breite_fd, breite_sturges) if breite_fd > 0 else breite_sturges
+        klassen = int(min(max(np.ceil((x_max - x_min) / breite), 1), MAX_HISTOGRAMM_KLASSEN))
+        return np.linspace(x_min, x_max, klassen + 1)
+
+    # Histogramm (Häufigkeiten oder Dichte) auf den angegebenen Klassengrenzen
+    def histogramm(self, kanten=None, density=False):
+        if kanten is None:
+            kanten = self.histogramm_kanten()
+        return np.histogram(self.werte, bins=kanten, weights=self.gewichte, density=density)
+
+    # Rekonstruktion der sortierten Stichprobe (nur bei exakter Skizze identisch zu den Rohdaten)
+    def als_stichprobe(self):
+        return np.repeat(self.werte, self.gewichte)
+
+    def speichern(self, pfad):
+        np.savez_compressed(pfad, werte=self.werte, gewichte=self.gewichte,
+                            max_rangfehler=self.max_rangfehler, max_stuetzstellen=self.max_stuetzstellen)
+
+    @classmethod
+    def laden(cls, pfad):
+        with np.load(pfad) as daten:
+            skizze = cls(int(daten["max_stuetzstellen"]))
+            skizze.werte = daten["werte"]
+            skizze.gewichte = daten["gewichte"]
+            skizze.max_rangfehler = float(daten["max_rangfehler"])
+        return skizze
+
+
+# Funktion zum Aufbau einer Skizze der Achsen [m] aus einer Blockliste, Block für Block
+# Ohne dichte_kg_m3 enthält die Liste Volumina in m³, sonst Massen in t.
+# Komprimierter Text wird beim Lesen entpackt; .npy, Parquet und Arrow werden (speicherabgebildet) geladen
+# und in Blöcken derselben Größe hinzugefügt, exportierte Achsen ohne dritte Wurzel.
+def skizze_aus_blockliste(quelle, dichte_kg_m3=None, max_stuetzstellen=MAX_STUETZSTELLEN, chunk_groesse=CHUNK_GROESSE):
+    skizze = QuantilSkizze(max_stuetzstellen)
+    format = erkenne_format(quelle)
+    if format in ('npy', 'parquet', 'arrow'):
+        eingelesen = lade_blockliste(quelle, min_wert=0.0)
+        schritt = max(1, chunk_groesse // 8)
+        for start in range(0, len(eingelesen.werte), schritt):
+            werte = eingelesen.werte[start:start + schritt]
+            if not eingelesen.achsen:
+                werte = berechne_dritte_wurzel(werte if dichte_kg_m3 is None else werte * 1000 / dichte_kg_m3)
+            skizze.hinzufuegen(werte)
+        return skizze, eingelesen.anzahl_abgelehnt
+
+    achsen = (hat_achsen_kopf(quelle, format)
+              or ist_achsen_datei(quelle if isinstance(quelle, (str, os.PathLike)) else getattr(quelle, "name", None)))
+    text = oeffne_text(quelle, format) if format in ('gzip', 'zstd') else None
+    anzahl_abgelehnt = 0
+    try:
+        for teil in lese_blockliste_chunks(quelle if text is None else text, min_wert=0.0, chunk_groesse=chunk_groesse):
+            if achsen:
+                skizze.hinzufuegen(teil.werte)
+            else:
+                werte = teil.werte if dichte_kg_m3 is None else teil.werte * 1000 / dichte_kg_m3
+                skizze.hinzufuegen(berechne_dritte_wurzel(werte))
+            anzahl_abgelehnt += teil.anzahl_abgelehnt
+    finally:
+        if text is not None:
+            text.close()
+    return skizze, anzahl_abgelehnt
+
+
+# Funktion zur Visualisierung einer Skizze (wie berechne_perzentile_und_visualisierung)
+def zeichne_skizze(skizze):
+    steps = np.linspace(0.01, 1.00, num=100)
+    percentiles_m_achsen = skizze.quantile(steps)
+    counts, kanten = skizze.histogramm(density=True)
+
+    fig, (ax1, ax2, ax3) = plt.subplots(nrows=1, ncols=3, figsize=(18, 4))
+    ax1.stairs(counts, kanten, fill=True, color='tab:blue', alpha=0.3, label='Skizze pdf')
+    ax2.plot(percentiles_m_achsen, steps, lw=2.0, color='tab:blue', alpha=0.7, label='Skizze cdf')
+    ax3.plot(percentiles_m_achsen, steps, lw=2.0, color='tab:blue', alpha=0.7, label='Skizze cdf')
+
+    ax1.set_xlabel('Blockachse a [m]', fontsize=14)
+    ax1.set_ylabel('Wahrscheinlichkeitsdichte f(a)', fontsize=14)
+    ax2.set_xlabel('Blockachse a [m]', fontsize=14)
+    ax2.set_ylabel('Kumulative Wahrscheinlichkeit F(a)', fontsize=14)
+    ax3.set_xscale('log')
+    ax3.set_xlabel('Blockachse a [m] (log)', fontsize=14)
+    ax3.set_ylabel('Kumulative Wahrscheinlichkeit F(a)', fontsize=14)
+
+    ax1.legend(loc='best', frameon=False)
+    ax2.legend(loc='best', frameon=False)
+    ax3.legend(loc='best', frameon=False)
+    return fig
+
+
+# Funktion zum Laden einer Skizze aus einer .npz-Datei oder zum Aufbau aus einer Blockliste
+def lade_oder_erzeuge_skizze(pfad, dichte_kg_m3=None, max_stuetzstellen=MAX_STUETZSTELLEN):
+    if pfad.endswith(".npz"):
+        return QuantilSkizze.laden(pfad), 0
+    return skizze_aus_blockliste(pfad, dichte_kg_m3, max_stuetzstellen)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quantil-Skizzen aus Blocklisten erzeugen und zusammenführen")
+    parser.add_argument("eingaben", nargs="+", help="Blocklisten (.txt, .txt.gz, .zst, .npy, .parquet, .arrow) oder gespeicherte Skizzen (.npz)")
+    parser.add_argument("--dichte", type=float, default=None,
+                        help="Dichte in kg/m³, wenn die Listen Massen in t enthalten")
+    parser.add_argument("--max-stuetzstellen", type=int, default=MAX_STUETZSTELLEN)
+    parser.add_argument("--speichern", default=None, help="zusammengeführte Skizze als .npz speichern")
+    parser.add_argument("--ausgabe", default=None, help="Perzentiltabelle als CSV schreiben (sonst Bildschirm)")
+    parser.add_argument("--diagramm", default=None, help="Histogramm und ECDF als PNG speichern")
+    args = parser.parse_args(argv)
+
+    gesamt = QuantilSkizze(args.max_stuetzstellen)
+    for pfad in args.eingaben:
+        skizze, abgelehnt = lade_oder_erzeuge_skizze(pfad, args.dichte, args.max_stuetzstellen)
+        print(f"{os.path.basename(pfad)}: {skizze.anzahl} Blöcke, {len(skizze.werte)} Stützstellen, "
+              f"{abgelehnt} abgelehnte Zeilen", file=sys.stderr)
+        gesamt.vereinigen(skizze)
+
+    if args.speichern:
+        gesamt.speichern(args.speichern)
+    if args.diagramm:
+        fig = zeichne_skizze(gesamt)
+        fig.savefig(args.diagramm, dpi=100, bbox_inches="tight")
+        plt.close(fig)
+
+    perz = np.asarray(TABELLEN_PERZENTILE, dtype=np.float64)
+    achsen = gesamt.perzentile(perz)
+    zeilen = ["percentile,upload [m],upload [m³]"] + [f"{p:g},{float(a)},{float(a) ** 3}" for p, a in zip(perz, achsen)]
+    text = "\n".join(zeilen) + "\n"
+    if args.ausgabe:
+        with open(args.ausgabe, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+    print(f"Gesamt: {gesamt.anzahl} Blöcke, Rangfehler höchstens {gesamt.max_rangfehler:.2e}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  Tabellen mit mehreren Lithologien (CSV/Excel)
+# Spalten für Volumen oder Masse, Dichte und Lithologie/Ablösebereich werden in einem
+# vektorisierten Schritt in Achsen umgerechnet (Dichte je Zeile),
+# danach werden die Gruppen parallel angepasst und ausgewertet (Anpassungen im gemeinsamen FitPool)
+# --------------------------------------------------------------
+
+import io
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from bgv_cache import FitCache
+from bgv_core import berechne_dritte_wurzel, berechne_masse_in_tonnen, passe_an_und_berechne_quantile
+from bgv_perzentile import TABELLEN_PERZENTILE, quantil_matrix_als_dataframe
+
+# Übliche Spaltennamen je Rolle (klein geschrieben, ohne Einheit in Klammern), in der Reihenfolge der Priorität
+SPALTEN_NAMEN = {
+    'volumen': ['volumen', 'volume', 'vol', 'v_m3', 'm3', 'm³', 'v'],
+    'masse': ['masse', 'mass', 'gewicht', 'weight', 'tonnen', 'm_t', 't'],
+    'dichte': ['dichte', 'density', 'rohdichte', 'rho', 'kg_m3', 'kg/m3', 'kg/m³'],
+    'gruppe': ['lithologie', 'lithology', 'gestein', 'rock', 'gruppe', 'group', 'ablösebereich', 'abloesebereich',
+               'source_area', 'source area', 'bereich', 'area', 'quelle'],
+}
+
+# Gruppe für Zeilen ohne Angabe (und für Tabellen ohne Gruppenspalte)
+OHNE_GRUPPE = "ohne Angabe"
+
+# Gruppen mit weniger Blöcken werden nicht angepasst (zu wenige Werte für genexpon & Co.)
+MIN_BLOECKE = 10
+
+# Dateiendungen, die als Excel gelesen werden
+EXCEL_ENDUNGEN = ('.xlsx', '.xlsm', '.xls')
+
+# Umgerechnete Tabelle (nur gültige Zeilen): gruppen (str-Array), m_achsen, volumen [m³], masse [t] (NaN ohne Dichte);
+# abgelehnt: Liste von (Zeilennummer, Inhalt), höchstens max_gemeldet
+TabellenAchsen = namedtuple('TabellenAchsen', ['gruppen', 'm_achsen', 'volumen', 'masse', 'abgelehnt',
+                                               'anzahl_abgelehnt'])
+
+# Ergebnis einer Gruppe; ergebnis ist ein bgv_core.AnpassungsErgebnis oder None (dann steht der Grund in meldung)
+GruppenErgebnis = namedtuple('GruppenErgebnis', ['gruppe', 'anzahl', 'ergebnis', 'meldung'])
+
+
+# Funktion zum Einlesen einer Tabelle (Pfad, Bytes oder Dateiobjekt) mit pandas
+# CSV: Trennzeichen aus der Kopfzeile (';' mit Dezimalkomma, ',' oder Tabulator); Excel über openpyxl
+def lese_tabelle(quelle, dateiname=None):
+    if dateiname is None:
+        dateiname = quelle if isinstance(quelle, (str, os.PathLike)) else getattr(quelle, "name", "")
+    if os.path.splitext(str(dateiname))[1].lower() in EXCEL_ENDUNGEN:
+        if isinstance(quelle, (bytes, bytearray)):
+            quelle = io.BytesIO(quelle)
+        try:
+            return pd.read_excel(quelle)
+        except ImportError as e:
+            raise ImportError("Für Excel-Dateien wird openpyxl benötigt (pip install openpyxl).") from e
+
+    if isinstance(quelle, (str, os.PathLike)):
+        with open(quelle, "rb") as f:
+            daten = f.read()
+    elif isinstance(quelle, (bytes, bytearray)):
+        daten = bytes(quelle)
+    else:
+        daten = quelle.read()
+    kopf = daten.split(b"\n", 1)[0]
+    if kopf.count(b";") > kopf.count(b","):
+        trenner, dezimal = ";", ","
+    elif b"\t" in kopf:
+        trenner, dezimal = "\t", ","
+    else:
+        trenner, dezimal = ",", "."
+    return pd.read_csv(io.BytesIO(daten), sep=trenner, decimal=dezimal, encoding="utf-8-sig")
+
+
+# Funktion zur Normalisierung eines Spaltennamens (klein, ohne Einheit in Klammern)
+def _normalisiere(name):
+    return re.sub(r"[\[(].*?[\])]", "", str(name)).strip().lower()
+
+
+# Funktion zur Erkennung der Spalten je Rolle (volumen, masse, dichte, gruppe); None, wenn nicht vorhanden
+# Erst exakte Namen, dann Namen, die mit einem der üblichen Namen beginnen (ab 3 Zeichen)
+def erkenne_spalten(tabelle):
+    normalisiert = {spalte: _normalisiere(spalte) for spalte in tabelle.columns}
+    spalten = {}
+    for rolle, namen in SPALTEN_NAMEN.items():
+        vergeben = set(spalten.values())
+        treffer = [s for name in namen for s, n in normalisiert.items() if n == name and s not in vergeben]
+        if not treffer:
+            treffer = [s for name in namen if len(name) >= 3
+                       for s, n in normalisiert.items() if n.startswith(name) and s not in vergeben]
+        spalten[rolle] = treffer[0] if treffer else None
+    return spalten
+
+
+# Funktion zur Umwandlung einer Spalte in float64 (Dezimalkomma in Textspalten erlaubt, ungültig -> NaN)
+def _zahlen(spalte):
+    if not pd.api.types.is_numeric_dtype(spalte):
+        spalte = pd.to_numeric(spalte.astype(str).str.strip().str.replace(",", ".", regex=False), errors="coerce")
+    return spalte.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+# Funktion zur Umrechnung der Tabelle in Achsen, vektorisiert über alle Zeilen
+# spalten: Rolle -> Spaltenname (siehe erkenne_spalten); ein Volumen hat Vorrang vor der Masse.
+# Masse [t] wird mit der Dichte der Zeile in m³ umgerechnet, fehlende Dichten mit standard_dichte [kg/m³] ergänzt.
+def berechne_tabellen_achsen(tabelle, spalten, standard_dichte=None, max_gemeldet=100):
+    if not spalten.get('volumen') and not spalten.get('masse'):
+        raise ValueError("Die Tabelle braucht eine Spalte für das Volumen [m³] oder die Masse [t]")
+    n = len(tabelle)
+    volumen = _zahlen(tabelle[spalten['volumen']]) if spalten.get('volumen') else np.full(n, np.nan)
+    dichte = _zahlen(tabelle[spalten['dichte']]) if spalten.get('dichte') else np.full(n, np.nan)
+    if standard_dichte:
+        dichte = np.where(np.isnan(dichte), float(standard_dichte), dichte)
+    # Dichten <= 0 sind ungültig
+    dichte = np.where(dichte > 0, dichte, np.nan)
+
+    masse = _zahlen(tabelle[spalten['masse']]) if spalten.get('masse') else np.full(n, np.nan)
+    # Umrechnung von Tonnen in m³ mit der Dichte jeder Zeile, nur wo kein Volumen angegeben ist
+    volumen = np.where(np.isnan(volumen), masse * 1000 / dichte, volumen)
+    # Masse aus Volumen und Dichte, wo keine Masse angegeben ist (NaN ohne Dichte)
+    masse = np.where(np.isnan(masse), berechne_masse_in_tonnen(volumen, dichte), masse)
+
+    if spalten.get('gruppe'):
+        gruppen = tabelle[spalten['gruppe']].astype("string").str.strip().fillna(OHNE_GRUPPE)
+        gruppen = gruppen.mask(gruppen == "", OHNE_GRUPPE).to_numpy(dtype=object).astype(str)
+    else:
+        gruppen = np.full(n, OHNE_GRUPPE)
+
+    gueltig = np.isfinite(volumen) & (volumen >= 0)
+    ungueltig = np.flatnonzero(~gueltig)
+    # Zeilennummern wie in der Datei (Kopfzeile = Zeile 1)
+    abgelehnt = [(int(i) + 2, "; ".join(str(w) for w in tabelle.iloc[i].tolist())) for i in ungueltig[:max_gemeldet]]
+
+    return TabellenAchsen(gruppen[gueltig], berechne_dritte_wurzel(volumen[gueltig]), volumen[gueltig],
+                          masse[gueltig], abgelehnt, len(ungueltig))
+
+
+# Funktion zur Aufteilung der Achsen nach Gruppen (Gruppe -> sortierte m_achsen), ohne Python-Schleife über Zeilen
+def teile_nach_gruppen(gruppen, m_achsen):
+    namen, index = np.unique(gruppen, return_inverse=True)
+    ordnung = np.lexsort((m_achsen, index))
+    grenzen = np.cumsum(np.bincount(index, minlength=len(namen)))[:-1]
+    return dict(zip(namen.tolist(), np.split(np.asarray(m_achsen)[ordnung], grenzen)))
+
+
+# Funktion für die Übersicht je Gruppe: Anzahl, Summe von Volumen und Masse, mittlere Dichte
+def gruppen_uebersicht(achsen):
+    namen, index = np.unique(achsen.gruppen, return_inverse=True)
+    anzahl = np.bincount(index, minlength=len(namen))
+    volumen = np.bincount(index, weights=achsen.volumen, minlength=len(namen))
+    mit_masse = np.isfinite(achsen.masse)
+    masse = np.bincount(index[mit_masse], weights=achsen.masse[mit_masse], minlength=len(namen))
+    volumen_mit_masse = np.bincount(index[mit_masse], weights=achsen.volumen[mit_masse], minlength=len(namen))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dichte = np.where(volumen_mit_masse > 0, masse * 1000 / volumen_mit_masse, np.nan)
+    return pd.DataFrame({
+        "Gruppe": namen,
+        "Blöcke": anzahl,
+        "Volumen [m³]": volumen,
+        "Masse [t]": np.where(np.bincount(index[mit_masse], minlength=len(namen)) > 0, masse, np.nan),
+        "mittlere Dichte [kg/m³]": dichte,
+    })
+
+
+# Funktion für Anpassung und Perzentile einer Gruppe
+# max_workers=None passt im gemeinsamen FitPool an (mit Zeitlimit je Verteilung), 0 im aufrufenden Prozess
+def _verarbeite_gruppe(gruppe, m_achsen, verteilungen, perzentile, timeout, cache_verzeichnis=None, fit_cache=None,
+                       max_workers=None):
+    if fit_cache is None and cache_verzeichnis:
+        fit_cache = FitCache(verzeichnis=cache_verzeichnis)
+    try:
+        ergebnis = passe_an_und_berechne_quantile(m_achsen, verteilungen, perzentile, timeout, max_workers, fit_cache)
+        return GruppenErgebnis(gruppe, len(m_achsen), ergebnis, "")
+    except Exception as e:
+        return GruppenErgebnis(gruppe, len(m_achsen), None, str(e))
+
+
+# Funktion zur Verarbeitung aller Gruppen, parallel über Threads (eine Gruppe pro Aufgabe)
+# Die Anpassungen aller Gruppen laufen im gemeinsamen FitPool mit Zeitlimit je Verteilung, ohne eigenen Prozesspool.
+# Generator: liefert ein GruppenErgebnis, sobald eine Gruppe fertig ist.
+# prozesse begrenzt die gleichzeitig bearbeiteten Gruppen; prozesse=0 rechnet im aufrufenden Prozess (ohne Zeitlimit).
+def verarbeite_gruppen(gruppen_achsen, verteilungen=None, perzentile=TABELLEN_PERZENTILE, timeout=120,
+                       prozesse=None, cache_verzeichnis=None, fit_cache=None, min_bloecke=MIN_BLOECKE):
+    offen = {}
+    for gruppe, m_achsen in gruppen_achsen.items():
+        if len(m_achsen) < min_bloecke:
+            yield GruppenErgebnis(gruppe, len(m_achsen), None, f"weniger als {min_bloecke} Blöcke")
+        else:
+            offen[gruppe] = m_achsen
+
+    if prozesse == 0:
+        for gruppe, m_achsen in offen.items():
+            yield _verarbeite_gruppe(gruppe, m_achsen, verteilungen, perzentile, timeout, cache_verzeichnis, fit_cache,
+                                     max_workers=0)
+        return
+    if not offen:
+        return
+
+    # Große Gruppen zuerst, damit sie nicht am Ende allein laufen
+    reihenfolge = sorted(offen, key=lambda g: -len(offen[g]))
+    with ThreadPoolExecutor(max_workers=min(len(offen), prozesse or os.cpu_count() or 1)) as executor:
+        futures = [executor.submit(_verarbeite_gruppe, gruppe, offen[gruppe], verteilungen, perzentile, timeout,
+                                   cache_verzeichnis, fit_cache) for gruppe in reihenfolge]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+# Funktion zur Zusammenfassung der Perzentiltabellen aller Gruppen in einer Tabelle (eine Zeile je Gruppe und Perzentil)
+def gruppen_perzentile_als_dataframe(gruppen_ergebnisse, einheit='m³'):
+    teile = []
+    for g in gruppen_ergebnisse:
+        if g.ergebnis is not None:
+            tabelle = quantil_matrix_als_dataframe(g.ergebnis.quantile, einheit)
+            tabelle.insert(0, "Gruppe", g.gruppe)
+            teile.append(tabelle)
+    return pd.concat(teile, ignore_index=True) if teile else pd.DataFrame()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  Erzeugung von Blocklisten für die Steinschlagsimulation (THROW)
+# Inverse-CDF-Ziehung aus der angepassten Achsenverteilung, blockweise und reproduzierbar
+# --------------------------------------------------------------
+
+import gzip
+import io
+import os
+import tempfile
+import zlib
+
+import numpy as np
+
+from bgv_interpolation import schnelle_cdf, schnelle_ppf
+
+# Anzahl der Blöcke pro Rechen- und Schreibschritt (begrenzt den Speicherbedarf)
+CHUNK_GROESSE = 1_000_000
+
+
+# Funktion zur Erzeugung von Blockvolumina [m³] in Blöcken fester Größe
+# Die Achsen a werden über die ppf der Verteilung gezogen (genexpon tabelliert), das Volumen ist a³.
+# Das Ergebnis hängt nur vom seed ab, nicht von chunk_groesse.
+# max_volumen_m3 schneidet die Verteilung oben ab (Ziehung nur aus [0, F(a_max)]).
+def erzeuge_volumen_chunks(name, parameter, anzahl, seed=None, chunk_groesse=CHUNK_GROESSE, max_volumen_m3=None):
+    rng = np.random.default_rng(seed)
+
+    u_max = 1.0
+    if max_volumen_m3 is not None:
+        u_max = float(schnelle_cdf(name, np.cbrt(max_volumen_m3), parameter))
+        if u_max <= 0:
+            raise ValueError(f"max_volumen_m3={max_volumen_m3} liegt unterhalb des Trägers der Verteilung '{name}'")
+
+    rest = int(anzahl)
+    while rest > 0:
+        n = min(chunk_groesse, rest)
+        u = rng.random(n)
+        if u_max < 1.0:
+            u *= u_max
+        achsen = schnelle_ppf(name, u, parameter)
+        yield achsen ** 3
+        rest -= n
+
+
+# Funktion zum Schreiben einer Blockliste (ein Volumen in m³ pro Zeile, wie die Beispiel-Dateien)
+# Die Werte werden in der kürzesten Darstellung geschrieben, die sie exakt wiedergibt (repr), damit auch sehr
+# kleine Volumina nicht zu 0 gerundet werden (z.B. 1.2e-05).
+# ziel: Pfad oder binäres Dateiobjekt; komprimiert=True schreibt gzip
+def schreibe_blockliste(ziel, volumen_chunks, komprimiert=False, zeilenende="\r\n"):
+    if isinstance(ziel, (str, os.PathLike)):
+        with open(ziel, "wb") as f:
+            return schreibe_blockliste(f, volumen_chunks, komprimiert, zeilenende)
+
+    if komprimiert:
+        # Stufe 6 statt 9: kaum größer, aber um ein Vielfaches schneller
+        with gzip.GzipFile(fileobj=ziel, mode="wb", compresslevel=6) as gz:
+            return schreibe_blockliste(gz, volumen_chunks, False, zeilenende)
+
+    anzahl = 0
+    for chunk in volumen_chunks:
+        if len(chunk) == 0:
+            continue
+        # Ein Schreibaufruf pro Block statt pro Zeile
+        ziel.write(_zeilen(chunk, zeilenende))
+        anzahl += len(chunk)
+    return anzahl
+
+
+# Funktion für die Zeilen eines Blocks als ASCII-Bytes
+def _zeilen(chunk, zeilenende):
+    return (zeilenende.join(map(repr, chunk.tolist())) + zeilenende).encode("ascii")
+
+
+# Funktion zur Erzeugung einer Blockliste als Folge von Byte-Stücken (Generator, ein Stück pro Block)
+# komprimiert=True ergibt zusammen einen gzip-Strom; die vollständige Liste liegt nie im Speicher.
+def erzeuge_blockliste_stuecke(name, parameter, anzahl, seed=None, komprimiert=True, max_volumen_m3=None,
+                               zeilenende="\r\n"):
+    # wbits 16 + MAX_WBITS: gzip-Kopf und -Prüfsumme wie bei gzip.compress, Stufe 6 wie schreibe_blockliste
+    packer = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if komprimiert else None
+    for chunk in erzeuge_volumen_chunks(name, parameter, anzahl, seed, max_volumen_m3=max_volumen_m3):
+        if len(chunk) == 0:
+            continue
+        stueck = _zeilen(chunk, zeilenende)
+        if packer is not None:
+            stueck = packer.compress(stueck)
+        if stueck:
+            yield stueck
+    if packer is not None:
+        yield packer.flush()
+
+
+# Funktion zur Erzeugung einer Blockliste in einer temporären Datei (z.B. für einen Download in der App)
+# Ungepuffert (FileIO), damit st.download_button die Datei als io.RawIOBase annimmt; sie wird beim Freigeben gelöscht.
+def erzeuge_blockliste_datei(name, parameter, anzahl, seed=None, komprimiert=True, max_volumen_m3=None):
+    datei = tempfile.TemporaryFile(buffering=0)
+    try:
+        # Gepuffertes Schreiben (vollständig, auch bei Teil-Schreibvorgängen von FileIO), danach wieder ungepuffert
+        schreiber = io.BufferedWriter(datei)
+        for stueck in erzeuge_blockliste_stuecke(name, parameter, anzahl, seed, komprimiert, max_volumen_m3):
+            schreiber.write(stueck)
+        schreiber.flush()
+        schreiber.detach()
+    except BaseException:
+        datei.close()
+        raise
+    datei.seek(0)
+    return datei
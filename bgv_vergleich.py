@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  Vergleich mehrerer Datensätze in einem Diagramm
+# Die Ergebnisse je Datensatz (Zusammenfassung, Anpassung, Perzentile) werden parallel berechnet und in einem
+# Speicher abgelegt, den alle Sitzungen teilen: öffnen mehrere Nutzer denselben Vergleich, wird jeder Datensatz
+# nur einmal angepasst; wer später kommt, wartet auf die laufende Berechnung statt sie zu wiederholen.
+# --------------------------------------------------------------
+
+import threading
+from concurrent.futures import Future
+
+import matplotlib.pyplot as plt
+import numpy as np
+from scipy import stats
+
+from bgv_cache import berechne_daten_hash
+from bgv_core import kurven_gitter
+from bgv_fit import STANDARD_VERTEILUNGEN
+from bgv_interpolation import schnelle_cdf, schnelle_ppf
+from bgv_perzentile import TABELLEN_PERZENTILE
+from bgv_sitzung import ArtefaktSpeicher
+from bgv_tabelle import MIN_BLOECKE, GruppenErgebnis, verarbeite_gruppen
+
+# Speicherbudget der geteilten Vergleichsergebnisse in Bytes
+VERGLEICH_BUDGET = 512 * 2**20
+
+# Linienstil der angepassten Kurven je Verteilung (die Farbe steht für den Datensatz)
+LINIENSTILE = {'genexpon': '-', 'expon': ':', 'powerlaw': '--'}
+
+
+# Ergebnisse je Datensatz, von allen Sitzungen geteilt (thread-sicher, LRU über das Budget)
+# Schlüssel: Hash der Achsen, Verteilungen und Perzentile; gleiche Daten unter anderem Namen zählen als Treffer.
+class VergleichsSpeicher:
+    def __init__(self, budget=VERGLEICH_BUDGET):
+        self._speicher = ArtefaktSpeicher(budget)
+        self._laufend = {}
+        self._lock = threading.Lock()
+        self.berechnet = 0
+        self.treffer = 0
+        self.mitgewartet = 0
+
+    # Funktion für die Ergebnisse mehrerer Datensätze (Name -> sortierte Achsen); liefert Name -> GruppenErgebnis
+    # Fehlende Datensätze werden gemeinsam über verarbeite_gruppen gerechnet (Anpassungen im gemeinsamen FitPool),
+    # gerade von einer anderen Sitzung berechnete abgewartet. fortschritt(name, fertig, gesamt) nach jedem Datensatz.
+    def hole(self, datensaetze, verteilungen=None, perzentile=TABELLEN_PERZENTILE, timeout=120, prozesse=None,
+             cache_verzeichnis=None, fit_cache=None, fortschritt=None):
+        verteilungen = tuple(STANDARD_VERTEILUNGEN if verteilungen is None else verteilungen)
+        schluessel = {name: (berechne_daten_hash(m_achsen), verteilungen, tuple(float(p) for p in perzentile))
+                      for name, m_achsen in datensaetze.items()}
+
+        ergebnisse = {}
+        eigene = {}
+        warten = {}
+        with self._lock:
+            for name, s in schluessel.items():
+                ergebnis = self._speicher.hole(s)
+                if ergebnis is not None:
+                    ergebnisse[name] = ergebnis._replace(gruppe=name)
+                    self.treffer += 1
+                elif s in self._laufend:
+                    warten[name] = self._laufend[s]
+                    self.mitgewartet += 1
+                else:
+                    self._laufend[s] = Future()
+                    eigene[name] = s
+
+        def melde(name):
+            if fortschritt is not None:
+                fortschritt(name, len(ergebnisse), len(datensaetze))
+
+        for name in ergebnisse:
+            melde(name)
+        try:
+            if eigene:
+                for g in verarbeite_gruppen({name: datensaetze[name] for name in eigene}, list(verteilungen),
+                                            perzentile, timeout, prozesse, cache_verzeichnis, fit_cache, MIN_BLOECKE):
+                    self._fertig(eigene[g.gruppe], g)
+                    ergebnisse[g.gruppe] = g
+                    melde(g.gruppe)
+        finally:
+            # Abgebrochene Berechnungen freigeben, damit wartende Sitzungen nicht hängen bleiben
+            for name, s in eigene.items():
+                if name not in ergebnisse:
+                    self._fertig(s, GruppenErgebnis(name, len(datensaetze[name]), None, "Berechnung abgebrochen"))
+
+        for name, future in warten.items():
+            ergebnisse[name] = future.result()._replace(gruppe=name)
+            melde(name)
+        return {name: ergebnisse[name] for name in datensaetze}
+
+    def _fertig(self, s, ergebnis):
+        with self._lock:
+            # Nur erfolgreiche Ergebnisse behalten; Fehler werden beim nächsten Aufruf neu versucht
+            if ergebnis.ergebnis is not None:
+                self._speicher.setze(s, ergebnis)
+                self.berechnet += 1
+            future = self._laufend.pop(s, None)
+        if future is not None and not future.done():
+            future.set_result(ergebnis)
+
+    def statistik(self):
+        with self._lock:
+            statistik = self._speicher.statistik()
+            return {"eintraege": len(statistik["artefakte"]), "belegt": statistik["belegt"],
+                    "budget": statistik["budget"], "berechnet": self.berechnet, "treffer": self.treffer,
+                    "mitgewartet": self.mitgewartet, "laufend": len(self._laufend)}
+
+
+# Funktion zum Zeichnen des Vergleichs: links Histogramme und Dichten, rechts empirische und angepasste CDFs
+# Eine Farbe je Datensatz, ein Linienstil je Verteilung; verteilungen wählt die gezeigten Anpassungen aus.
+def zeichne_vergleich(gruppen_ergebnisse, verteilungen=None):
+    fig, (ax1, ax2) = plt.subplots(nrows=1, ncols=2, figsize=(12, 5))
+    farben = plt.rcParams['axes.prop_cycle'].by_key()['color']
+    max_dichte = 0.0
+
+    for i, g in enumerate(g for g in gruppen_ergebnisse if g.ergebnis is not None):
+        farbe = farben[i % len(farben)]
+        zusammenfassung = g.ergebnis.zusammenfassung
+        ax1.stairs(zusammenfassung.hist_dichte, zusammenfassung.hist_kanten, color=farbe, alpha=0.6, lw=1.0,
+                   label=f'{g.gruppe} ({g.anzahl})')
+        ax2.plot(zusammenfassung.cdf_werte, zusammenfassung.cdf_steps, lw=6.0, color=farbe, alpha=0.25,
+                 label=f'{g.gruppe} cdf')
+        max_dichte = max(max_dichte, zusammenfassung.hist_dichte.max())
+
+        for name, parameter in g.ergebnis.parameter.items():
+            if verteilungen is not None and name not in verteilungen:
+                continue
+            X = kurven_gitter(*schnelle_ppf(name, [0.001, 0.999], parameter))
+            stil = LINIENSTILE.get(name, '-.')
+            ax1.plot(X, getattr(stats, name).pdf(X, *parameter), color=farbe, ls=stil, lw=1.0, alpha=0.8)
+            ax2.plot(X, schnelle_cdf(name, X, parameter), color=farbe, ls=stil, lw=1.0, alpha=0.8)
+
+    # Legende der Linienstile (unabhängig vom Datensatz)
+    for name in (verteilungen if verteilungen is not None else LINIENSTILE):
+        ax1.plot([], [], color='black', ls=LINIENSTILE.get(name, '-.'), lw=1.0, label=f'{name} pdf')
+
+    ax1.legend(loc='best', frameon=False, fontsize=8)
+    ax1.set_ylim(0, max_dichte * 1.1 if max_dichte > 0 else 1)
+    ax1.set_xlabel('Blockachse a [m]', fontsize=12)
+    ax1.set_ylabel('Wahrscheinlichkeitsdichte f(a)', fontsize=12)
+
+    ax2.legend(loc='best', frameon=False, fontsize=8)
+    ax2.set_xscale('log')
+    ax2.set_xlabel('Blockachse a [m] (log)', fontsize=12)
+    ax2.set_ylabel('Kumulative Wahrscheinlichkeit F(a)', fontsize=12)
+    ax2.set_ylim(0, 1.02)
+    ax2.set_yticks(np.linspace(0, 1, 6))
+
+    fig.tight_layout()
+    return fig
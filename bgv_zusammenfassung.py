@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------
+# BGV ...  Zusammenfassung eines Datensatzes, einmal pro Datensatz berechnet
+# Sortierte Achsen, ECDF, Histogramm und Quantile für alle Diagramme und Tabellen
+# --------------------------------------------------------------
+
+import numpy as np
+
+from bgv_cache import berechne_daten_hash
+
+# Höchstzahl der Histogrammklassen ('auto' ergibt bei Millionen Blöcken sonst tausende Klassen)
+MAX_HISTOGRAMM_KLASSEN = 200
+
+# Raster der empirischen CDF in den Diagrammen (1 % bis 100 %)
+CDF_STEPS = np.linspace(0.01, 1.00, num=100)
+
+
+# Funktion für die Klassengrenzen der Histogramme ('auto', aber höchstens MAX_HISTOGRAMM_KLASSEN Klassen)
+def histogramm_kanten(m_achsen):
+    kanten = np.histogram_bin_edges(m_achsen, bins='auto')
+    if len(kanten) - 1 > MAX_HISTOGRAMM_KLASSEN:
+        kanten = np.histogram_bin_edges(m_achsen, bins=MAX_HISTOGRAMM_KLASSEN)
+    return kanten
+
+
+# Zusammenfassung der Blockachsen [m]; alle Größen werden im Konstruktor einmal berechnet
+class Zusammenfassung:
+    def __init__(self, m_achsen, ist_sortiert=False):
+        sortiert = np.asarray(m_achsen, dtype=np.float64)
+        if not ist_sortiert:
+            sortiert = np.sort(sortiert)
+        # Schreibgeschützte Sicht: das Array des Aufrufers (ist_sortiert=True) bleibt beschreibbar
+        self.sortiert = sortiert.view()
+        self.sortiert.flags.writeable = False
+        self.anzahl = len(sortiert)
+        if self.anzahl == 0:
+            raise ValueError("Die Zusammenfassung braucht mindestens einen Wert")
+
+        # Schlüssel für den Fit-Cache
+        self.daten_hash = berechne_daten_hash(sortiert)
+
+        # Histogramm (Dichte) und Klassengrenzen
+        self.hist_kanten = histogramm_kanten(sortiert)
+        self.hist_dichte, _ = np.histogram(sortiert, bins=self.hist_kanten, density=True)
+
+        # Empirische CDF auf dem Diagrammraster
+        self.cdf_steps = CDF_STEPS
+        self.cdf_werte = self.quantile(CDF_STEPS)
+
+    # Quantile wie np.quantile (lineare Interpolation), O(1) pro Wahrscheinlichkeit auf dem sortierten Array
+    # p außerhalb von [0, 1] (oder NaN) ist wie bei numpy ein ValueError
+    def quantile(self, p):
+        p = np.asarray(p, dtype=np.float64)
+        if not np.all((p >= 0) & (p <= 1)):
+            raise ValueError("Quantile müssen im Bereich [0, 1] liegen")
+        position = (self.anzahl - 1) * p
+        unten = np.floor(position).astype(np.intp)
+        oben = np.minimum(unten + 1, self.anzahl - 1)
+        t = position - unten
+        a, b = self.sortiert[unten], self.sortiert[oben]
+        # Gleiche Interpolationsformel wie numpy, damit die Werte übereinstimmen
+        differenz = b - a
+        return np.where(t >= 0.5, b - differenz * (1 - t), a + differenz * t)
+
+    # Perzentile wie np.percentile, p in [0, 100]
+    def perzentile(self, p):
+        p = np.asarray(p, dtype=np.float64)
+        if not np.all((p >= 0) & (p <= 100)):
+            raise ValueError("Perzentile müssen im Bereich [0, 100] liegen")
+        return self.quantile(p / 100)
+
+    # Empirische Verteilungsfunktion an jedem Block: (werte, F(werte))
+    def ecdf(self):
+        return self.sortiert, np.arange(1, self.anzahl + 1) / self.anzahl
+
+    # Für Funktionen, die ein Array erwarten (np.asarray(zusammenfassung))
+    def __array__(self, dtype=None, copy=None):
+        return self.sortiert if dtype is None else self.sortiert.astype(dtype)
+
+    def __len__(self):
+        return self.anzahl
+
+
+# Funktion, die aus Achsen eine Zusammenfassung macht (eine vorhandene wird unverändert zurückgegeben)
+def als_zusammenfassung(m_achsen):
+    if isinstance(m_achsen, Zusammenfassung):
+        return m_achsen
+    return Zusammenfassung(m_achsen)
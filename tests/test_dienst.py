@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# HTTP/JSON-Dienst (bgv_dienst) über localhost, Anpassungen im Dienst-Prozess (prozesse=0)
+import gzip
+import os
+import urllib.request
+
+import numpy as np
+import pytest
+
+from bgv_dienst import anfrage, beende_dienst, starte_dienst
+from bgv_throw import CHUNK_GROESSE, erzeuge_blockliste_stuecke
+
+BLOCKLISTE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "blocklist_dachsteinkalk_m3.txt")
+
+
+@pytest.fixture(scope="module")
+def url():
+    server = starte_dienst(port=0, hintergrund=True, prozesse=0)
+    yield "http://%s:%d" % server.server_address
+    beende_dienst(server)
+
+
+@pytest.fixture(scope="module")
+def daten_hash(url):
+    with open(BLOCKLISTE, encoding="utf-8") as datei:
+        return anfrage(url, "/parse", {"text": datei.read()})["daten_hash"]
+
+
+def test_gesundheit(url):
+    assert anfrage(url, "/gesundheit")
+
+
+def test_fit_und_perzentile(url, daten_hash):
+    fit = anfrage(url, "/fit", {"daten_hash": daten_hash, "verteilungen": ["expon", "powerlaw"]})
+    assert {name: f["status"] for name, f in fit["verteilungen"].items()} == {"expon": "ok", "powerlaw": "ok"}
+
+    tabelle = anfrage(url, "/perzentile", {"daten_hash": daten_hash, "verteilungen": ["expon"],
+                                           "perzentile": [0, 50, 100]})
+    assert tabelle["spalten"] == ["upload", "expon"]
+    assert tabelle["m"]["upload"][0] <= tabelle["m"]["upload"][1] <= tabelle["m"]["upload"][2]
+    assert tabelle["status"] == {"expon": "cache"}
+
+
+def test_perzentile_nur_mit_parametern(url):
+    tabelle = anfrage(url, "/perzentile", {"parameter": {"expon": [0.0, 0.5]}, "perzentile": [50]})
+    assert tabelle["m"]["expon"] == pytest.approx([0.5 * np.log(2)])
+
+
+def test_stichprobe(url):
+    stichprobe = anfrage(url, "/stichprobe", {"verteilung": "expon", "parameter": [0.1, 0.5], "anzahl": 5,
+                                              "seed": 1})
+    assert len(stichprobe["volumen_m3"]) == 5
+    assert min(stichprobe["volumen_m3"]) >= 0.1 ** 3
+    blockliste = anfrage(url, "/stichprobe", {"verteilung": "expon", "parameter": [0.1, 0.5], "anzahl": 5,
+                                              "seed": 1, "ausgabe": "blockliste"})
+    assert len(gzip.decompress(blockliste).split()) == 5
+
+
+# Große Blocklisten werden blockweise (chunked) gesendet, mit demselben Inhalt wie in der App
+def test_blockliste_chunked(url):
+    anzahl = CHUNK_GROESSE + 10
+    daten = (b'{"verteilung": "expon", "parameter": [0.1, 0.5], "anzahl": %d, "seed": 2, '
+             b'"ausgabe": "blockliste"}' % anzahl)
+    with urllib.request.urlopen(urllib.request.Request(url + "/stichprobe", data=daten)) as antwort:
+        assert antwort.headers["Transfer-Encoding"] == "chunked"
+        assert antwort.headers["Content-Type"] == "application/gzip"
+        inhalt = antwort.read()
+    assert inhalt == b"".join(erzeuge_blockliste_stuecke("expon", (0.1, 0.5), anzahl, 2))
+
+
+# Fehler der Anfrage ergeben 400 mit Meldung, nicht 500 oder falsche Werte
+@pytest.mark.parametrize("endpunkt, daten", [
+    ("/perzentile", {"parameter": {"gibtsnicht": [1, 2]}}),
+    ("/perzentile", {"parameter": [0.32, 1.77, 0.786, 0.05, 0.176]}),
+    ("/perzentile", {"parameter": {"expon": [0.0]}}),
+    ("/perzentile", {"parameter": {"expon": ["a", 1]}}),
+    ("/perzentile", {"parameter": {"expon": [0, -1]}}),
+    ("/perzentile", {"parameter": {"powerlaw": [-1, 0, 1]}}),
+    ("/perzentile", {"parameter": {"expon": [0, 1]}, "perzentile": [150]}),
+    ("/perzentile", {"parameter": {"expon": [0, 1]}, "perzentile": [-10]}),
+    ("/perzentile", {"parameter": {"expon": [0, 1]}, "perzentile": "50"}),
+    ("/fit", {"werte": [1.0, 2.0, 3.0], "verteilungen": ["expon", "gibtsnicht"]}),
+    ("/fit", {"werte": [1.0, 2.0, 3.0], "verteilungen": "expon"}),
+    ("/fit", {"werte": [1.0, 2.0, 3.0], "dichte_kg_m3": -2700}),
+    ("/fit", {"werte": [1.0, 2.0, 3.0], "timeout": 0}),
+    ("/fit", {"daten_hash": "unbekannt"}),
+    ("/parse", {}),
+    ("/stichprobe", {"verteilung": "gibtsnicht", "parameter": [1, 2]}),
+    ("/stichprobe", {"verteilung": "expon", "parameter": [0, 1], "anzahl": -5}),
+    ("/stichprobe", {"verteilung": "expon", "parameter": [0, 1], "anzahl": 2.5}),
+    ("/stichprobe", {"verteilung": "expon", "parameter": [0.1, 0.5], "max_volumen_m3": 1e-6, "ausgabe": "blockliste"}),
+    ("/stichprobe", {"verteilung": "expon", "parameter": {"powerlaw": [0.5, 0, 1]}}),
+])
+def test_fehlerhafte_anfrage(url, endpunkt, daten):
+    with pytest.raises(RuntimeError, match=r"^400: "):
+        anfrage(url, endpunkt, daten)
+
+
+def test_unbekannter_endpunkt(url):
+    with pytest.raises(RuntimeError, match=r"^404: "):
+        anfrage(url, "/gibtsnicht", {})
+
+
+def test_metriken_zaehlen_fehler(url):
+    metriken = anfrage(url, "/metriken")
+    assert metriken["anfragen"] > 0
+    assert sum(e["fehler"] for e in metriken["endpunkte"].values()) > 0
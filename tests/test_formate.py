@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Exportierte Achsen [m] (bgv_formate): Kennung in der Datei (Feld/Spalte 'achse_m', Kopfzeile '# achse_m'), nicht im Dateinamen
+import io
+
+import numpy as np
+import pytest
+
+from bgv_formate import EXPORT_FORMATE, exportiere_werte, lade_blockliste, verfuegbare_exportformate
+from bgv_skizze import skizze_aus_blockliste
+
+ACHSEN = np.sort(np.random.default_rng(7).lognormal(-1.0, 0.5, 500))
+
+
+# Umbenannte Exporte und Browser-Kopien werden weiterhin als Achsen erkannt (keine zweite dritte Wurzel)
+@pytest.mark.parametrize("format", verfuegbare_exportformate())
+@pytest.mark.parametrize("name", ["kalk_achsen_m (1)", "umbenannt", "kalk_m3"])
+def test_achsen_kennung_im_inhalt(tmp_path, format, name):
+    daten = exportiere_werte(ACHSEN, format)
+    pfad = tmp_path / (name + EXPORT_FORMATE[format][0])
+    pfad.write_bytes(daten)
+    for quelle, dateiname in ((daten, pfad.name), (pfad, None)):
+        eingelesen = lade_blockliste(quelle, dateiname, min_wert=0.0)
+        assert eingelesen.achsen
+        assert eingelesen.anzahl_abgelehnt == 0
+        np.testing.assert_array_equal(eingelesen.werte, ACHSEN)
+    skizze, abgelehnt = skizze_aus_blockliste(pfad)
+    assert abgelehnt == 0
+    assert skizze.quantile([0.5])[0] == pytest.approx(np.median(ACHSEN), rel=0.02)
+
+
+# Textdateiobjekte (Uploads) werden nach der Prüfung der Kopfzeile von Anfang an gelesen
+def test_achsen_kopf_dateiobjekt():
+    eingelesen = lade_blockliste(io.BytesIO(exportiere_werte(ACHSEN, 'text')), min_wert=0.0)
+    assert eingelesen.achsen
+    np.testing.assert_array_equal(eingelesen.werte, ACHSEN)
+
+
+# Ältere Exporte ohne Kennung: nur der Dateiname entscheidet
+def test_alter_export_ohne_kennung():
+    puffer = io.BytesIO()
+    np.save(puffer, ACHSEN)
+    assert lade_blockliste(puffer.getvalue(), "kalk_achsen_m.npy").achsen
+    assert not lade_blockliste(puffer.getvalue(), "kalk.npy").achsen
+    text = "\n".join(map(repr, ACHSEN.tolist())).encode()
+    assert lade_blockliste(text, "kalk_achsen_m (2).txt").achsen
+    assert not lade_blockliste(text, "kalk.txt").achsen
+
+
+# Volumenlisten [m³] bleiben Volumenlisten
+def test_volumenliste_ohne_kennung():
+    eingelesen = lade_blockliste("blocklist_dachsteinkalk_m3.txt", min_wert=0.0)
+    assert not eingelesen.achsen
+    assert eingelesen.anzahl_abgelehnt == 0
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Tabellierte genexpon-ppf/cdf (bgv_interpolation) im Vergleich mit scipy.stats.genexpon
+import numpy as np
+import pytest
+from scipy import stats
+
+from bgv_interpolation import schnelle_cdf, schnelle_ppf
+
+# Parametersätze (a, b, c, loc, scale): Anpassungen der Beispiel-Blocklisten und Ränder der Grenzen aus bgv_mle
+PARAMETER = [
+    (0.32, 1.77, 0.786, 0.05, 0.176),
+    (0.0306, 100.0, 0.0169, 0.0, 0.3922),
+    (1.0, 1e-12, 0.0653, 0.22, 0.2456),
+    (1.0, 1.0, 1.0, 0.0, 1.0),
+    (0.01, 5.0, 0.2, 0.0, 0.5),
+    (1e-6, 100.0, 0.01, 0.0, 1.0),
+    (1e8, 100.0, 0.01, 0.0, 1.0),
+]
+
+# scipy.stats.genexpon.ppf ist innerhalb der Grenzen aus bgv_mle nur auf etwa 1e-8 genau (bei großem a liegt
+# die Tabelle näher an z = -log(1 - p) / a); außerhalb des tabellierten Bereichs rechnet auch die Tabelle mit scipy
+TOLERANZ = 1e-8
+
+
+@pytest.fixture(params=PARAMETER, ids=str)
+def parameter(request):
+    return request.param
+
+
+def test_ppf_array(parameter):
+    p = np.linspace(0.0, 1.0 - 1e-9, 1001)
+    np.testing.assert_allclose(schnelle_ppf('genexpon', p, parameter), stats.genexpon.ppf(p, *parameter),
+                               rtol=TOLERANZ)
+
+
+def test_ppf_kehrt_cdf_um(parameter):
+    p = np.linspace(0.001, 0.999, 999)
+    np.testing.assert_allclose(schnelle_cdf('genexpon', schnelle_ppf('genexpon', p, parameter), parameter), p,
+                               rtol=TOLERANZ)
+
+
+def test_ppf_skalar(parameter):
+    wert = schnelle_ppf('genexpon', 0.001, parameter)
+    assert np.shape(wert) == ()
+    np.testing.assert_allclose(wert, stats.genexpon.ppf(0.001, *parameter), rtol=TOLERANZ)
+
+
+def test_ppf_form_bleibt_erhalten(parameter):
+    p = np.array([[0.1, 0.5], [0.9, 0.99]])
+    assert schnelle_ppf('genexpon', p, parameter).shape == (2, 2)
+
+
+def test_ppf_randwerte(parameter):
+    p = [0.0, 1.0, np.nan, -0.1, 1.1]
+    np.testing.assert_array_equal(schnelle_ppf('genexpon', p, parameter), stats.genexpon.ppf(p, *parameter))
+
+
+def test_cdf(parameter):
+    x = stats.genexpon.ppf(np.linspace(0.001, 0.999, 501), *parameter)
+    np.testing.assert_allclose(schnelle_cdf('genexpon', x, parameter), stats.genexpon.cdf(x, *parameter),
+                               rtol=TOLERANZ)
+    wert = schnelle_cdf('genexpon', float(x[250]), parameter)
+    assert np.shape(wert) == ()
+    np.testing.assert_allclose(wert, stats.genexpon.cdf(x[250], *parameter), rtol=TOLERANZ)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# Messprotokoll (bgv_messung): prozessweites tracemalloc bei gleichzeitigen Sitzungen
+import gc
+import threading
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from bgv_messung import Messprotokoll
+
+
+@pytest.fixture(autouse=True)
+def ohne_tracemalloc():
+    if tracemalloc.is_tracing():
+        pytest.skip("tracemalloc wurde außerhalb der Tests gestartet")
+    yield
+    assert not tracemalloc.is_tracing()
+
+
+# Andere Protokolle (mit und ohne Speichermessung) stoppen tracemalloc nicht während einer Messung
+def test_tracemalloc_bleibt_fuer_laufende_messung():
+    a = Messprotokoll(speicher=True)
+    with a.stufe("gross"):
+        Messprotokoll(speicher=False).beenden()
+        b = Messprotokoll(speicher=True)
+        b.beenden()
+        b.beenden()
+        x = np.ones(2**20)
+        assert tracemalloc.is_tracing()
+    del x
+    assert a.eintraege[0]["speicher_bytes"] >= 8 * 2**20
+    a.beenden()
+    assert not tracemalloc.is_tracing()
+
+
+# Ein abgebrochener Durchlauf ohne beenden() meldet sich bei der Freigabe ab
+def test_abmeldung_bei_freigabe():
+    a = Messprotokoll(speicher=True)
+    assert tracemalloc.is_tracing()
+    del a
+    gc.collect()
+    assert not tracemalloc.is_tracing()
+
+
+# Gleichzeitige Sitzungen: keine negativen Speicherwerte, tracemalloc am Ende aus
+def test_gleichzeitige_sitzungen():
+    fehler = []
+
+    def sitzung(speicher):
+        try:
+            for _ in range(20):
+                m = Messprotokoll(speicher=speicher)
+                with m.stufe("stufe"):
+                    x = np.ones(10000)
+                    del x
+                m.beenden()
+                if speicher:
+                    assert m.eintraege[0]["speicher_bytes"] >= 0
+        except Exception as e:
+            fehler.append(e)
+
+    threads = [threading.Thread(target=sitzung, args=(i % 2 == 0,)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not fehler
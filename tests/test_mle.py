@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Spezialisierte MLE-Schätzer (bgv_mle) im Vergleich mit scipy.stats.<name>.fit auf den Beispiel-Blocklisten
+import glob
+import os
+
+import numpy as np
+import pytest
+from scipy import stats
+
+from bgv_core import berechne_dritte_wurzel
+from bgv_mle import SPEZIAL_FITTER, vergleiche_mit_scipy
+from bgv_parser import lese_blockliste
+
+BLOCKLISTEN = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                            "blocklist_*_m3.txt")))
+
+
+@pytest.fixture(scope="module", params=BLOCKLISTEN, ids=os.path.basename)
+def m_achsen(request):
+    return np.sort(berechne_dritte_wurzel(lese_blockliste(request.param, min_wert=0.0).werte))
+
+
+# Der spezialisierte Schätzer darf nicht schlechter sein als scipy
+@pytest.mark.parametrize("name", list(SPEZIAL_FITTER))
+def test_loglik_nicht_schlechter_als_scipy(m_achsen, name):
+    v = vergleiche_mit_scipy(name, m_achsen)
+    assert v["loglik_spezial"] >= v["loglik_scipy"] - 1e-6 * max(1.0, abs(v["loglik_scipy"]))
+
+
+# Die Parameter müssen mit scipy weiterverwendbar sein: ppf endlich und Umkehrung der cdf
+@pytest.mark.parametrize("name", list(SPEZIAL_FITTER))
+def test_parameter_mit_scipy_verwendbar(m_achsen, name):
+    parameter = vergleiche_mit_scipy(name, m_achsen)["parameter_spezial"]
+    verteilung = getattr(stats, name)
+    p = np.array([0.001, 0.01, 0.25, 0.5, 0.75, 0.95, 0.99, 0.999])
+    q = verteilung.ppf(p, *parameter)
+    assert np.all(np.isfinite(q))
+    # Quantile, die in float64 auf loc fallen (z.B. powerlaw mit kleiner Form), lassen sich nicht umkehren
+    aufgeloest = q > parameter[-2]
+    np.testing.assert_allclose(verteilung.cdf(q[aufgeloest], *parameter), p[aufgeloest], rtol=1e-5)
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+# Parser für Blocklisten (bgv_parser): Dezimalkomma nur in Zeilen mit genau einem Komma und ohne Punkt
+import numpy as np
+import pytest
+
+from bgv_parser import lese_blockliste
+
+
+@pytest.mark.parametrize("chunk_groesse", [4, 16, 2**20])
+@pytest.mark.parametrize("text, werte, abgelehnt", [
+    (b"0,25\n1,5\n2\n", [0.25, 1.5, 2.0], []),
+    (b"0,25\n1.5\n2,5e-3", [0.25, 1.5, 0.0025], []),
+    (b"1,2,3\n0,5\n", [0.5], [(1, "1,2,3")]),
+    (b"1.000,5\n0,5\n", [0.5], [(1, "1.000,5")]),
+    (b"0.5\n1,5e-3\n1,2,3", [0.5, 0.0015], [(3, "1,2,3")]),
+    (b"# achse_m\n0,5\r\n\r\n0,75\r\n", [0.5, 0.75], []),
+])
+def test_dezimalkomma(text, werte, abgelehnt, chunk_groesse):
+    ergebnis = lese_blockliste(text, chunk_groesse=chunk_groesse)
+    np.testing.assert_array_equal(ergebnis.werte, werte)
+    assert ergebnis.abgelehnt == abgelehnt
+    assert ergebnis.anzahl_abgelehnt == len(abgelehnt)
+
+
+# Komma- und Punktdatei ergeben dieselben Werte
+def test_komma_wie_punkt():
+    x = np.random.default_rng(3).lognormal(size=10000)
+    punkt = ("\n".join(map(repr, x.tolist())) + "\n").encode()
+    np.testing.assert_array_equal(lese_blockliste(punkt.replace(b".", b","), chunk_groesse=4096).werte, x)
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+# Zusammenfassung eines Datensatzes (bgv_zusammenfassung) im Vergleich mit numpy
+import numpy as np
+import pytest
+
+from bgv_zusammenfassung import Zusammenfassung
+
+
+def test_perzentile_wie_numpy():
+    x = np.random.default_rng(0).lognormal(size=1001)
+    p = np.linspace(0, 100, 201)
+    np.testing.assert_array_equal(Zusammenfassung(x).perzentile(p), np.percentile(x, p))
+
+
+@pytest.mark.parametrize("p", [-10, 150, np.nan, [50, 100.5]])
+def test_perzentile_ausserhalb_des_bereichs(p):
+    with pytest.raises(ValueError):
+        Zusammenfassung(np.arange(1.0, 11.0)).perzentile(p)
+    with pytest.raises(ValueError):
+        np.percentile(np.arange(1.0, 11.0), p)
+
+
+def test_array_des_aufrufers_bleibt_beschreibbar():
+    x = np.arange(1.0, 11.0)
+    zusammenfassung = Zusammenfassung(x, ist_sortiert=True)
+    assert x.flags.writeable
+    assert not zusammenfassung.sortiert.flags.writeable